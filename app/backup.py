@@ -0,0 +1,238 @@
+# app/backup.py
+
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import tempfile
+import time
+
+import database as db
+
+# ==============================
+# Backup & Restore Database
+# ==============================
+#
+# A snapshot is a gzip stream: one JSON header line, then (page number, page)
+# records ending with page number 0. Next to it, a .idx manifest holds a hash
+# of every page, so the next snapshot only stores pages whose hash changed
+# and names this one as its base ("dasar"). Restore replays the chain from
+# the last full snapshot. Every snapshot, incremental or not, still reads the
+# whole database once through a temporary copy; see buat_snapshot.
+#
+# Contoh:
+#     python main.py backup                 # incremental when a previous snapshot exists
+#     python main.py backup --penuh
+#     python main.py restore --snapshot backups/app_orang_secure-20250101-120000-000000.snap.gz
+
+DEFAULT_FOLDER = "backups"
+EKSTENSI = ".snap.gz"
+EKSTENSI_MANIFEST = ".idx"
+FORMAT_VERSI = 1
+# Pages copied per backup step; the source is only read-locked during a step
+LANGKAH_HALAMAN = 1024
+LEVEL_KOMPRESI = 6
+_HASH_SIZE = 16
+_NOMOR = struct.Struct(">I")
+
+
+def _hash(page):
+    return hashlib.blake2b(page, digest_size=_HASH_SIZE).digest()
+
+
+def _manifest(path):
+    return path[:-len(EKSTENSI)] + EKSTENSI_MANIFEST
+
+
+def _baca_header(path):
+    """Reads a snapshot's header; a missing, damaged or foreign file raises ValueError."""
+    try:
+        with gzip.open(path, "rb") as f:
+            header = json.loads(f.readline())
+    except (OSError, EOFError, ValueError) as e:
+        # ValueError covers json.JSONDecodeError and undecodable bytes
+        raise ValueError(f"Snapshot {path} rusak atau bukan snapshot: {e}")
+    if (not isinstance(header, dict) or header.get("versi") != FORMAT_VERSI
+            or not {"page_size", "page_count", "dasar"} <= header.keys()):
+        raise ValueError(f"Snapshot {path} bukan snapshot format versi {FORMAT_VERSI}.")
+    return header
+
+
+def daftar_snapshot(folder=DEFAULT_FOLDER):
+    """Snapshot files in `folder`, oldest first."""
+    if not os.path.isdir(folder):
+        return []
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(EKSTENSI))
+
+
+def _rantai(path):
+    """The snapshots needed to rebuild `path`: its last full snapshot first, `path` last."""
+    rantai = [path]
+    while (dasar := _baca_header(rantai[0])["dasar"]) is not None:
+        dasar = os.path.join(os.path.dirname(path), dasar)
+        if not os.path.exists(dasar):
+            raise ValueError(f"Snapshot dasar {dasar} tidak ditemukan.")
+        rantai.insert(0, dasar)
+    return rantai
+
+
+def _salin_online(sumber, tujuan, langkah, tahap, progress):
+    """Copies database `sumber` to `tujuan` with the online backup API, `langkah` pages per step.
+
+    Returns (page_size, page_count) of the copy.
+    """
+    src = sqlite3.connect(sumber, timeout=db.DB_BUSY_TIMEOUT_MS / 1000)
+    dst = sqlite3.connect(tujuan)
+    try:
+        src.backup(dst, pages=langkah,
+                   progress=(lambda status, sisa, total: progress(tahap, total - sisa, total)) if progress else None)
+        return dst.execute("PRAGMA page_size").fetchone()[0], dst.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
+
+
+def _laporan(mulai, byte_diproses, **isi):
+    detik = time.perf_counter() - mulai
+    return dict(isi, byte_diproses=byte_diproses, detik=detik,
+                mb_per_detik=byte_diproses / (1024 * 1024) / detik if detik else 0.0)
+
+
+def buat_snapshot(folder=DEFAULT_FOLDER, penuh=False, langkah=LANGKAH_HALAMAN, progress=None):
+    """Writes a compressed snapshot of the database and returns a throughput report.
+
+    Every run first copies the whole live database to a temporary file in
+    `folder` with the online backup API, `langkah` pages per step, so the
+    app can keep reading and writing meanwhile; `folder` needs room for one
+    full copy. Every page of that copy is then read and hashed for the
+    manifest. Unless `penuh` is set or there is no earlier snapshot with the
+    same page size, only pages whose hash differs from the previous
+    snapshot are written, so increments save snapshot size, not read I/O.
+    `progress(tahap, selesai, total)` is called per step ("salin", then "tulis").
+    """
+    mulai = time.perf_counter()
+    os.makedirs(folder, exist_ok=True)
+    nama = f"{os.path.splitext(os.path.basename(db.DB_FILE))[0]}-{datetime.datetime.now():%Y%m%d-%H%M%S-%f}"
+    path = os.path.join(folder, nama + EKSTENSI)
+    dasar = None if penuh else next(reversed(daftar_snapshot(folder)), None)
+    if dasar is not None:
+        try:
+            # An increment is only useful if its whole chain can be restored
+            _rantai(dasar)
+        except ValueError:
+            dasar = None
+
+    fd, salinan = tempfile.mkstemp(suffix=".db", dir=folder)
+    os.close(fd)
+    try:
+        page_size, page_count = _salin_online(db.DB_FILE, salinan, langkah, "salin", progress)
+        lama = None
+        if dasar is not None and os.path.exists(_manifest(dasar)) and _baca_header(dasar)["page_size"] == page_size:
+            with open(_manifest(dasar), "rb") as f:
+                lama = f.read()
+        else:
+            dasar = None
+
+        header = {"versi": FORMAT_VERSI, "page_size": page_size, "page_count": page_count,
+                  "dasar": os.path.basename(dasar) if dasar else None,
+                  "dibuat": datetime.datetime.now().isoformat(timespec="seconds")}
+        hashes = bytearray()
+        ditulis = 0
+        with open(salinan, "rb") as src, gzip.open(path + ".part", "wb", compresslevel=LEVEL_KOMPRESI) as out:
+            out.write(json.dumps(header).encode() + b"\n")
+            for nomor in range(1, page_count + 1):
+                page = src.read(page_size)
+                digest = _hash(page)
+                hashes += digest
+                if lama is None or lama[(nomor - 1) * _HASH_SIZE:nomor * _HASH_SIZE] != digest:
+                    out.write(_NOMOR.pack(nomor))
+                    out.write(page)
+                    ditulis += 1
+                if progress and (nomor % langkah == 0 or nomor == page_count):
+                    progress("tulis", nomor, page_count)
+            out.write(_NOMOR.pack(0))
+        with open(_manifest(path), "wb") as f:
+            f.write(hashes)
+        os.replace(path + ".part", path)
+    finally:
+        os.remove(salinan)
+        if os.path.exists(path + ".part"):
+            os.remove(path + ".part")
+
+    return _laporan(mulai, page_count * page_size, file=path, jenis="inkremental" if dasar else "penuh",
+                    halaman=page_count, halaman_ditulis=ditulis, byte_file=os.path.getsize(path))
+
+
+def _terapkan(path, out, page_size, page_count):
+    """Writes the pages stored in one snapshot into the open file `out`."""
+    try:
+        with gzip.open(path, "rb") as f:
+            header = json.loads(f.readline())
+            if header["versi"] != FORMAT_VERSI or header["page_size"] != page_size:
+                raise ValueError(f"Snapshot {path} tidak cocok dengan rantainya.")
+            while (nomor := _NOMOR.unpack(f.read(_NOMOR.size))[0]) != 0:
+                page = f.read(page_size)
+                if len(page) != page_size:
+                    raise ValueError(f"Snapshot {path} terpotong.")
+                if nomor <= page_count:
+                    out.seek((nomor - 1) * page_size)
+                    out.write(page)
+    except (EOFError, OSError, struct.error) as e:
+        raise ValueError(f"Snapshot {path} rusak: {e}")
+
+
+def _verifikasi(path, snapshot):
+    """Raises RuntimeError unless the rebuilt file matches the snapshot's manifest and passes integrity_check."""
+    header = _baca_header(snapshot)
+    if os.path.exists(_manifest(snapshot)):
+        with open(_manifest(snapshot), "rb") as f, open(path, "rb") as rebuilt:
+            for nomor in range(1, header["page_count"] + 1):
+                if f.read(_HASH_SIZE) != _hash(rebuilt.read(header["page_size"])):
+                    raise RuntimeError(f"Verifikasi gagal: halaman {nomor} berbeda dengan saat backup.")
+    conn = sqlite3.connect(path)
+    try:
+        hasil = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    finally:
+        conn.close()
+    if hasil != ["ok"]:
+        raise RuntimeError(f"Verifikasi gagal: {'; '.join(hasil[:5])}")
+
+
+def pulihkan(snapshot=None, folder=DEFAULT_FOLDER, langkah=LANGKAH_HALAMAN, progress=None):
+    """Restores the database from `snapshot` (default: the newest in `folder`); returns a throughput report.
+
+    The snapshot chain is replayed into a temporary file next to the
+    database, which must match the page hashes recorded at backup time and
+    pass PRAGMA integrity_check before it is copied over the live database
+    with the online backup API. A failed check leaves the database untouched
+    and raises RuntimeError; a missing or damaged snapshot raises ValueError.
+    `progress(tahap, selesai, total)` is called per step ("baca", then "pasang").
+    """
+    mulai = time.perf_counter()
+    snapshot = snapshot or next(reversed(daftar_snapshot(folder)), None)
+    if snapshot is None or not os.path.exists(snapshot):
+        raise ValueError("Snapshot tidak ditemukan.")
+    rantai = _rantai(snapshot)
+    header = _baca_header(snapshot)
+    page_size, page_count = header["page_size"], header["page_count"]
+
+    fd, sementara = tempfile.mkstemp(suffix=".db", dir=os.path.dirname(os.path.abspath(db.DB_FILE)))
+    try:
+        with os.fdopen(fd, "r+b") as out:
+            for i, path in enumerate(rantai, 1):
+                _terapkan(path, out, page_size, page_count)
+                if progress:
+                    progress("baca", i, len(rantai))
+            out.truncate(page_size * page_count)
+        _verifikasi(sementara, snapshot)
+        # This thread's cached connection would otherwise hold on to the old pages
+        db.close_db_connection()
+        _salin_online(sementara, db.DB_FILE, langkah, "pasang", progress)
+    finally:
+        os.remove(sementara)
+
+    return _laporan(mulai, page_count * page_size, file=snapshot, rantai=len(rantai), halaman=page_count,
+                    byte_file=sum(os.path.getsize(path) for path in rantai))
@@ -0,0 +1,5 @@
+# app/benchmarks/__init__.py
+#
+# Performance benchmarks. Run from the app/ directory:
+#
+#     python -m benchmarks.run --rows 100000 --output hasil.json
@@ -0,0 +1,55 @@
+# app/benchmarks/ledger.py
+
+import datetime
+import random
+
+import database as db
+
+# ==============================
+# Generator Data Sintetis
+# ==============================
+
+ACCOUNT_NAMES = ["Cash", "Bank BCA", "Bank Mandiri", "GoPay", "OVO", "Tabungan"]
+KATEGORI_NAMES = {
+    "pemasukan": ["Gaji", "Bonus", "Freelance", "Bunga", "Hadiah"],
+    "pengeluaran": ["Makanan", "Transport", "Listrik", "Internet", "Belanja", "Kesehatan", "Hiburan"],
+}
+DESKRIPSI_WORDS = ["makan siang", "bayar listrik", "isi bensin", "belanja bulanan", "kopi",
+                   "tagihan internet", "gaji bulanan", "obat", "nonton", ""]
+
+
+def generate_rows(rows, accounts, years=3, seed=42):
+    """Yields `rows` synthetic transactions in the export_to_csv column layout, oldest first."""
+    rng = random.Random(seed)
+    end = datetime.datetime.now()
+    start = end - datetime.timedelta(days=365 * years)
+    step = (end - start) / max(rows, 1)
+    for i in range(rows):
+        tipe = "pemasukan" if rng.random() < 0.3 else "pengeluaran"
+        yield {
+            "nama": rng.choice(accounts),
+            "tipe": tipe,
+            "kategori": rng.choice(KATEGORI_NAMES[tipe]),
+            "jumlah": f"{rng.uniform(5_000, 2_000_000 if tipe == 'pemasukan' else 500_000):.2f}",
+            "deskripsi": rng.choice(DESKRIPSI_WORDS),
+            "tanggal": (start + step * i).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+
+def build_ledger(rows, password="benchmark", accounts=4, seed=42):
+    """Creates a profile with synthetic accounts, categories and `rows` transactions.
+
+    Everything goes through the real database.py write paths. Returns
+    (orang_id, session).
+    """
+    db.setup_database()
+    orang_id = db.tambah_orang("Benchmark", password)
+    session = db.buka_sesi(orang_id, password)
+    account_names = ACCOUNT_NAMES[:accounts]
+    for nama in account_names:
+        db.tambah_account(orang_id, nama, session)
+    for tipe, names in KATEGORI_NAMES.items():
+        for nama in names:
+            db.tambah_kategori(orang_id, nama, tipe, session)
+    db.import_transaksi(orang_id, generate_rows(rows, account_names, seed=seed), session, f"benchmark:{seed}")
+    return orang_id, session
@@ -0,0 +1,198 @@
+# app/benchmarks/load_server.py
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import database as db
+import server
+from benchmarks.ledger import build_ledger
+
+# ==============================
+# Load Test Server HTTP/JSON
+# ==============================
+#
+# Contoh (server sementara dengan ledger sintetis):
+#     cd app && python -m benchmarks.load_server --rows 20000 --clients 50 --requests 40
+# Terhadap server yang sudah berjalan:
+#     python -m benchmarks.load_server --port 8765 --id-profil 1 --password ...
+
+
+class Client:
+    """Minimal keep-alive HTTP/1.1 client over one asyncio stream."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.token = None
+
+    @classmethod
+    async def connect(cls, host, port, unix_path):
+        if unix_path:
+            return cls(*await asyncio.open_unix_connection(unix_path))
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def request(self, method, path, payload=None, chunk_delay=0):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        headers = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n"
+        if self.token:
+            headers += f"Authorization: Bearer {self.token}\r\n"
+        self.writer.write(headers.encode() + b"\r\n" + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode().partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        if response_headers.get("transfer-encoding") == "chunked":
+            size = 0
+            while (length := int(await self.reader.readline(), 16)):
+                size += len(await self.reader.readexactly(length + 2)) - 2
+                if chunk_delay:
+                    await asyncio.sleep(chunk_delay)
+            await self.reader.readline()
+            return status, size
+        data = await self.reader.readexactly(int(response_headers.get("content-length", 0)))
+        return status, json.loads(data) if data else None
+
+    def close(self):
+        self.writer.close()
+
+
+async def run_client(args, token, ids, latencies, errors, rng):
+    client = await Client.connect(args.host, args.port, args.unix)
+    client.token = token
+    try:
+        for _ in range(args.requests):
+            roll = rng.random()
+            if roll < args.write_ratio:
+                name, call = "add_transaction", client.request("POST", "/transactions", {
+                    "account_id": rng.choice(ids["accounts"]), "kategori_id": ids["kategori"],
+                    "tipe": "pemasukan", "jumlah": 1000, "deskripsi": "load test"})
+            elif roll < 0.4:
+                name, call = "balances", client.request("GET", "/balances")
+            elif roll < 0.5:
+                name, call = "accounts", client.request("GET", "/accounts")
+            else:
+                page = rng.randint(1, ids["pages"])
+                name, call = "history", client.request("GET", f"/history?tipe=pengeluaran&page={page}")
+            start = time.perf_counter()
+            status, _ = await call
+            latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+            if status >= 400:
+                errors[name] = errors.get(name, 0) + 1
+    finally:
+        client.close()
+
+
+async def slow_export(args, token, results):
+    """Downloads the full export while pausing between chunks, like a client on a slow link."""
+    client = await Client.connect(args.host, args.port, args.unix)
+    client.token = token
+    start = time.perf_counter()
+    try:
+        status, size = await client.request("GET", "/export", chunk_delay=args.export_delay)
+        results.append({"status": status, "bytes": size, "seconds": time.perf_counter() - start})
+    finally:
+        client.close()
+
+
+def summarize(values):
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {"count": len(values), "p50_ms": statistics.median(values), "p95_ms": pick(0.95),
+            "p99_ms": pick(0.99), "max_ms": values[-1]}
+
+
+async def load_test(args):
+    admin = await Client.connect(args.host, args.port, args.unix)
+    status, login = await admin.request("POST", "/login", {"orang_id": args.profil, "password": args.password})
+    if status != 200:
+        raise SystemExit(f"Login gagal: {login}")
+    admin.token = login["token"]
+    _, accounts = await admin.request("GET", "/accounts")
+    _, kategori = await admin.request("GET", "/categories?tipe=pemasukan")
+    _, history = await admin.request("GET", "/history?tipe=pengeluaran&page_size=20")
+    admin.close()
+    ids = {"accounts": [a["id"] for a in accounts["accounts"]],
+           "kategori": kategori["categories"][0]["id"],
+           "pages": max(1, -(-history["total"] // 20))}
+
+    latencies, errors, exports = {}, {}, []
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(slow_export(args, admin.token, exports) for _ in range(args.export_clients)),
+        *(run_client(args, admin.token, ids, latencies, errors, random.Random(rng.random()))
+          for _ in range(args.clients)),
+    )
+    elapsed = time.perf_counter() - start
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "clients": args.clients,
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "requests_per_sec": total / elapsed,
+        "latency": {name: summarize(values) for name, values in latencies.items()},
+        "exports": exports,
+    }
+
+
+def start_local_server(args, tmp):
+    """Builds a synthetic ledger in `tmp` and serves it from a background thread."""
+    db.DB_FILE = args.db or os.path.join(tmp, "load.db")
+    args.profil, _ = build_ledger(args.rows, args.password)
+    args.unix = args.unix or os.path.join(tmp, "server.sock")
+    ready = threading.Event()
+    thread = threading.Thread(
+        target=lambda: asyncio.run(server.serve(unix_path=args.unix, workers=args.workers,
+                                                ready=lambda _: ready.set())),
+        daemon=True,
+    )
+    thread.start()
+    ready.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hit the local JSON server with many concurrent clients.")
+    parser.add_argument("--host", default=server.DEFAULT_HOST)
+    parser.add_argument("--port", type=int, help="port of a running server (default: start a temporary one)")
+    parser.add_argument("--unix", metavar="PATH", help="Unix socket of a running server")
+    parser.add_argument("--id-profil", dest="profil", type=int, default=1)
+    parser.add_argument("--password", default=os.environ.get("APP_MASTER_PASSWORD", "benchmark"))
+    parser.add_argument("--rows", type=int, default=20_000, help="ledger size for the temporary server")
+    parser.add_argument("--db", help="database file for the temporary server (default: a temporary file)")
+    parser.add_argument("--workers", type=int, default=server.DEFAULT_WORKERS)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=40, help="requests per client")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="share of requests that add a transaction")
+    parser.add_argument("--export-clients", type=int, default=1, help="slow full exports running alongside")
+    parser.add_argument("--export-delay", type=float, default=0.01, help="pause per export chunk (seconds)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.port is None and args.unix is None:
+            start_local_server(args, tmp)
+        results = asyncio.run(load_test(args))
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
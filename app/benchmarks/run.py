@@ -0,0 +1,133 @@
+# app/benchmarks/run.py
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import database as db
+from benchmarks.ledger import build_ledger
+
+# ==============================
+# Benchmark Runner
+# ==============================
+
+
+def measure(fn, repeat):
+    """Runs fn `repeat` times and returns timing statistics in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "repeat": repeat,
+        "min_ms": min(timings),
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.fmean(timings),
+        "max_ms": max(timings),
+    }
+
+
+def throughput(fn, count):
+    """Calls fn(i) `count` times and returns operations per second."""
+    start = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    return {"count": count, "total_ms": elapsed * 1000, "ops_per_sec": count / elapsed}
+
+
+def run_benchmarks(rows, repeat, password="benchmark"):
+    results = {}
+
+    start = time.perf_counter()
+    orang_id, session = build_ledger(rows, password)
+    results["build_ledger"] = {"rows": rows, "total_ms": (time.perf_counter() - start) * 1000}
+
+    profil = next(o for o in db.get_orang() if o["id"] == orang_id)
+
+    def login():
+        assert db.verify_master_password(profil["master_password_hash"], password)
+        db.buka_sesi(orang_id, password)
+
+    results["login"] = measure(login, repeat)
+
+    bulan_ini = datetime.datetime.now().strftime("%Y-%m")
+
+    def dashboard():
+        db.get_accounts_by_orang(orang_id, session)
+        db.get_dashboard_summary(orang_id, bulan_ini)
+
+    results["dashboard"] = measure(dashboard, repeat)
+
+    page_size = 20
+    total_pages = max(1, -(-db.count_transactions(orang_id, "pengeluaran") // page_size))
+    for label, page in (("first", 1), ("middle", (total_pages + 1) // 2), ("last", total_pages)):
+        results[f"history_page_{label}"] = dict(
+            measure(lambda: db.get_transactions_paginated(orang_id, session, "pengeluaran", page, page_size), repeat),
+            page=page,
+        )
+
+    def export():
+        for _ in db.iter_transactions_for_export(orang_id, session):
+            pass
+
+    results["export"] = dict(measure(export, max(1, repeat // 5)), rows=rows)
+
+    accounts = [acc_id for acc_id, _ in db.get_accounts_by_orang(orang_id, session)]
+    kategori_id = db.get_kategori(orang_id, "pemasukan", session)[0][0]
+    ops = max(10, repeat * 10)
+    # Funding first keeps every transfer above the balance check
+    results["tambah_transaksi"] = throughput(
+        lambda i: db.tambah_transaksi(accounts[0], kategori_id, "pemasukan", 1_000_000, "setoran", session), ops
+    )
+    results["transfer_dana"] = throughput(
+        lambda i: db.transfer_dana(orang_id, accounts[0], accounts[1 + i % (len(accounts) - 1)], 1_000, session), ops
+    )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the finance app on a synthetic ledger.")
+    parser.add_argument("--rows", type=int, default=10_000, help="transactions to generate (e.g. 10000, 100000, 1000000)")
+    parser.add_argument("--repeat", type=int, default=10, help="repetitions per timed operation")
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    parser.add_argument("--db", help="database file to use (default: a temporary file)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = args.db or os.path.join(tmp, "benchmark.db")
+        try:
+            results = run_benchmarks(args.rows, args.repeat)
+        finally:
+            db.close_db_connection()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "rows": args.rows,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,420 @@
+# app/cli.py
+
+import argparse
+import csv
+import datetime
+import os
+import sys
+from getpass import getpass
+
+import database as db
+
+# ==============================
+# Perintah Non-Interaktif
+# ==============================
+#
+# Contoh:
+#     echo "$PASSWORD" | python main.py balance --id-profil 1
+#     APP_MASTER_PASSWORD=... python main.py history --id-profil 1 --tipe pengeluaran --page 2
+#     printf '%s\n%s\n' "$LAMA" "$BARU" | python main.py change-password --id-profil 1
+#     APP_MASTER_PASSWORD=... python main.py recurring-post --id-profil 1   # e.g. from cron
+
+ENV_PASSWORD = "APP_MASTER_PASSWORD"
+ENV_NEW_PASSWORD = "APP_NEW_MASTER_PASSWORD"
+
+
+def parse_tanggal(text):
+    """Parses a YYYY-MM-DD date (also used as an argparse type)."""
+    try:
+        return datetime.datetime.strptime(text, "%Y-%m-%d").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"tanggal '{text}' harus berformat YYYY-MM-DD")
+
+
+def periode(dari, sampai):
+    """Turns an inclusive (dari, sampai) date pair into the half-open bounds database queries take."""
+    return dari, (sampai + datetime.timedelta(days=1) if sampai is not None else None)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Aplikasi Keuangan Pribadi (CLI)", allow_abbrev=False)
+    parser.add_argument("--profile", action="store_true",
+                        help="catat statistik fungsi & SQL, tampilkan saat logout (atau set APP_PROFILE=1)")
+    parser.add_argument("--profile-dump", metavar="FILE",
+                        help="simpan juga data cProfile ke FILE (atau set APP_PROFILE_DUMP)")
+    # Defaults are resolved by main.py, so readmodel is only imported in menu mode
+    parser.add_argument("--read-model", nargs="?", type=float, const=0, metavar="MB",
+                        help="mode menu: simpan data sesi yang sudah didekripsi di memori, maksimum MB "
+                             "(tanpa MB: batas bawaan; atau set APP_READ_MODEL=1 / APP_READ_MODEL_MB)")
+    sub = parser.add_subparsers(dest="command", metavar="PERINTAH",
+                                help="tanpa perintah, aplikasi berjalan dalam mode menu interaktif")
+
+    def add_command(name, help_text):
+        p = sub.add_parser(name, help=help_text,
+                           description=f"{help_text}. Master password dibaca dari ${ENV_PASSWORD} atau stdin.")
+        p.add_argument("--id-profil", dest="profil", type=int, required=True, help="ID profil")
+        return p
+
+    def add_periode(p):
+        p.add_argument("--dari", dest="periode_dari", type=parse_tanggal, metavar="YYYY-MM-DD",
+                       help="hanya transaksi sejak tanggal ini")
+        p.add_argument("--sampai", dest="periode_sampai", type=parse_tanggal, metavar="YYYY-MM-DD",
+                       help="hanya transaksi sampai tanggal ini (inklusif)")
+
+    def add_arsip(p):
+        p.add_argument("--arsip", action="store_true", help="sertakan transaksi yang sudah diarsipkan")
+
+    p = add_command("balance", "Tampilkan saldo semua akun")
+    add_periode(p)
+
+    p = add_command("add", "Catat satu transaksi")
+    p.add_argument("--tipe", choices=["pemasukan", "pengeluaran"], required=True)
+    p.add_argument("--akun", type=int, required=True, help="ID akun")
+    p.add_argument("--kategori", type=int, required=True, help="ID kategori")
+    p.add_argument("--jumlah", type=float, required=True)
+    p.add_argument("--deskripsi", default="")
+
+    p = add_command("transfer", "Transfer dana antar akun")
+    p.add_argument("--dari", type=int, required=True, help="ID akun sumber")
+    p.add_argument("--ke", type=int, required=True, help="ID akun tujuan")
+    p.add_argument("--jumlah", type=float, required=True)
+
+    p = add_command("history", "Tampilkan riwayat transaksi")
+    p.add_argument("--tipe", choices=["pemasukan", "pengeluaran"], required=True)
+    p.add_argument("--page", type=int, default=1)
+    p.add_argument("--page-size", type=int, default=20)
+    add_periode(p)
+    add_arsip(p)
+
+    p = add_command("search", "Cari transaksi berdasarkan kata pada deskripsi")
+    p.add_argument("keyword")
+    p.add_argument("--limit", type=int, default=50)
+
+    p = add_command("export", "Export semua transaksi ke CSV")
+    p.add_argument("--output", "-o", default="-", help="nama file, atau '-' untuk stdout (default)")
+    add_periode(p)
+    add_arsip(p)
+
+    p = add_command("import", "Import transaksi dari CSV hasil export")
+    p.add_argument("file")
+
+    p = add_command("archive", "Pindahkan transaksi lama ke tabel arsip per tahun")
+    p.add_argument("--sebelum", type=parse_tanggal, required=True, metavar="YYYY-MM-DD",
+                   help="arsipkan transaksi sebelum tanggal ini")
+
+    p = add_command("budget", "Tampilkan atau atur anggaran bulanan per kategori")
+    p.add_argument("--kategori", type=int, help="ID kategori yang anggarannya diatur")
+    p.add_argument("--jumlah", type=float, help="anggaran per bulan untuk --kategori")
+    p.add_argument("--hapus", action="store_true", help="hapus anggaran --kategori")
+    p.add_argument("--bulan", default=datetime.date.today().strftime("%Y-%m"), metavar="YYYY-MM",
+                   help="bulan yang ditampilkan (default: bulan ini)")
+
+    p = add_command("recurring-add", "Tambah aturan transaksi berulang")
+    p.add_argument("--tipe", choices=["pemasukan", "pengeluaran"], required=True)
+    p.add_argument("--akun", type=int, required=True, help="ID akun")
+    p.add_argument("--kategori", type=int, required=True, help="ID kategori")
+    p.add_argument("--jumlah", type=float, required=True)
+    p.add_argument("--deskripsi", default="")
+    p.add_argument("--frekuensi", choices=db.FREKUENSI, default="bulanan")
+    p.add_argument("--mulai", type=parse_tanggal, default=datetime.date.today(), metavar="YYYY-MM-DD",
+                   help="tanggal transaksi pertama (default: hari ini)")
+    p.add_argument("--berakhir", type=parse_tanggal, metavar="YYYY-MM-DD", help="tanggal transaksi terakhir")
+
+    add_command("recurring-list", "Tampilkan aturan transaksi berulang")
+
+    p = add_command("recurring-delete", "Hapus aturan transaksi berulang")
+    p.add_argument("id", type=int, help="ID aturan")
+
+    p = add_command("recurring-post", "Catat semua transaksi berulang yang sudah jatuh tempo")
+    p.add_argument("--hingga", type=parse_tanggal, metavar="YYYY-MM-DD",
+                   help="catat yang jatuh tempo sampai tanggal ini (default: hari ini)")
+
+    p = sub.add_parser("serve", help="Jalankan server HTTP/JSON lokal untuk banyak klien",
+                       description="Jalankan server HTTP/JSON lokal. Klien login lewat POST /login.")
+    p.add_argument("--host", default="127.0.0.1", help="alamat bind (default: 127.0.0.1)")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--unix", metavar="PATH", help="dengarkan di Unix socket ini, bukan TCP")
+    p.add_argument("--workers", type=int, default=min(8, (os.cpu_count() or 1) + 4),
+                   help="thread (dan koneksi database) untuk request")
+    p.add_argument("--export-workers", type=int, default=2, help="maksimum export yang berjalan bersamaan")
+
+    p = sub.add_parser("backup", help="Buat snapshot database terkompresi (inkremental)",
+                       description="Buat snapshot database tanpa menghentikan aplikasi. Tanpa --penuh, hanya "
+                                   "halaman yang berubah sejak snapshot terakhir yang disimpan.")
+    p.add_argument("--folder", help="folder snapshot (default: backups)")
+    p.add_argument("--penuh", action="store_true", help="simpan semua halaman, bukan hanya yang berubah")
+
+    p = sub.add_parser("restore", help="Pulihkan seluruh database (semua profil) dari snapshot",
+                       description="Ganti seluruh database, termasuk data SEMUA profil, dengan isi snapshot "
+                                   "setelah integritasnya diverifikasi.")
+    p.add_argument("--folder", help="folder snapshot (default: backups)")
+    p.add_argument("--snapshot", metavar="FILE", help="file snapshot (default: yang terbaru di --folder)")
+
+    p = add_command("change-password", "Ganti master password dan enkripsi ulang semua data profil")
+    p.add_argument("--batch-size", type=int, default=500)
+
+    return parser
+
+
+def read_password(env=ENV_PASSWORD, prompt="Master Password: "):
+    """Reads a password from the environment, a pipe (one line each), or the terminal."""
+    password = os.environ.get(env)
+    if password is not None:
+        return password
+    if sys.stdin.isatty():
+        return getpass(prompt)
+    return sys.stdin.readline().rstrip("\n")
+
+
+def login(orang_id):
+    """Verifies the profile's master password and returns its session key, or None."""
+    profil = next((o for o in db.get_orang() if o["id"] == orang_id), None)
+    if profil is None:
+        print(f"ID Profil {orang_id} tidak ditemukan.", file=sys.stderr)
+        return None
+    master_password = read_password()
+    if not db.verify_master_password(profil["master_password_hash"], master_password):
+        print("Master Password salah!", file=sys.stderr)
+        return None
+    return db.buka_sesi(orang_id, master_password)
+
+
+def cmd_balance(args, session):
+    accounts = db.get_accounts_by_orang(args.profil, session)
+    dari, sampai = periode(args.periode_dari, args.periode_sampai)
+    summary = db.get_dashboard_summary(args.profil, datetime.datetime.now().strftime("%Y-%m"), dari, sampai)
+    if dari is None and sampai is None:
+        for acc_id, acc_name in accounts:
+            print(f"{acc_id}\t{acc_name}\t{summary[acc_id]['saldo']:.2f}")
+        print(f"TOTAL\t\t{sum(s['saldo'] for s in summary.values()):.2f}")
+        return 0
+    # With a period, income and expense within it are shown next to the balance
+    for acc_id, acc_name in accounts:
+        s = summary[acc_id]
+        print(f"{acc_id}\t{acc_name}\t{s['saldo']:.2f}\t{s['pemasukan']:.2f}\t{s['pengeluaran']:.2f}")
+    print(f"TOTAL\t\t{sum(s['saldo'] for s in summary.values()):.2f}"
+          f"\t{sum(s['pemasukan'] for s in summary.values()):.2f}"
+          f"\t{sum(s['pengeluaran'] for s in summary.values()):.2f}")
+    return 0
+
+
+def cmd_add(args, session):
+    if not any(acc_id == args.akun for acc_id, _ in db.get_accounts_by_orang(args.profil, session)):
+        print("ID Akun tidak valid.", file=sys.stderr)
+        return 1
+    if not any(kat_id == args.kategori for kat_id, _ in db.get_kategori(args.profil, args.tipe, session)):
+        print("ID Kategori tidak valid.", file=sys.stderr)
+        return 1
+    db.tambah_transaksi(args.akun, args.kategori, args.tipe, args.jumlah, args.deskripsi, session)
+    status = db.cek_anggaran(args.profil, args.kategori, datetime.date.today().strftime("%Y-%m"))
+    if status and status["melebihi"]:
+        print(f"Peringatan: anggaran kategori terlampaui {-status['sisa']:.2f} "
+              f"({status['terpakai']:.2f} dari {status['anggaran']:.2f})", file=sys.stderr)
+    return 0
+
+
+def cmd_transfer(args, session):
+    # Ownership, amount and distinct accounts are checked by transfer_dana
+    try:
+        db.transfer_dana(args.profil, args.dari, args.ke, args.jumlah, session)
+    except db.SaldoTidakCukupError as e:
+        print(f"Saldo tidak mencukupi! Saldo saat ini: Rp{e.saldo:,.2f}", file=sys.stderr)
+        return 1
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_history(args, session):
+    writer = csv.writer(sys.stdout, delimiter="\t", lineterminator="\n")
+    dari, sampai = periode(args.periode_dari, args.periode_sampai)
+    for t in db.get_transactions_paginated(args.profil, session, args.tipe, args.page, args.page_size,
+                                           dari, sampai, args.arsip):
+        writer.writerow([t["tanggal"], t["nama_account"], t["nama_kategori"], f"{t['jumlah']:.2f}", t["deskripsi"]])
+    return 0
+
+
+def cmd_search(args, session):
+    if db.blind_index_pending(args.profil):
+        db.backfill_blind_index(args.profil, session)
+    writer = csv.writer(sys.stdout, delimiter="\t", lineterminator="\n")
+    for t in db.search_transaksi(args.profil, session, args.keyword, args.limit):
+        writer.writerow([t["tanggal"], t["tipe"], t["nama_account"], t["nama_kategori"],
+                         f"{t['jumlah']:.2f}", t["deskripsi"]])
+    return 0
+
+
+def cmd_export(args, session):
+    csvfile = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    try:
+        writer = csv.DictWriter(csvfile, fieldnames=db.EXPORT_COLUMNS)
+        writer.writeheader()
+        dari, sampai = periode(args.periode_dari, args.periode_sampai)
+        for row in db.iter_transactions_for_export(args.profil, session, dari=dari, sampai=sampai,
+                                                   arsip=args.arsip):
+            writer.writerow(row)
+    finally:
+        if csvfile is not sys.stdout:
+            csvfile.close()
+    return 0
+
+
+def cmd_import(args, session):
+    with open(args.file, newline="", encoding="utf-8") as csvfile:
+        reader = csv.DictReader(csvfile)
+        if not reader.fieldnames or not set(db.EXPORT_COLUMNS) <= set(reader.fieldnames):
+            print(f"Kolom file harus: {', '.join(db.EXPORT_COLUMNS)}", file=sys.stderr)
+            return 1
+        sumber = f"{os.path.abspath(args.file)}:{os.path.getsize(args.file)}"
+        try:
+            inserted = db.import_transaksi(args.profil, reader, session, sumber)
+        except ValueError as e:
+            print(f"Import dihentikan: {e}", file=sys.stderr)
+            return 1
+    print(f"{inserted} transaksi diimpor.", file=sys.stderr)
+    return 0
+
+
+def cmd_archive(args, session):
+    total = db.arsipkan_transaksi(args.profil, args.sebelum)
+    print(f"{total} transaksi diarsipkan.", file=sys.stderr)
+    return 0
+
+
+def cmd_budget(args, session):
+    if args.kategori is not None:
+        if args.jumlah is None and not args.hapus or args.jumlah is not None and args.jumlah <= 0:
+            print("Gunakan --jumlah (lebih dari 0) atau --hapus bersama --kategori.", file=sys.stderr)
+            return 1
+        if not any(kat_id == args.kategori for kat_id, _ in db.get_kategori(args.profil, "pengeluaran", session)):
+            print("ID Kategori tidak valid.", file=sys.stderr)
+            return 1
+        db.atur_anggaran(args.profil, args.kategori, None if args.hapus else args.jumlah)
+        return 0
+    status = db.get_status_anggaran(args.profil, args.bulan)
+    names = db.get_names("kategori", [a["kategori_id"] for a in status], session)
+    writer = csv.writer(sys.stdout, delimiter="\t", lineterminator="\n")
+    for a in status:
+        writer.writerow([a["kategori_id"], names.get(a["kategori_id"], ""), f"{a['terpakai']:.2f}",
+                         f"{a['anggaran']:.2f}", f"{a['sisa']:.2f}", "MELEBIHI" if a["melebihi"] else ""])
+    return 0
+
+
+def cmd_recurring_add(args, session):
+    if not any(acc_id == args.akun for acc_id, _ in db.get_accounts_by_orang(args.profil, session)):
+        print("ID Akun tidak valid.", file=sys.stderr)
+        return 1
+    if not any(kat_id == args.kategori for kat_id, _ in db.get_kategori(args.profil, args.tipe, session)):
+        print("ID Kategori tidak valid.", file=sys.stderr)
+        return 1
+    try:
+        rule_id = db.tambah_transaksi_berulang(args.akun, args.kategori, args.tipe, args.jumlah, args.deskripsi,
+                                               args.frekuensi, args.mulai, session, args.berakhir)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(rule_id)
+    return 0
+
+
+def cmd_recurring_list(args, session):
+    writer = csv.writer(sys.stdout, delimiter="\t", lineterminator="\n")
+    for r in db.get_transaksi_berulang(args.profil, session):
+        writer.writerow([r["id"], r["frekuensi"], r["jatuh_tempo"] or "", r["berakhir"] or "", r["tipe"],
+                         r["nama_account"], r["nama_kategori"], f"{r['jumlah']:.2f}", r["deskripsi"]])
+    return 0
+
+
+def cmd_recurring_delete(args, session):
+    if not db.hapus_transaksi_berulang(args.profil, args.id):
+        print("ID tidak valid.", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_recurring_post(args, session):
+    total = db.proses_transaksi_berulang(args.profil, session, args.hingga)
+    print(f"{total} transaksi berulang dicatat.", file=sys.stderr)
+    return 0
+
+
+def cmd_change_password(args, session):
+    password_baru = read_password(ENV_NEW_PASSWORD, "Master Password baru: ")
+    if not password_baru:
+        print("Master password baru tidak boleh kosong.", file=sys.stderr)
+        return 1
+
+    def progress(tabel, total):
+        print(f"{total} data dienkripsi ulang ({tabel})", file=sys.stderr)
+
+    try:
+        db.ganti_master_password(args.profil, session, password_baru, args.batch_size, progress)
+    except (ValueError, RuntimeError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+def print_laporan_backup(laporan):
+    print(f"{laporan['file']}: {laporan['halaman']} halaman, {laporan['byte_file']:,} byte file, "
+          f"{laporan['detik']:.2f} detik ({laporan['mb_per_detik']:.1f} MB/detik)", file=sys.stderr)
+
+
+def cmd_backup(args):
+    import backup
+    laporan = backup.buat_snapshot(args.folder or backup.DEFAULT_FOLDER, args.penuh)
+    print(f"Snapshot {laporan['jenis']}: {laporan['halaman_ditulis']} halaman disimpan.", file=sys.stderr)
+    print_laporan_backup(laporan)
+    return 0
+
+
+def cmd_restore(args):
+    import backup
+    try:
+        laporan = backup.pulihkan(args.snapshot, args.folder or backup.DEFAULT_FOLDER)
+    except (ValueError, RuntimeError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"Database dipulihkan dari {laporan['rantai']} snapshot.", file=sys.stderr)
+    print_laporan_backup(laporan)
+    return 0
+
+
+COMMANDS = {
+    "balance": cmd_balance,
+    "add": cmd_add,
+    "transfer": cmd_transfer,
+    "history": cmd_history,
+    "search": cmd_search,
+    "export": cmd_export,
+    "import": cmd_import,
+    "archive": cmd_archive,
+    "budget": cmd_budget,
+    "recurring-add": cmd_recurring_add,
+    "recurring-list": cmd_recurring_list,
+    "recurring-delete": cmd_recurring_delete,
+    "recurring-post": cmd_recurring_post,
+    "change-password": cmd_change_password,
+}
+
+
+def run(args):
+    """Runs one subcommand and returns the process exit code."""
+    if args.command == "serve":
+        # asyncio and the HTTP layer are only loaded for server mode
+        import server
+        return server.run(args)
+    # Backups cover the whole database file, not one profile
+    if args.command == "backup":
+        return cmd_backup(args)
+    if args.command == "restore":
+        return cmd_restore(args)
+    session = login(args.profil)
+    if session is None:
+        return 1
+    if args.command != "change-password" and db.rotasi_tertunda(args.profil):
+        print("Penggantian master password belum selesai; jalankan 'change-password' lagi "
+              "dengan password baru yang sama.", file=sys.stderr)
+        return 1
+    return COMMANDS[args.command](args, session)
@@ -3,19 +3,114 @@
 import sqlite3
 import datetime
 import base64
-from lib.crypt import derive_key, encrypt, decrypt
+import calendar
+import re
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+from lib.crypt import (derive_key, encrypt, decrypt, encrypt_many, decrypt_many, reencrypt_many, SessionKey,
+                       VERSIONED_PREFIX)
 import os
 
 DB_FILE = "app_orang_secure.db"
 
+# Connection tuning, read when a thread opens its connection
+DB_CACHE_SIZE_KB = int(os.environ.get("APP_DB_CACHE_KB", 16 * 1024))
+DB_MMAP_SIZE = 256 * 1024 * 1024
+DB_BUSY_TIMEOUT_MS = 5000
+DB_STATEMENT_CACHE = 256
+
+_local = threading.local()
+
+
+class SharedConnection(sqlite3.Connection):
+    """Long-lived per-thread connection.
+
+    close() is a no-op so existing open/close call sites reuse the same
+    connection, and commit() is deferred while a transaction() block is open.
+    """
+
+    depth = 0
+    # (stamp, {key: count}) for count_transactions, see _data_stamp
+    counts = None
+
+    def commit(self):
+        if self.depth == 0:
+            super().commit()
+
+    def close(self):
+        pass
+
+    def really_close(self):
+        super().close()
+
 
 def get_db_connection():
-    """Establishes and returns a database connection."""
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
+    """Returns this thread's database connection, opening and tuning it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != DB_FILE:
+        if conn is not None:
+            conn.really_close()
+        conn = sqlite3.connect(DB_FILE, factory=SharedConnection, cached_statements=DB_STATEMENT_CACHE)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        _local.conn, _local.path = conn, DB_FILE
     return conn
 
 
+def close_db_connection():
+    """Closes this thread's connection; the next get_db_connection reopens it."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.really_close()
+        _local.conn = None
+
+
+@contextmanager
+def transaction(immediate=False):
+    """Groups several database calls into one commit; nested blocks join the outer one.
+
+        with db.transaction():
+            db.tambah_transaksi(...)
+            db.tambah_transaksi(...)
+
+    With immediate=True the write lock is taken up front, so values read inside
+    the block (e.g. a balance check) cannot change before the block commits.
+    A nested block runs inside a SAVEPOINT: if it raises, its own writes are
+    rolled back, so an outer block that catches the error commits only the rest.
+    """
+    conn = get_db_connection()
+    savepoint = None
+    if conn.depth > 0:
+        # Open the outer transaction first so releasing the savepoint never commits
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        savepoint = f"transaksi_{conn.depth}"
+        conn.execute(f"SAVEPOINT {savepoint}")
+    elif immediate and not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    conn.depth += 1
+    try:
+        yield conn
+    except BaseException:
+        conn.depth -= 1
+        if savepoint:
+            conn.execute(f"ROLLBACK TO {savepoint}")
+            conn.execute(f"RELEASE {savepoint}")
+        elif conn.depth == 0:
+            conn.rollback()
+        raise
+    conn.depth -= 1
+    if savepoint:
+        conn.execute(f"RELEASE {savepoint}")
+    conn.commit()
+
+
 def setup_database():
     """Creates all necessary tables if they don't exist."""
     conn = get_db_connection()
@@ -24,8 +119,16 @@ def setup_database():
     CREATE TABLE IF NOT EXISTS orang (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         nama TEXT NOT NULL,
-        master_password_hash TEXT NOT NULL
+        master_password_hash TEXT NOT NULL,
+        kunci_salt TEXT,
+        cipher_biner INTEGER NOT NULL DEFAULT 0,
+        kategori_diklaim INTEGER NOT NULL DEFAULT 0
     )''')
+    _ensure_column(c, "orang", "kunci_salt", "TEXT")
+    # 1 once the profile stores new ciphertexts as BLOBs (format v3)
+    _ensure_column(c, "orang", "cipher_biner", "INTEGER NOT NULL DEFAULT 0")
+    # 1 once the categories created before owners existed were assigned (see klaim_kategori)
+    _ensure_column(c, "orang", "kategori_diklaim", "INTEGER NOT NULL DEFAULT 0")
     c.execute('''
     CREATE TABLE IF NOT EXISTS account (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -37,9 +140,15 @@ def setup_database():
     CREATE TABLE IF NOT EXISTS kategori (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         nama TEXT NOT NULL,
-        tipe TEXT CHECK(tipe IN ('pemasukan', 'pengeluaran'))
+        tipe TEXT CHECK(tipe IN ('pemasukan', 'pengeluaran')),
+        orang_id INTEGER,
+        penanda TEXT
     )''')
-    c.execute('''
+    # Every category belongs to one profile; built-in ones (e.g. transfers) are
+    # found by owner + marker, not by decrypting names
+    _ensure_column(c, "kategori", "orang_id", "INTEGER")
+    _ensure_column(c, "kategori", "penanda", "TEXT")
+    c.execute(f'''
     CREATE TABLE IF NOT EXISTS transaksi (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         account_id INTEGER,
@@ -48,58 +157,400 @@ def setup_database():
         jumlah REAL,
         tanggal TEXT,
         deskripsi TEXT,
+        waktu {_WAKTU_DECL},
+        FOREIGN KEY (account_id) REFERENCES account(id),
+        FOREIGN KEY (kategori_id) REFERENCES kategori(id)
+    )''')
+    # Sortable unix-seconds copy of tanggal for period filters; derived by SQLite,
+    # so rows of older databases get it as soon as the column is added
+    _ensure_column(c, "transaksi", "waktu", _WAKTU_DECL)
+    # Materialized per-account balance and per-month totals, kept in step with
+    # transaksi by the triggers below
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS account_balance (
+        account_id INTEGER PRIMARY KEY,
+        saldo REAL NOT NULL DEFAULT 0,
+        FOREIGN KEY (account_id) REFERENCES account(id)
+    )''')
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS account_month_summary (
+        account_id INTEGER,
+        bulan TEXT,
+        pemasukan REAL NOT NULL DEFAULT 0,
+        pengeluaran REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (account_id, bulan),
+        FOREIGN KEY (account_id) REFERENCES account(id)
+    )''')
+    c.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transaksi_insert AFTER INSERT ON transaksi
+    BEGIN {_apply_to_ringkasan("NEW", 1)}
+    END""")
+    c.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transaksi_delete AFTER DELETE ON transaksi
+    BEGIN {_apply_to_ringkasan("OLD", -1)}
+    END""")
+    c.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transaksi_update
+    AFTER UPDATE OF account_id, tipe, jumlah, tanggal ON transaksi
+    BEGIN {_apply_to_ringkasan("OLD", -1)} {_apply_to_ringkasan("NEW", 1)}
+    END""")
+    # Last committed row of each CSV import, so an interrupted import can resume
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS import_progress (
+        orang_id INTEGER,
+        sumber TEXT,
+        baris INTEGER NOT NULL,
+        PRIMARY KEY (orang_id, sumber),
+        FOREIGN KEY (orang_id) REFERENCES orang(id)
+    )''')
+    # Blind index for description search: keyed HMAC tokens of each word
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS transaksi_token (
+        token BLOB NOT NULL,
+        transaksi_id INTEGER NOT NULL,
+        PRIMARY KEY (token, transaksi_id),
+        FOREIGN KEY (transaksi_id) REFERENCES transaksi(id)
+    ) WITHOUT ROWID''')
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS blind_index_progress (
+        orang_id INTEGER PRIMARY KEY,
+        last_id INTEGER NOT NULL DEFAULT 0,
+        selesai INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (orang_id) REFERENCES orang(id)
+    )''')
+    # Totals of archived transactions per account, month, category and type;
+    # the rows themselves live in the yearly transaksi_arsip_<tahun> tables
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS arsip_ringkasan (
+        account_id INTEGER,
+        bulan TEXT,
+        kategori_id INTEGER,
+        tipe TEXT,
+        jumlah REAL NOT NULL DEFAULT 0,
+        banyak INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (account_id, bulan, kategori_id, tipe),
+        FOREIGN KEY (account_id) REFERENCES account(id)
+    )''')
+    # Monthly budget per category, and each profile's running total per
+    # category and month, kept in step with transaksi by triggers so budget
+    # checks are single primary-key lookups
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS anggaran (
+        orang_id INTEGER,
+        kategori_id INTEGER,
+        jumlah REAL NOT NULL,
+        PRIMARY KEY (orang_id, kategori_id),
+        FOREIGN KEY (orang_id) REFERENCES orang(id),
+        FOREIGN KEY (kategori_id) REFERENCES kategori(id)
+    )''')
+    needs_kategori_summary = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'kategori_month_summary'"
+    ).fetchone() is None
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS kategori_month_summary (
+        orang_id INTEGER,
+        kategori_id INTEGER,
+        bulan TEXT,
+        jumlah REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (orang_id, kategori_id, bulan)
+    ) WITHOUT ROWID''')
+    c.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transaksi_insert_kategori AFTER INSERT ON transaksi
+    BEGIN {_apply_to_kategori_summary("NEW", 1)}
+    END""")
+    c.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transaksi_delete_kategori AFTER DELETE ON transaksi
+    BEGIN {_apply_to_kategori_summary("OLD", -1)}
+    END""")
+    c.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transaksi_update_kategori
+    AFTER UPDATE OF account_id, kategori_id, jumlah, tanggal ON transaksi
+    BEGIN {_apply_to_kategori_summary("OLD", -1)} {_apply_to_kategori_summary("NEW", 1)}
+    END""")
+    # Master password change in progress: the new password hash and key salt
+    # wait here until every row is re-encrypted, then replace those in orang
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS rotasi_kunci (
+        orang_id INTEGER PRIMARY KEY,
+        master_password_hash TEXT NOT NULL,
+        kunci_salt TEXT NOT NULL,
+        tabel TEXT NOT NULL,
+        last_id INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (orang_id) REFERENCES orang(id)
+    )''')
+    # Recurring transaction rules; jatuh_tempo is the next date still to be
+    # posted (NULL once the rule has ended)
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS transaksi_berulang (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        account_id INTEGER NOT NULL,
+        kategori_id INTEGER NOT NULL,
+        tipe TEXT CHECK(tipe IN ('pemasukan', 'pengeluaran')),
+        jumlah REAL NOT NULL,
+        deskripsi TEXT,
+        frekuensi TEXT CHECK(frekuensi IN ('harian', 'mingguan', 'bulanan', 'tahunan')),
+        tanggal_awal TEXT NOT NULL,
+        jatuh_tempo TEXT,
+        berakhir TEXT,
         FOREIGN KEY (account_id) REFERENCES account(id),
         FOREIGN KEY (kategori_id) REFERENCES kategori(id)
     )''')
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_transaksi_delete_token AFTER DELETE ON transaksi
+    BEGIN DELETE FROM transaksi_token WHERE transaksi_id = OLD.id; END""")
+    # Indexes for per-account lookups and newest-first history paging
+    c.execute("CREATE INDEX IF NOT EXISTS idx_account_orang ON account(orang_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_kategori_orang ON kategori(orang_id, tipe)")
+    # History, search and period filters order and range-scan on waktu, so the
+    # tanggal-ordered indexes only slow down inserts
+    c.execute("DROP INDEX IF EXISTS idx_transaksi_tipe_tanggal")
+    c.execute("DROP INDEX IF EXISTS idx_transaksi_account_tipe_tanggal")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transaksi_tipe_waktu ON transaksi(tipe, waktu, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transaksi_account_waktu ON transaksi(account_id, waktu, tipe, jumlah)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transaksi_token_id ON transaksi_token(transaksi_id)")
+    c.execute("""CREATE INDEX IF NOT EXISTS idx_transaksi_berulang_jatuh_tempo
+                 ON transaksi_berulang(jatuh_tempo) WHERE jatuh_tempo IS NOT NULL""")
+    c.execute("""CREATE UNIQUE INDEX IF NOT EXISTS idx_kategori_penanda
+                 ON kategori(orang_id, penanda, tipe) WHERE penanda IS NOT NULL""")
     conn.commit()
+    needs_rebuild = (c.execute("SELECT 1 FROM transaksi LIMIT 1").fetchone() is not None
+                     and (needs_kategori_summary
+                          or c.execute("SELECT 1 FROM account_balance LIMIT 1").fetchone() is None))
     conn.close()
+    if needs_rebuild:
+        # Database from before the summary tables existed
+        rebuild_ringkasan()
+
+
+def _apply_to_ringkasan(row, sign):
+    """Trigger body adding (sign=1) or removing (sign=-1) one transaksi row from the summaries."""
+    return f"""
+        INSERT INTO account_balance (account_id, saldo)
+        VALUES ({row}.account_id,
+                {sign} * (CASE WHEN {row}.tipe = 'pemasukan' THEN {row}.jumlah ELSE -{row}.jumlah END))
+        ON CONFLICT(account_id) DO UPDATE SET saldo = saldo + excluded.saldo;
+        INSERT INTO account_month_summary (account_id, bulan, pemasukan, pengeluaran)
+        VALUES ({row}.account_id, substr({row}.tanggal, 1, 7),
+                {sign} * (CASE WHEN {row}.tipe = 'pemasukan' THEN {row}.jumlah ELSE 0 END),
+                {sign} * (CASE WHEN {row}.tipe = 'pengeluaran' THEN {row}.jumlah ELSE 0 END))
+        ON CONFLICT(account_id, bulan) DO UPDATE SET
+            pemasukan = pemasukan + excluded.pemasukan,
+            pengeluaran = pengeluaran + excluded.pengeluaran;"""
+
+
+def _apply_to_kategori_summary(row, sign):
+    """Trigger body adding (sign=1) or removing (sign=-1) one transaksi row from kategori_month_summary."""
+    return f"""
+        INSERT INTO kategori_month_summary (orang_id, kategori_id, bulan, jumlah)
+        SELECT orang_id, {row}.kategori_id, substr({row}.tanggal, 1, 7), {sign} * {row}.jumlah
+        FROM account WHERE id = {row}.account_id
+        ON CONFLICT(orang_id, kategori_id, bulan) DO UPDATE SET jumlah = jumlah + excluded.jumlah;"""
+
+
+def rebuild_ringkasan():
+    """Recomputes account_balance, account_month_summary and kategori_month_summary from transaksi.
+
+    Returns the number of accounts whose stored balance disagreed with the
+    recomputed one, so the command doubles as a consistency check.
+    """
+    conn = get_db_connection()
+    # Archived transactions count through their summaries
+    fresh = dict(conn.execute("""
+        SELECT account_id, SUM(CASE WHEN tipe = 'pemasukan' THEN jumlah ELSE -jumlah END)
+        FROM (SELECT account_id, tipe, jumlah FROM transaksi
+              UNION ALL SELECT account_id, tipe, jumlah FROM arsip_ringkasan)
+        GROUP BY account_id
+    """).fetchall())
+    stored = dict(conn.execute("SELECT account_id, saldo FROM account_balance").fetchall())
+    mismatches = sum(1 for acc_id in fresh.keys() | stored.keys()
+                     if abs(fresh.get(acc_id, 0) - stored.get(acc_id, 0)) > 0.005)
+
+    conn.execute("DELETE FROM account_balance")
+    conn.execute("DELETE FROM account_month_summary")
+    conn.executemany("INSERT INTO account_balance (account_id, saldo) VALUES (?, ?)", fresh.items())
+    conn.execute("""
+        INSERT INTO account_month_summary (account_id, bulan, pemasukan, pengeluaran)
+        SELECT account_id, bulan,
+            SUM(CASE WHEN tipe = 'pemasukan' THEN jumlah ELSE 0 END),
+            SUM(CASE WHEN tipe = 'pengeluaran' THEN jumlah ELSE 0 END)
+        FROM (SELECT account_id, substr(tanggal, 1, 7) AS bulan, tipe, jumlah FROM transaksi
+              UNION ALL SELECT account_id, bulan, tipe, jumlah FROM arsip_ringkasan)
+        GROUP BY account_id, bulan
+    """)
+    conn.execute("DELETE FROM kategori_month_summary")
+    conn.execute("""
+        INSERT INTO kategori_month_summary (orang_id, kategori_id, bulan, jumlah)
+        SELECT a.orang_id, r.kategori_id, r.bulan, SUM(r.jumlah)
+        FROM (SELECT account_id, kategori_id, substr(tanggal, 1, 7) AS bulan, jumlah FROM transaksi
+              UNION ALL SELECT account_id, kategori_id, bulan, jumlah FROM arsip_ringkasan) r
+        JOIN account a ON r.account_id = a.id
+        GROUP BY a.orang_id, r.kategori_id, r.bulan
+    """)
+    conn.commit()
+    conn.close()
+    return mismatches
+
+
+_WAKTU_DECL = "INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', tanggal) AS INTEGER)) VIRTUAL"
+
+
+def _ensure_column(c, table, column, decl):
+    """Adds a column to a table created by an older version of the app."""
+    # table_xinfo also lists generated columns
+    columns = [row[1] for row in c.execute(f"PRAGMA table_xinfo({table})")]
+    if column not in columns:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+# --- Session ---
+
+
+def verify_master_password(password_hash, master_password):
+    """Checks a master password against the salt + key stored in orang.master_password_hash."""
+    raw_hash = base64.b64decode(password_hash)
+    salt, key_stored = raw_hash[:16], raw_hash[16:]
+    return derive_key(master_password, salt) == key_stored
+
+
+def buka_sesi(orang_id, master_password):
+    """Derives the session key for a verified profile, creating its salt on first use.
+
+    On the first login after upgrading, the profile also claims its
+    categories from before owners existed (see klaim_kategori).
+    """
+    conn = get_db_connection()
+    row = conn.execute("SELECT kunci_salt, cipher_biner FROM orang WHERE id=?", (orang_id,)).fetchone()
+    if row["kunci_salt"]:
+        salt = base64.b64decode(row["kunci_salt"])
+    else:
+        salt = os.urandom(16)
+        conn.execute("UPDATE orang SET kunci_salt=? WHERE id=?", (base64.b64encode(salt).decode(), orang_id))
+        conn.commit()
+    conn.close()
+    session = SessionKey(master_password, salt, biner=bool(row["cipher_biner"]))
+    klaim_kategori(orang_id, session)
+    return session
+
+
+def klaim_kategori(orang_id, session):
+    """Assigns the unowned categories this profile's key can read to the profile; returns how many.
+
+    Categories created before owners existed have no orang_id. v2/v3 names
+    carry an AES-GCM tag, so decrypting one proves it is the profile's. A
+    legacy v1 name read with the wrong password often still decodes (as
+    garbage), so one is only taken when it decodes to printable text and
+    either this profile's transactions use it or no other profile's do.
+    Runs once per profile: afterwards the profile is marked and this returns 0.
+    """
+    conn = get_db_connection()
+    if conn.execute("SELECT kategori_diklaim FROM orang WHERE id=?", (orang_id,)).fetchone()[0]:
+        return 0
+    rows = conn.execute("SELECT id, nama FROM kategori WHERE orang_id IS NULL ORDER BY id").fetchall()
+    pemakai = {}
+    for kat_id, pemilik in conn.execute("""
+        SELECT DISTINCT s.kategori_id, s.orang_id FROM kategori_month_summary s
+        JOIN kategori k ON k.id = s.kategori_id
+        WHERE k.orang_id IS NULL
+    """):
+        pemakai.setdefault(kat_id, set()).add(pemilik)
+    milik = []
+    for row, nama in zip(rows, decrypt_many((row["nama"] for row in rows), session)):
+        if nama == "DECRYPTION_ERROR":
+            continue
+        if not isinstance(row["nama"], bytes) and not row["nama"].startswith(VERSIONED_PREFIX):
+            dipakai = pemakai.get(row["id"], set())
+            if not nama.isprintable() or (dipakai and orang_id not in dipakai):
+                continue
+        milik.append(row["id"])
+        session.names.put(("kategori", row["id"]), nama)
+    with transaction():
+        conn.executemany("UPDATE kategori SET orang_id=? WHERE id=? AND orang_id IS NULL",
+                         [(orang_id, kat_id) for kat_id in milik])
+        conn.execute("UPDATE orang SET kategori_diklaim=1 WHERE id=?", (orang_id,))
+    return len(milik)
 
 # --- CRUD Functions ---
 
 
+def _hash_master_password(master_password):
+    """Salt + key in the format verify_master_password checks."""
+    salt = os.urandom(16)
+    return base64.b64encode(salt + derive_key(master_password, salt)).decode()
+
+
 def tambah_orang(nama, master_password):
     conn = get_db_connection()
     c = conn.cursor()
-    salt = os.urandom(16)
-    key = derive_key(master_password, salt)
-    password_hash = base64.b64encode(salt + key).decode()
-    c.execute("INSERT INTO orang (nama, master_password_hash) VALUES (?, ?)", (nama, password_hash))
+    password_hash = _hash_master_password(master_password)
+    kunci_salt = base64.b64encode(os.urandom(16)).decode()
+    # New profiles have nothing to migrate or claim, so they start with BLOB storage
+    c.execute("""
+        INSERT INTO orang (nama, master_password_hash, kunci_salt, cipher_biner, kategori_diklaim)
+        VALUES (?, ?, ?, 1, 1)
+    """, (nama, password_hash, kunci_salt))
     conn.commit()
     last_id = c.lastrowid
     conn.close()
     return last_id
 
 
-def tambah_account(orang_id, nama_account, master_password):
-    nama_encrypted = encrypt(nama_account, master_password)
+def tambah_account(orang_id, nama_account, session):
+    nama_encrypted = encrypt(nama_account, session)
     conn = get_db_connection()
-    conn.execute("INSERT INTO account (orang_id, nama_account) VALUES (?, ?)", (orang_id, nama_encrypted))
+    c = conn.cursor()
+    c.execute("INSERT INTO account (orang_id, nama_account) VALUES (?, ?)", (orang_id, nama_encrypted))
     conn.commit()
+    last_id = c.lastrowid
     conn.close()
+    session.names.put(("account", last_id), nama_account)
+    return last_id
 
 
-def tambah_kategori(nama, tipe, master_password):
-    nama_encrypted = encrypt(nama, master_password)
+def tambah_kategori(orang_id, nama, tipe, session):
+    nama_encrypted = encrypt(nama, session)
     conn = get_db_connection()
     c = conn.cursor()
-    c.execute("INSERT INTO kategori (nama, tipe) VALUES (?, ?)", (nama_encrypted, tipe))
+    c.execute("INSERT INTO kategori (orang_id, nama, tipe) VALUES (?, ?, ?)", (orang_id, nama_encrypted, tipe))
     conn.commit()
     last_id = c.lastrowid
     conn.close()
+    session.names.put(("kategori", last_id), nama)
     return last_id
 
 
-def tambah_transaksi(account_id, kategori_id, tipe, jumlah, deskripsi, master_password):
-    desc_encrypted = encrypt(deskripsi, master_password)
+def tambah_transaksi(account_id, kategori_id, tipe, jumlah, deskripsi, session):
+    desc_encrypted = encrypt(deskripsi, session)
     tanggal = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     conn = get_db_connection()
-    conn.execute("""
-        INSERT INTO transaksi (account_id, kategori_id, tipe, jumlah, tanggal, deskripsi)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (account_id, kategori_id, tipe, jumlah, tanggal, desc_encrypted))
+    _insert_transaksi(conn, [(account_id, kategori_id, tipe, jumlah, tanggal, desc_encrypted)], [deskripsi], session)
     conn.commit()
     conn.close()
 
+
+def _insert_transaksi(conn, rows, deskripsi_plain, session):
+    """Inserts (account_id, kategori_id, tipe, jumlah, tanggal, encrypted deskripsi) rows
+    with executemany and writes their search tokens from the matching plaintexts."""
+    conn.executemany("""
+        INSERT INTO transaksi (account_id, kategori_id, tipe, jumlah, tanggal, deskripsi)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+    # One statement under the write lock assigns consecutive ids
+    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    first_id = last_id - len(rows) + 1
+    _index_deskripsi(conn, zip(range(first_id, last_id + 1), deskripsi_plain), session)
+
+
+def _search_words(text):
+    """Normalizes text into the distinct lowercase words used for search tokens."""
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def _index_deskripsi(conn, pairs, session):
+    """Writes blind-index tokens for (transaksi_id, plaintext deskripsi) pairs."""
+    conn.executemany(
+        "INSERT OR IGNORE INTO transaksi_token (token, transaksi_id) VALUES (?, ?)",
+        [(session.blind_index(word), trans_id) for trans_id, text in pairs for word in _search_words(text)]
+    )
+
 # --- Getter Functions ---
 
 
@@ -118,146 +569,1076 @@ def get_orang_by_id(orang_id):
     return orang
 
 
-def get_accounts_by_orang(orang_id, master_password):
+_NAME_COLUMNS = {"account": "nama_account", "kategori": "nama"}
+
+
+def _resolve_names(conn, table, ids, session, chunk_size=500):
+    """Returns {id: name} for account/kategori ids, decrypting only names missing from the session cache."""
+    names = {}
+    missing = []
+    for row_id in dict.fromkeys(ids):
+        name = session.names.get((table, row_id))
+        if name is None:
+            missing.append(row_id)
+        else:
+            names[row_id] = name
+    for i in range(0, len(missing), chunk_size):
+        chunk = missing[i:i + chunk_size]
+        rows = conn.execute(
+            f"SELECT id, {_NAME_COLUMNS[table]} FROM {table} WHERE id IN ({','.join('?' * len(chunk))})",
+            chunk
+        ).fetchall()
+        for row, name in zip(rows, decrypt_many((row[1] for row in rows), session)):
+            session.names.put((table, row[0]), name)
+            names[row[0]] = name
+    return names
+
+
+def get_names(table, ids, session):
+    """Returns {id: decrypted name} for "account" or "kategori" ids, using the session cache."""
     conn = get_db_connection()
-    encrypted_accounts = conn.execute("SELECT id, nama_account FROM account WHERE orang_id=?", (orang_id,)).fetchall()
+    names = _resolve_names(conn, table, ids, session)
     conn.close()
-    decrypted = [(acc['id'], decrypt(acc['nama_account'], master_password)) for acc in encrypted_accounts]
-    return decrypted
+    return names
 
 
-def get_account_details(account_id, master_password):
+def get_accounts_by_orang(orang_id, session):
     conn = get_db_connection()
-    acc = conn.execute("SELECT id, nama_account FROM account WHERE id=?", (account_id,)).fetchone()
+    ids = [row['id'] for row in conn.execute("SELECT id FROM account WHERE orang_id=?", (orang_id,))]
+    names = _resolve_names(conn, "account", ids, session)
     conn.close()
-    if not acc:
+    return [(acc_id, names[acc_id]) for acc_id in ids]
+
+
+def get_account_details(account_id, session):
+    conn = get_db_connection()
+    names = _resolve_names(conn, "account", [account_id], session)
+    conn.close()
+    if account_id not in names:
         return None
     return {
-        "id": acc["id"],
-        "nama": decrypt(acc["nama_account"], master_password)
+        "id": account_id,
+        "nama": names[account_id]
     }
 
 
-def get_kategori(tipe, master_password):
+def get_kategori(orang_id, tipe, session):
     conn = get_db_connection()
-    encrypted_kategori = conn.execute("SELECT id, nama FROM kategori WHERE tipe=?", (tipe,)).fetchall()
+    ids = [row['id'] for row in conn.execute("SELECT id FROM kategori WHERE orang_id=? AND tipe=?", (orang_id, tipe))]
+    names = _resolve_names(conn, "kategori", ids, session)
     conn.close()
-    decrypted = [(kat['id'], decrypt(kat['nama'], master_password)) for kat in encrypted_kategori]
-    return decrypted
+    return [(kat_id, names[kat_id]) for kat_id in ids]
+
 
+def get_dashboard_summary(orang_id, month, dari=None, sampai=None):
+    """Returns {account_id: {saldo, pemasukan, pengeluaran}} for a user in one query.
 
-def get_transactions_for_dashboard(account_id):
+    `month` is a "YYYY-MM" string; the income/expense totals cover that month only.
+    When `dari` and/or `sampai` are given, the totals cover that period instead
+    (see _periode) and are summed from an index range scan over transaksi,
+    plus the archive summaries of months that start inside the period.
+    """
     conn = get_db_connection()
-    trans = conn.execute("SELECT tipe, jumlah, tanggal FROM transaksi WHERE account_id=?", (account_id,)).fetchall()
+    if dari is not None or sampai is not None:
+        periode, params = _periode(dari, sampai)
+        bulan, bulan_params = "", ()
+        if dari is not None:
+            bulan += " AND r.bulan || '-01' >= ?"
+            bulan_params += (dari.strftime("%Y-%m-%d"),)
+        if sampai is not None:
+            bulan += " AND r.bulan || '-01' < ?"
+            bulan_params += (sampai.strftime("%Y-%m-%d"),)
+        total = """
+            (SELECT COALESCE(SUM(t.jumlah), 0) FROM transaksi t
+             WHERE t.account_id = a.id AND t.tipe = '{tipe}' {periode})
+            + (SELECT COALESCE(SUM(r.jumlah), 0) FROM arsip_ringkasan r
+               WHERE r.account_id = a.id AND r.tipe = '{tipe}' {bulan})"""
+        rows = conn.execute(f"""
+            SELECT a.id AS account_id,
+                COALESCE(b.saldo, 0) AS saldo,
+                {total.format(tipe="pemasukan", periode=periode, bulan=bulan)} AS pemasukan,
+                {total.format(tipe="pengeluaran", periode=periode, bulan=bulan)} AS pengeluaran
+            FROM account a
+            LEFT JOIN account_balance b ON b.account_id = a.id
+            WHERE a.orang_id = ?
+        """, (*params, *bulan_params, *params, *bulan_params, orang_id)).fetchall()
+        conn.close()
+        return {row["account_id"]: dict(row) for row in rows}
+    rows = conn.execute("""
+        SELECT a.id AS account_id,
+            COALESCE(b.saldo, 0) AS saldo,
+            COALESCE(m.pemasukan, 0) AS pemasukan,
+            COALESCE(m.pengeluaran, 0) AS pengeluaran
+        FROM account a
+        LEFT JOIN account_balance b ON b.account_id = a.id
+        LEFT JOIN account_month_summary m ON m.account_id = a.id AND m.bulan = ?
+        WHERE a.orang_id = ?
+    """, (month, orang_id)).fetchall()
     conn.close()
-    return trans
+    return {row["account_id"]: dict(row) for row in rows}
 
 
 def get_account_balance(account_id):
-    """Calculates and returns the current balance for a single account."""
+    """Returns the current balance for a single account."""
     conn = get_db_connection()
-    trans = conn.execute("SELECT tipe, jumlah FROM transaksi WHERE account_id=?", (account_id,)).fetchall()
+    row = conn.execute("SELECT saldo FROM account_balance WHERE account_id=?", (account_id,)).fetchone()
     conn.close()
-    saldo = sum(t['jumlah'] if t['tipe'] == 'pemasukan' else -t['jumlah'] for t in trans)
-    return saldo
+    return row["saldo"] if row else 0
+
+
+def _waktu(value):
+    """Unix seconds of a date or naive datetime, computed the way transaksi.waktu is."""
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    # strftime('%s') reads tanggal as UTC, so the bound is converted the same way
+    return calendar.timegm(value.timetuple())
+
 
+def _periode(dari, sampai):
+    """Returns (sql, params) restricting transaksi t to dari <= tanggal < sampai.
 
-def count_transactions(orang_id, tipe):
-    """Counts total transactions for a user of a specific type for pagination."""
+    Either bound may be None. Bounds are dates or datetimes; a date means
+    midnight at its start, so sampai=date(2024, 2, 1) ends with January.
+    """
+    sql, params = "", ()
+    if dari is not None:
+        sql += " AND t.waktu >= ?"
+        params += (_waktu(dari),)
+    if sampai is not None:
+        sql += " AND t.waktu < ?"
+        params += (_waktu(sampai),)
+    return sql, params
+
+
+def _sumber_transaksi(conn, arsip):
+    """FROM target for transaction queries: transaksi, or with arsip=True also every archive table."""
+    tables = _tabel_arsip(conn) if arsip else []
+    if not tables:
+        return "transaksi"
+    return "(" + " UNION ALL ".join(f"SELECT {_ARSIP_COLUMNS} FROM {table}"
+                                    for table in ["transaksi", *tables]) + ")"
+
+
+def _data_stamp(conn):
+    """Changes whenever the database may have changed since the last call on this connection.
+
+    data_version moves when any other connection, in this process or
+    another, commits; total_changes counts this connection's own writes.
+    """
+    return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+
+def count_transactions(orang_id, tipe=None, dari=None, sampai=None, arsip=False):
+    """Counts total transactions for a user, optionally of a specific type and period, for pagination.
+
+    Archived transactions are counted only with arsip=True. Results are
+    cached per connection until the database changes, whichever process
+    (CLI, server or menu app) writes it.
+    """
+    key = (orang_id, tipe, dari, sampai, arsip)
     conn = get_db_connection()
+    stamp = _data_stamp(conn)
+    if conn.counts is None or conn.counts[0] != stamp:
+        conn.counts = (stamp, {})
+    count = conn.counts[1].get(key)
+    if count is not None:
+        return count
     c = conn.cursor()
-    c.execute("""
-        SELECT COUNT(t.id) 
-        FROM transaksi t
+    query = f"""
+        SELECT COUNT(t.id)
+        FROM {_sumber_transaksi(conn, arsip)} t
         JOIN account a ON t.account_id = a.id
-        WHERE a.orang_id = ? AND t.tipe = ?
-    """, (orang_id, tipe))
+        WHERE a.orang_id = ?
+    """
+    params = (orang_id,)
+    if tipe is not None:
+        query += " AND t.tipe = ?"
+        params += (tipe,)
+    periode, periode_params = _periode(dari, sampai)
+    c.execute(query + periode, params + periode_params)
     count = c.fetchone()[0]
     conn.close()
+    conn.counts[1][key] = count
     return count
 
 
-def get_transactions_paginated(orang_id, master_password, tipe, page=1, page_size=20):
-    """Retrieves a paginated list of transactions, decrypting them on the fly."""
-    offset = (page - 1) * page_size
-    conn = get_db_connection()
-    query = """
-        SELECT t.tanggal, a.nama_account, k.nama as nama_kategori, t.jumlah, t.deskripsi
-        FROM transaksi t
-        JOIN account a ON t.account_id = a.id
-        JOIN kategori k ON t.kategori_id = k.id
-        WHERE a.orang_id = ? AND t.tipe = ?
-        ORDER BY t.tanggal DESC
-        LIMIT ? OFFSET ?
-    """
-    encrypted_rows = conn.execute(query, (orang_id, tipe, page_size, offset)).fetchall()
-    conn.close()
-    
+_HISTORY_SELECT = """
+    SELECT t.id, t.tanggal, t.waktu, t.tipe, t.account_id, t.kategori_id, t.jumlah, t.deskripsi
+    FROM {sumber} t
+    JOIN account a ON t.account_id = a.id
+    WHERE a.orang_id = ? AND t.tipe = ?
+"""
+
+
+def _decrypt_history_rows(conn, encrypted_rows, session):
+    # Names come from the session cache; only descriptions are decrypted per row
+    account_names = _resolve_names(conn, "account", (row["account_id"] for row in encrypted_rows), session)
+    kategori_names = _resolve_names(conn, "kategori", (row["kategori_id"] for row in encrypted_rows), session)
+    deskripsi = decrypt_many((row["deskripsi"] for row in encrypted_rows), session)
     decrypted_rows = []
-    for row in encrypted_rows:
+    for row, desc in zip(encrypted_rows, deskripsi):
         decrypted_rows.append({
+            "id": row["id"],
             "tanggal": row["tanggal"],
-            "nama_account": decrypt(row["nama_account"], master_password),
-            "nama_kategori": decrypt(row["nama_kategori"], master_password),
+            "waktu": row["waktu"],
+            "tipe": row["tipe"],
+            "nama_account": account_names.get(row["account_id"], ""),
+            "nama_kategori": kategori_names.get(row["kategori_id"], ""),
             "jumlah": row["jumlah"],
-            "deskripsi": decrypt(row["deskripsi"], master_password)
+            "deskripsi": desc
         })
     return decrypted_rows
 
+
+def get_transactions_paginated(orang_id, session, tipe, page=1, page_size=20, dari=None, sampai=None,
+                               arsip=False):
+    """Retrieves a paginated list of transactions, decrypting them on the fly.
+
+    `dari`/`sampai` limit the list to a period, as in _periode; arsip=True
+    includes archived transactions.
+    """
+    offset = (page - 1) * page_size
+    periode, periode_params = _periode(dari, sampai)
+    conn = get_db_connection()
+    query = _HISTORY_SELECT.format(sumber=_sumber_transaksi(conn, arsip)) + periode + """
+        ORDER BY t.waktu DESC, t.id DESC
+        LIMIT ? OFFSET ?
+    """
+    encrypted_rows = conn.execute(query, (orang_id, tipe, *periode_params, page_size, offset)).fetchall()
+    decrypted_rows = _decrypt_history_rows(conn, encrypted_rows, session)
+    conn.close()
+    return decrypted_rows
+
+
+def get_transactions_seek(orang_id, session, tipe, after=None, before=None, page_size=20,
+                          dari=None, sampai=None, arsip=False):
+    """Retrieves one page of transactions by keyset position instead of OFFSET.
+
+    `after` is the (waktu, id) key of the last row shown and returns the next
+    (older) page; `before` is the key of the first row shown and returns the
+    previous (newer) page. With neither, the newest page is returned.
+    `dari`/`sampai` limit the pages to a period, as in _periode; arsip=True
+    includes archived transactions.
+    """
+    periode, periode_params = _periode(dari, sampai)
+    conn = get_db_connection()
+    history_select = _HISTORY_SELECT.format(sumber=_sumber_transaksi(conn, arsip))
+    if before is not None:
+        query = history_select + periode + """
+            AND (t.waktu, t.id) > (?, ?)
+            ORDER BY t.waktu ASC, t.id ASC
+            LIMIT ?
+        """
+        params = (orang_id, tipe, *periode_params, *before, page_size)
+    elif after is not None:
+        query = history_select + periode + """
+            AND (t.waktu, t.id) < (?, ?)
+            ORDER BY t.waktu DESC, t.id DESC
+            LIMIT ?
+        """
+        params = (orang_id, tipe, *periode_params, *after, page_size)
+    else:
+        query = history_select + periode + """
+            ORDER BY t.waktu DESC, t.id DESC
+            LIMIT ?
+        """
+        params = (orang_id, tipe, *periode_params, page_size)
+    encrypted_rows = conn.execute(query, params).fetchall()
+    if before is not None:
+        encrypted_rows.reverse()
+    decrypted_rows = _decrypt_history_rows(conn, encrypted_rows, session)
+    conn.close()
+    return decrypted_rows
+
 # --- Fitur Transfer ---
 
 
-def get_or_create_transfer_kategori(tipe, master_password):
-    """Finds the 'Transfer' category or creates it if it doesn't exist."""
-    nama_kategori = "Transfer Masuk" if tipe == "pemasukan" else "Transfer Keluar"
-    
-    kategori_list = get_kategori(tipe, master_password)
-    for kat_id, kat_nama in kategori_list:
-        if kat_nama == nama_kategori:
-            return kat_id
+class SaldoTidakCukupError(Exception):
+    """Raised when a transfer would overdraw its source account."""
+
+    def __init__(self, account_id, saldo):
+        super().__init__(f"Saldo akun {account_id} tidak mencukupi: Rp{saldo:,.2f}")
+        self.account_id = account_id
+        self.saldo = saldo
 
-    return tambah_kategori(nama_kategori, tipe, master_password)
+
+def get_or_create_transfer_kategori(orang_id, tipe, session):
+    """Finds the profile's 'Transfer' category by its marker or creates it if it doesn't exist."""
+    conn = get_db_connection()
+    row = conn.execute(
+        "SELECT id FROM kategori WHERE orang_id=? AND penanda='transfer' AND tipe=?", (orang_id, tipe)
+    ).fetchone()
+    if row:
+        return row["id"]
+
+    nama_kategori = "Transfer Masuk" if tipe == "pemasukan" else "Transfer Keluar"
+    # Categories created before the marker existed are found by name once, then marked
+    unmarked = [r["id"] for r in conn.execute(
+        "SELECT id FROM kategori WHERE orang_id=? AND tipe=? AND penanda IS NULL", (orang_id, tipe)
+    )]
+    names = _resolve_names(conn, "kategori", unmarked, session)
+    kat_id = next((k for k in unmarked if names.get(k) == nama_kategori), None)
+    if kat_id is None:
+        kat_id = tambah_kategori(orang_id, nama_kategori, tipe, session)
+    conn.execute("UPDATE kategori SET penanda='transfer' WHERE id=?", (kat_id,))
+    conn.commit()
+    return kat_id
 
 
-def transfer_dana(from_account_id, to_account_id, jumlah, master_password):
+def transfer_dana(orang_id, from_account_id, to_account_id, jumlah, session):
     """Creates two transactions to simulate a transfer."""
-    from_acc_name = get_account_details(from_account_id, master_password)['nama']
-    to_acc_name = get_account_details(to_account_id, master_password)['nama']
+    transfer_dana_batch(orang_id, [(from_account_id, to_account_id, jumlah)], session)
 
-    kat_keluar_id = get_or_create_transfer_kategori("pengeluaran", master_password)
-    kat_masuk_id = get_or_create_transfer_kategori("pemasukan", master_password)
 
-    deskripsi_keluar = f"Transfer ke akun {to_acc_name}"
-    deskripsi_masuk = f"Transfer dari akun {from_acc_name}"
+def transfer_dana_batch(orang_id, transfers, session):
+    """Runs many (from_account_id, to_account_id, jumlah) transfers in one transaction.
 
-    tambah_transaksi(from_account_id, kat_keluar_id, "pengeluaran", jumlah, deskripsi_keluar, master_password)
-    tambah_transaksi(to_account_id, kat_masuk_id, "pemasukan", jumlah, deskripsi_masuk, master_password)
+    Balances are checked against the running totals of the batch under the
+    write lock; if any transfer would overdraw its source account,
+    SaldoTidakCukupError is raised and nothing is written. A non-positive
+    amount, a transfer from an account to itself, or an account that does
+    not belong to `orang_id` raises ValueError.
+    """
+    transfers = list(transfers)
+    if not transfers:
+        return
+    for from_id, to_id, jumlah in transfers:
+        if not jumlah > 0:
+            raise ValueError("Jumlah transfer harus lebih dari 0.")
+        if from_id == to_id:
+            raise ValueError("Akun sumber dan tujuan tidak boleh sama.")
+    tanggal = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    with transaction(immediate=True) as conn:
+        account_ids = list({acc_id for t in transfers for acc_id in t[:2]})
+        placeholders = ",".join("?" * len(account_ids))
+        owned = conn.execute(
+            f"SELECT COUNT(*) FROM account WHERE orang_id = ? AND id IN ({placeholders})", (orang_id, *account_ids)
+        ).fetchone()[0]
+        if owned != len(account_ids):
+            raise ValueError("ID Akun tidak valid.")
+        saldo = dict.fromkeys(account_ids, 0)
+        saldo.update(conn.execute(
+            f"SELECT account_id, saldo FROM account_balance WHERE account_id IN ({placeholders})", account_ids
+        ).fetchall())
+        names = _resolve_names(conn, "account", account_ids, session)
+
+        kategori = {tipe: get_or_create_transfer_kategori(orang_id, tipe, session)
+                    for tipe in ("pengeluaran", "pemasukan")}
+        rows = []
+        deskripsi = []
+        for from_id, to_id, jumlah in transfers:
+            if saldo[from_id] < jumlah:
+                raise SaldoTidakCukupError(from_id, saldo[from_id])
+            saldo[from_id] -= jumlah
+            saldo[to_id] += jumlah
+            deskripsi += [f"Transfer ke akun {names[to_id]}", f"Transfer dari akun {names[from_id]}"]
+            rows.append((from_id, kategori["pengeluaran"], "pengeluaran", jumlah, tanggal,
+                         encrypt(deskripsi[-2], session)))
+            rows.append((to_id, kategori["pemasukan"], "pemasukan", jumlah, tanggal,
+                         encrypt(deskripsi[-1], session)))
+
+        _insert_transaksi(conn, rows, deskripsi, session)
 
 # --- Fitur Export CSV ---
 
+# Column layout shared by CSV export and import
+EXPORT_COLUMNS = ['nama', 'tipe', 'kategori', 'jumlah', 'deskripsi', 'tanggal']
 
-def get_all_transactions_for_export(orang_id, master_password):
-    """Retrieves all transactions for a user for CSV export."""
+
+def iter_transactions_for_export(orang_id, session, chunk_size=500, dari=None, sampai=None, arsip=False):
+    """Yields a user's transactions for CSV export, decrypting one fetchmany chunk at a time.
+
+    Memory use stays bounded by `chunk_size` regardless of the ledger size.
+    `dari`/`sampai` limit the export to a period, as in _periode; arsip=True
+    includes archived transactions.
+    """
+    periode, periode_params = _periode(dari, sampai)
     conn = get_db_connection()
-    query = """
-        SELECT a.nama_account, t.tipe, k.nama as nama_kategori, t.jumlah, t.deskripsi, t.tanggal
+    query = f"""
+        SELECT t.account_id, t.tipe, t.kategori_id, t.jumlah, t.deskripsi, t.tanggal
+        FROM {_sumber_transaksi(conn, arsip)} t
+        JOIN account a ON t.account_id = a.id
+        WHERE a.orang_id = ? {periode}
+        ORDER BY t.waktu ASC, t.id ASC
+    """
+    try:
+        cursor = conn.execute(query, (orang_id, *periode_params))
+        while True:
+            encrypted_rows = cursor.fetchmany(chunk_size)
+            if not encrypted_rows:
+                break
+            account_names = _resolve_names(conn, "account", (row["account_id"] for row in encrypted_rows), session)
+            kategori_names = _resolve_names(conn, "kategori", (row["kategori_id"] for row in encrypted_rows), session)
+            deskripsi = decrypt_many((row["deskripsi"] for row in encrypted_rows), session)
+            for row, desc in zip(encrypted_rows, deskripsi):
+                yield {
+                    "nama": account_names.get(row["account_id"], ""),
+                    "tipe": row["tipe"],
+                    "kategori": kategori_names.get(row["kategori_id"], ""),
+                    "jumlah": row["jumlah"],
+                    "deskripsi": desc,
+                    "tanggal": row["tanggal"]
+                }
+    finally:
+        conn.close()
+
+
+def get_all_transactions_for_export(orang_id, session, dari=None, sampai=None, arsip=False):
+    """Retrieves all transactions for a user for CSV export, optionally for one period."""
+    return list(iter_transactions_for_export(orang_id, session, dari=dari, sampai=sampai, arsip=arsip))
+
+
+# --- Fitur Import CSV ---
+
+
+def import_transaksi(orang_id, rows, session, sumber, chunk_size=1000, progress=None):
+    """Bulk-inserts transactions given as dicts in the export_to_csv column layout.
+
+    Accounts and categories are matched by name and created when missing. Each
+    chunk is inserted with executemany and committed together with a progress
+    marker for `sumber`, so re-running an interrupted import of the same source
+    resumes after the last committed chunk. `progress(baris, inserted, elapsed)`
+    is called after every chunk. Returns the number of rows inserted by this run.
+    """
+    conn = get_db_connection()
+    done = conn.execute(
+        "SELECT baris FROM import_progress WHERE orang_id=? AND sumber=?", (orang_id, sumber)
+    ).fetchone()
+    baris = done["baris"] if done else 0
+    accounts = {nama: acc_id for acc_id, nama in get_accounts_by_orang(orang_id, session)}
+    kategori = {(nama, tipe): kat_id
+                for tipe in ("pemasukan", "pengeluaran")
+                for kat_id, nama in get_kategori(orang_id, tipe, session)}
+
+    rows = islice(rows, baris, None)
+    inserted = 0
+    start = time.perf_counter()
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        created = []
+        try:
+            with transaction():
+                values = []
+                for n, row in enumerate(chunk, baris + 1):
+                    tipe = row["tipe"]
+                    if tipe not in ("pemasukan", "pengeluaran"):
+                        raise ValueError(f"Baris {n}: tipe '{tipe}' tidak valid.")
+                    try:
+                        jumlah = float(row["jumlah"])
+                    except ValueError:
+                        raise ValueError(f"Baris {n}: jumlah '{row['jumlah']}' tidak valid.")
+                    if row["nama"] not in accounts:
+                        accounts[row["nama"]] = tambah_account(orang_id, row["nama"], session)
+                        created.append(("account", accounts[row["nama"]]))
+                    if (row["kategori"], tipe) not in kategori:
+                        kategori[row["kategori"], tipe] = tambah_kategori(orang_id, row["kategori"], tipe, session)
+                        created.append(("kategori", kategori[row["kategori"], tipe]))
+                    tanggal = row["tanggal"] or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    try:
+                        datetime.datetime.strptime(tanggal, "%Y-%m-%d %H:%M:%S")
+                    except ValueError:
+                        raise ValueError(f"Baris {n}: tanggal '{tanggal}' tidak valid.")
+                    values.append([accounts[row["nama"]], kategori[row["kategori"], tipe], tipe, jumlah, tanggal])
+                deskripsi = [row["deskripsi"] for row in chunk]
+                _insert_transaksi(conn, [v + [d] for v, d in zip(values, encrypt_many(deskripsi, session))],
+                                  deskripsi, session)
+                conn.execute("""
+                    INSERT INTO import_progress (orang_id, sumber, baris) VALUES (?, ?, ?)
+                    ON CONFLICT(orang_id, sumber) DO UPDATE SET baris = excluded.baris
+                """, (orang_id, sumber, baris + len(chunk)))
+        except BaseException:
+            # Rows created in the rolled-back chunk may have their ids reused
+            for key in created:
+                session.names.invalidate(key)
+            raise
+        baris += len(chunk)
+        inserted += len(chunk)
+        if progress:
+            progress(baris, inserted, time.perf_counter() - start)
+    return inserted
+
+# --- Fitur Pencarian ---
+
+
+def search_transaksi(orang_id, session, keyword, limit=50):
+    """Finds transactions whose description contains every word of `keyword`.
+
+    Matching happens on blind-index tokens with an index lookup; only the
+    hits are read and decrypted. Newest first.
+    """
+    tokens = [session.blind_index(word) for word in _search_words(keyword)]
+    if not tokens:
+        return []
+    conn = get_db_connection()
+    query = f"""
+        SELECT t.id, t.tanggal, t.waktu, t.tipe, t.account_id, t.kategori_id, t.jumlah, t.deskripsi
         FROM transaksi t
         JOIN account a ON t.account_id = a.id
-        JOIN kategori k ON t.kategori_id = k.id
-        WHERE a.orang_id = ?
-        ORDER BY t.tanggal ASC
+        WHERE a.orang_id = ? AND t.id IN (
+            SELECT transaksi_id FROM transaksi_token
+            WHERE token IN ({','.join('?' * len(tokens))})
+            GROUP BY transaksi_id HAVING COUNT(*) = ?
+        )
+        ORDER BY t.waktu DESC, t.id DESC
+        LIMIT ?
     """
-    encrypted_rows = conn.execute(query, (orang_id,)).fetchall()
+    encrypted_rows = conn.execute(query, (orang_id, *tokens, len(tokens), limit)).fetchall()
+    decrypted_rows = _decrypt_history_rows(conn, encrypted_rows, session)
     conn.close()
-    
-    decrypted_rows = []
-    for row in encrypted_rows:
-        decrypted_rows.append({
-            "nama": decrypt(row["nama_account"], master_password),
-            "tipe": row["tipe"],
-            "kategori": decrypt(row["nama_kategori"], master_password),
-            "jumlah": row["jumlah"],
-            "deskripsi": decrypt(row["deskripsi"], master_password),
-            "tanggal": row["tanggal"]
-        })
     return decrypted_rows
+
+
+def blind_index_pending(orang_id):
+    """True while the profile's existing rows still need a search-token backfill."""
+    conn = get_db_connection()
+    row = conn.execute("SELECT selesai FROM blind_index_progress WHERE orang_id=?", (orang_id,)).fetchone()
+    conn.close()
+    return not (row and row["selesai"])
+
+
+def backfill_blind_index(orang_id, session, batch_size=500, progress=None):
+    """Writes search tokens for a profile's rows created before search existed.
+
+    Rows are decrypted in id order one batch at a time; each batch's tokens are
+    committed together with the last processed id, so an interrupted backfill
+    continues where it stopped. Returns the number of rows processed.
+    """
+    conn = get_db_connection()
+    row = conn.execute("SELECT last_id FROM blind_index_progress WHERE orang_id=?", (orang_id,)).fetchone()
+    last_id = row["last_id"] if row else 0
+    total = 0
+    while True:
+        rows = conn.execute("""
+            SELECT t.id, t.deskripsi FROM transaksi t
+            JOIN account a ON t.account_id = a.id
+            WHERE a.orang_id = ? AND t.id > ?
+            ORDER BY t.id LIMIT ?
+        """, (orang_id, last_id, batch_size)).fetchall()
+        done = len(rows) < batch_size
+        with transaction():
+            if rows:
+                last_id = rows[-1]["id"]
+                plain = decrypt_many((r["deskripsi"] for r in rows), session)
+                _index_deskripsi(conn, ((r["id"], text) for r, text in zip(rows, plain)
+                                        if text != "DECRYPTION_ERROR"), session)
+            conn.execute("""
+                INSERT INTO blind_index_progress (orang_id, last_id, selesai) VALUES (?, ?, ?)
+                ON CONFLICT(orang_id) DO UPDATE SET last_id = excluded.last_id, selesai = excluded.selesai
+            """, (orang_id, last_id, int(done)))
+        total += len(rows)
+        if progress:
+            progress(total)
+        if done:
+            break
+    return total
+
+# --- Migrasi Enkripsi ---
+
+# Legacy v1 values are non-empty text without the versioned prefix.
+_V1_FILTER = f"!= '' AND typeof({{col}}) = 'text' AND {{col}} NOT LIKE '{VERSIONED_PREFIX}%'"
+# Everything not yet stored as a v3 BLOB
+_TEXT_FILTER = "!= '' AND typeof({col}) = 'text'"
+
+_ENCRYPTED_COLUMNS = [
+    ("account", "nama_account", """
+        SELECT id, nama_account FROM account
+        WHERE orang_id = :orang_id AND id > :last_id AND nama_account {v1}
+        ORDER BY id LIMIT :batch_size"""),
+    ("kategori", "nama", """
+        SELECT id, nama FROM kategori
+        WHERE orang_id = :orang_id AND id > :last_id AND nama {v1}
+        ORDER BY id LIMIT :batch_size"""),
+    ("transaksi", "deskripsi", """
+        SELECT t.id, t.deskripsi FROM transaksi t
+        JOIN account a ON t.account_id = a.id
+        WHERE a.orang_id = :orang_id AND t.id > :last_id AND t.deskripsi {v1}
+        ORDER BY t.id LIMIT :batch_size"""),
+    ("transaksi_berulang", "deskripsi", """
+        SELECT r.id, r.deskripsi FROM transaksi_berulang r
+        JOIN account a ON r.account_id = a.id
+        WHERE a.orang_id = :orang_id AND r.id > :last_id AND r.deskripsi {v1}
+        ORDER BY r.id LIMIT :batch_size"""),
+]
+
+
+def migrasi_enkripsi(orang_id, session, batch_size=200, progress=None):
+    """Rewrites a profile's legacy v1 ciphertexts in the session-key format.
+
+    Rows are processed in id order and committed per batch, so an interrupted
+    migration simply continues on the next run. Categories from before owners
+    existed are claimed first (see klaim_kategori), so every category the
+    profile can read is migrated; values that cannot be decrypted with this
+    session are left as is. Returns the number of values rewritten.
+    """
+    klaim_kategori(orang_id, session)
+    return _tulis_ulang_cipher(orang_id, session, _V1_FILTER, batch_size, progress)["jumlah"]
+
+
+def migrasi_biner(orang_id, session, batch_size=500, progress=None, vacuum=False):
+    """Rewrites a profile's text ciphertexts (v1 and v2) as v3 BLOBs and switches it to BLOB storage.
+
+    Works in committed batches like migrasi_enkripsi, so it can be re-run after
+    an interruption, and touches the same categories: every one the profile
+    owns, after claiming those from before owners existed. Returns a report
+    dict: `jumlah` values rewritten, `byte_sebelum`/`byte_sesudah` stored size
+    of those values, and, with vacuum=True, `file_sebelum`/`file_sesudah`
+    database file sizes around a VACUUM that hands the freed pages back to
+    the file system.
+    """
+    klaim_kategori(orang_id, session)
+    conn = get_db_connection()
+    conn.execute("UPDATE orang SET cipher_biner=1 WHERE id=?", (orang_id,))
+    conn.commit()
+    session.biner = True
+    laporan = _tulis_ulang_cipher(orang_id, session, _TEXT_FILTER, batch_size, progress)
+    if vacuum:
+        # Checkpoint first so the sizes are not hidden in the WAL file
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        laporan["file_sebelum"] = os.path.getsize(DB_FILE)
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        laporan["file_sesudah"] = os.path.getsize(DB_FILE)
+    conn.close()
+    return laporan
+
+
+def _tulis_ulang_cipher(orang_id, session, filter_sql, batch_size, progress):
+    """Re-encrypts a profile's values matching `filter_sql` with the session, batch by batch."""
+    laporan = {"jumlah": 0, "byte_sebelum": 0, "byte_sesudah": 0}
+    conn = get_db_connection()
+    for table, column, query in _dengan_arsip(conn, _ENCRYPTED_COLUMNS):
+        query = query.format(v1=filter_sql.format(col=column))
+        params = {"orang_id": orang_id, "last_id": 0, "batch_size": batch_size}
+        while True:
+            rows = conn.execute(query, params).fetchall()
+            if not rows:
+                break
+            params["last_id"] = rows[-1][0]
+            updates = []
+            for row in rows:
+                plain = decrypt(row[1], session)
+                if plain != "DECRYPTION_ERROR":
+                    updates.append((encrypt(plain, session), row[0]))
+                    laporan["byte_sebelum"] += len(row[1])
+                    laporan["byte_sesudah"] += len(updates[-1][0])
+            conn.executemany(f"UPDATE {table} SET {column}=? WHERE id=?", updates)
+            conn.commit()
+            laporan["jumlah"] += len(updates)
+            if progress:
+                progress(table, laporan["jumlah"])
+    conn.close()
+    return laporan
+
+# --- Ganti Master Password ---
+
+# Rotation order: (table, column, id expression, query for the profile's (id, value) rows)
+_ROTATED_COLUMNS = [
+    ("account", "nama_account", "id", """
+        SELECT id, nama_account FROM account
+        WHERE orang_id = :orang_id"""),
+    ("kategori", "nama", "id", """
+        SELECT id, nama FROM kategori
+        WHERE orang_id = :orang_id"""),
+    ("transaksi", "deskripsi", "t.id", """
+        SELECT t.id, t.deskripsi FROM transaksi t
+        JOIN account a ON t.account_id = a.id
+        WHERE a.orang_id = :orang_id"""),
+    ("transaksi_berulang", "deskripsi", "r.id", """
+        SELECT r.id, r.deskripsi FROM transaksi_berulang r
+        JOIN account a ON r.account_id = a.id
+        WHERE a.orang_id = :orang_id"""),
+]
+
+ROTASI_SELESAI = "selesai"
+ROTASI_SAMPLE_SIZE = 20
+
+
+def rotasi_tertunda(orang_id):
+    """True while a master password change for the profile has not finished.
+
+    Until it does, part of the profile's data is encrypted with the new key,
+    so the change should be resumed before the data is used.
+    """
+    conn = get_db_connection()
+    row = conn.execute("SELECT 1 FROM rotasi_kunci WHERE orang_id=?", (orang_id,)).fetchone()
+    conn.close()
+    return row is not None
+
+
+def ganti_master_password(orang_id, session, password_baru, batch_size=500, progress=None):
+    """Re-encrypts a profile's data under a new master password and returns its new SessionKey.
+
+    `session` is the key of the current password. Rows are re-encrypted in id
+    order, one chunk per commit together with the position reached, on the
+    crypto thread pool; transaction search tokens are rewritten with the new
+    key in the same commit. If the process stops, calling this again with the
+    same new password resumes after the last committed chunk (a different new
+    password raises ValueError). A random sample is checked against both keys
+    before the password hash and key salt in orang are replaced.
+    Categories from before owners existed are claimed first (see
+    klaim_kategori), so none the profile can read is left on the old key.
+    `progress(tabel, total)` is called after every chunk.
+    """
+    klaim_kategori(orang_id, session)
+    conn = get_db_connection()
+    pending = conn.execute("SELECT * FROM rotasi_kunci WHERE orang_id=?", (orang_id,)).fetchone()
+    if pending is None:
+        kunci_salt = base64.b64encode(os.urandom(16)).decode()
+        pending = {"master_password_hash": _hash_master_password(password_baru), "kunci_salt": kunci_salt,
+                   "tabel": _ROTATED_COLUMNS[0][0], "last_id": 0}
+        conn.execute("""
+            INSERT INTO rotasi_kunci (orang_id, master_password_hash, kunci_salt, tabel, last_id)
+            VALUES (?, ?, ?, ?, ?)
+        """, (orang_id, pending["master_password_hash"], kunci_salt, pending["tabel"], 0))
+        conn.commit()
+    elif not verify_master_password(pending["master_password_hash"], password_baru):
+        raise ValueError("Password baru berbeda dengan penggantian password yang belum selesai.")
+    baru = SessionKey(password_baru, base64.b64decode(pending["kunci_salt"]), biner=session.biner)
+    # Names decrypt to the same plaintext under either key
+    baru.names = session.names
+
+    columns = _dengan_arsip(conn, _ROTATED_COLUMNS)
+    tables = [t for t, _, _, _ in columns]
+    start = tables.index(pending["tabel"]) if pending["tabel"] in tables else len(tables)
+    total = 0
+    for table, column, key, select in columns[start:]:
+        query = f"{select} AND {key} > :last_id ORDER BY {key} LIMIT :batch_size"
+        params = {"orang_id": orang_id, "batch_size": batch_size,
+                  "last_id": pending["last_id"] if table == pending["tabel"] else 0}
+        while True:
+            with transaction(immediate=True):
+                rows = conn.execute(query, params).fetchall()
+                if rows:
+                    params["last_id"] = rows[-1][0]
+                    pairs = reencrypt_many((row[1] for row in rows), session, baru)
+                    conn.executemany(f"UPDATE {table} SET {column}=? WHERE id=?",
+                                     [(pair[1], row[0]) for row, pair in zip(rows, pairs) if pair])
+                    if table == "transaksi":
+                        ids = [row[0] for row in rows]
+                        conn.execute(f"DELETE FROM transaksi_token WHERE transaksi_id IN ({','.join('?' * len(ids))})",
+                                     ids)
+                        _index_deskripsi(conn, ((row[0], pair[0]) for row, pair in zip(rows, pairs) if pair), baru)
+                    total += len(rows)
+                conn.execute("UPDATE rotasi_kunci SET tabel=?, last_id=? WHERE orang_id=?",
+                             (table, params["last_id"], orang_id))
+            if progress and rows:
+                progress(table, total)
+            if len(rows) < batch_size:
+                break
+    conn.execute("UPDATE rotasi_kunci SET tabel=?, last_id=0 WHERE orang_id=?", (ROTASI_SELESAI, orang_id))
+    conn.commit()
+
+    _verifikasi_rotasi(conn, orang_id, session, baru)
+    with transaction():
+        conn.execute("""
+            UPDATE orang SET master_password_hash=?, kunci_salt=? WHERE id=?
+        """, (pending["master_password_hash"], pending["kunci_salt"], orang_id))
+        conn.execute("DELETE FROM rotasi_kunci WHERE orang_id=?", (orang_id,))
+    return baru
+
+
+def _verifikasi_rotasi(conn, orang_id, lama, baru, sample_size=ROTASI_SAMPLE_SIZE):
+    """Raises RuntimeError if a random sample still holds values only the old key can read."""
+    for table, _, _, select in _dengan_arsip(conn, _ROTATED_COLUMNS):
+        rows = conn.execute(f"{select} ORDER BY random() LIMIT :n", {"orang_id": orang_id, "n": sample_size}).fetchall()
+        for row in rows:
+            if decrypt(row[1], baru) == "DECRYPTION_ERROR" and decrypt(row[1], lama) != "DECRYPTION_ERROR":
+                raise RuntimeError(f"Verifikasi gagal: {table} id {row[0]} belum terenkripsi ulang.")
+
+# --- Arsip Transaksi ---
+
+# Columns copied into the yearly archive tables; waktu is stored there as a plain integer
+_ARSIP_COLUMNS = "id, account_id, kategori_id, tipe, jumlah, tanggal, deskripsi, waktu"
+
+
+def _tabel_arsip(conn):
+    """Names of the yearly archive tables, oldest first."""
+    return [row[0] for row in conn.execute("""
+        SELECT name FROM sqlite_master
+        WHERE type = 'table' AND name GLOB 'transaksi_arsip_[0-9][0-9][0-9][0-9]'
+        ORDER BY name
+    """)]
+
+
+def _dengan_arsip(conn, columns):
+    """Extends an encrypted-column list with a copy of its transaksi entry for every archive table."""
+    entry = next(c for c in columns if c[0] == "transaksi")
+    return columns + [(table, *entry[1:-1], entry[-1].replace("FROM transaksi t", f"FROM {table} t"))
+                      for table in _tabel_arsip(conn)]
+
+
+def _buat_tabel_arsip(conn, tahun):
+    table = f"transaksi_arsip_{tahun:04d}"
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY,
+        account_id INTEGER,
+        kategori_id INTEGER,
+        tipe TEXT,
+        jumlah REAL,
+        tanggal TEXT,
+        deskripsi BLOB,
+        waktu INTEGER
+    )""")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_tipe_waktu ON {table}(tipe, waktu, id)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_account ON {table}(account_id)")
+    return table
+
+
+def punya_arsip(orang_id):
+    """True if some of the profile's transactions have been archived."""
+    conn = get_db_connection()
+    row = conn.execute("""
+        SELECT 1 FROM arsip_ringkasan r JOIN account a ON r.account_id = a.id
+        WHERE a.orang_id = ? LIMIT 1
+    """, (orang_id,)).fetchone()
+    conn.close()
+    return row is not None
+
+
+def arsipkan_transaksi(orang_id, sebelum, progress=None):
+    """Moves a profile's transactions dated before `sebelum` into yearly archive tables.
+
+    Each year is moved in its own transaction together with its rows in
+    arsip_ringkasan (totals per account, month, category and type), so the
+    stored balances and monthly totals are unchanged and an interrupted run
+    can simply be repeated. Archived rows leave the search index; history and
+    export reach them with arsip=True. `progress(tahun, total)` is called after
+    every year. Returns the number of transactions moved.
+    """
+    batas = _waktu(sebelum)
+    conn = get_db_connection()
+    years = [int(row[0]) for row in conn.execute("""
+        SELECT DISTINCT substr(t.tanggal, 1, 4) FROM transaksi t
+        JOIN account a ON t.account_id = a.id
+        WHERE a.orang_id = ? AND t.waktu < ?
+        ORDER BY 1
+    """, (orang_id, batas))]
+    total = 0
+    for tahun in years:
+        awal = _waktu(datetime.date(tahun, 1, 1))
+        akhir = min(batas, _waktu(datetime.date(tahun + 1, 1, 1)))
+        with transaction(immediate=True):
+            table = _buat_tabel_arsip(conn, tahun)
+            conn.execute(f"""
+                CREATE TEMP TABLE arsip_pindah AS
+                SELECT {', '.join('t.' + col for col in _ARSIP_COLUMNS.split(', '))}
+                FROM transaksi t
+                JOIN account a ON t.account_id = a.id
+                WHERE a.orang_id = ? AND t.waktu >= ? AND t.waktu < ?
+            """, (orang_id, awal, akhir))
+            conn.execute(f"INSERT INTO {table} ({_ARSIP_COLUMNS}) SELECT {_ARSIP_COLUMNS} FROM temp.arsip_pindah")
+            conn.execute("""
+                INSERT INTO arsip_ringkasan (account_id, bulan, kategori_id, tipe, jumlah, banyak)
+                SELECT account_id, substr(tanggal, 1, 7), kategori_id, tipe, SUM(jumlah), COUNT(*)
+                FROM temp.arsip_pindah WHERE true
+                GROUP BY account_id, substr(tanggal, 1, 7), kategori_id, tipe
+                ON CONFLICT(account_id, bulan, kategori_id, tipe) DO UPDATE SET
+                    jumlah = jumlah + excluded.jumlah,
+                    banyak = banyak + excluded.banyak
+            """)
+            conn.execute("DELETE FROM transaksi WHERE id IN (SELECT id FROM temp.arsip_pindah)")
+            # The delete triggers took the rows out of the summaries; archived rows still count
+            conn.execute("""
+                INSERT INTO account_balance (account_id, saldo)
+                SELECT account_id, SUM(CASE WHEN tipe = 'pemasukan' THEN jumlah ELSE -jumlah END)
+                FROM temp.arsip_pindah WHERE true GROUP BY account_id
+                ON CONFLICT(account_id) DO UPDATE SET saldo = saldo + excluded.saldo
+            """)
+            conn.execute("""
+                INSERT INTO account_month_summary (account_id, bulan, pemasukan, pengeluaran)
+                SELECT account_id, substr(tanggal, 1, 7),
+                    SUM(CASE WHEN tipe = 'pemasukan' THEN jumlah ELSE 0 END),
+                    SUM(CASE WHEN tipe = 'pengeluaran' THEN jumlah ELSE 0 END)
+                FROM temp.arsip_pindah WHERE true GROUP BY account_id, substr(tanggal, 1, 7)
+                ON CONFLICT(account_id, bulan) DO UPDATE SET
+                    pemasukan = pemasukan + excluded.pemasukan,
+                    pengeluaran = pengeluaran + excluded.pengeluaran
+            """)
+            conn.execute("""
+                INSERT INTO kategori_month_summary (orang_id, kategori_id, bulan, jumlah)
+                SELECT ?, kategori_id, substr(tanggal, 1, 7), SUM(jumlah)
+                FROM temp.arsip_pindah WHERE true GROUP BY kategori_id, substr(tanggal, 1, 7)
+                ON CONFLICT(orang_id, kategori_id, bulan) DO UPDATE SET jumlah = jumlah + excluded.jumlah
+            """, (orang_id,))
+            total += conn.execute("SELECT COUNT(*) FROM temp.arsip_pindah").fetchone()[0]
+            conn.execute("DROP TABLE temp.arsip_pindah")
+        if progress:
+            progress(tahun, total)
+    return total
+
+# --- Transaksi Berulang ---
+
+FREKUENSI = ("harian", "mingguan", "bulanan", "tahunan")
+
+
+def _jatuh_tempo_berikut(tanggal, awal, frekuensi, berakhir=None):
+    """Date of the occurrence after `tanggal`, or None past `berakhir`.
+
+    Monthly and yearly rules keep the day of month of `awal`, clamped to
+    shorter months (a rule starting on the 31st falls on Feb 28/29).
+    """
+    if frekuensi == "harian":
+        berikut = tanggal + datetime.timedelta(days=1)
+    elif frekuensi == "mingguan":
+        berikut = tanggal + datetime.timedelta(weeks=1)
+    else:
+        tahun, bulan = divmod(tanggal.year * 12 + tanggal.month - 1 + (1 if frekuensi == "bulanan" else 12), 12)
+        bulan += 1
+        berikut = datetime.date(tahun, bulan, min(awal.day, calendar.monthrange(tahun, bulan)[1]))
+    return None if berakhir is not None and berikut > berakhir else berikut
+
+
+def tambah_transaksi_berulang(account_id, kategori_id, tipe, jumlah, deskripsi, frekuensi, mulai, session,
+                              berakhir=None):
+    """Adds a recurring transaction rule whose first occurrence falls on `mulai` (a date)."""
+    if frekuensi not in FREKUENSI:
+        raise ValueError(f"Frekuensi harus salah satu dari: {', '.join(FREKUENSI)}")
+    if berakhir is not None and berakhir < mulai:
+        raise ValueError("Tanggal berakhir tidak boleh sebelum tanggal mulai.")
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("""
+        INSERT INTO transaksi_berulang
+            (account_id, kategori_id, tipe, jumlah, deskripsi, frekuensi, tanggal_awal, jatuh_tempo, berakhir)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (account_id, kategori_id, tipe, jumlah, encrypt(deskripsi, session), frekuensi,
+          mulai.isoformat(), mulai.isoformat(), berakhir.isoformat() if berakhir else None))
+    conn.commit()
+    last_id = c.lastrowid
+    conn.close()
+    return last_id
+
+
+def get_transaksi_berulang(orang_id, session):
+    """Returns a profile's recurring rules with decrypted names and descriptions, next due first."""
+    conn = get_db_connection()
+    rows = conn.execute("""
+        SELECT r.id, r.account_id, r.kategori_id, r.tipe, r.jumlah, r.deskripsi, r.frekuensi,
+               r.jatuh_tempo, r.berakhir
+        FROM transaksi_berulang r
+        JOIN account a ON r.account_id = a.id
+        WHERE a.orang_id = ?
+        ORDER BY r.jatuh_tempo IS NULL, r.jatuh_tempo, r.id
+    """, (orang_id,)).fetchall()
+    account_names = _resolve_names(conn, "account", (row["account_id"] for row in rows), session)
+    kategori_names = _resolve_names(conn, "kategori", (row["kategori_id"] for row in rows), session)
+    conn.close()
+    return [{
+        "id": row["id"],
+        "nama_account": account_names.get(row["account_id"], ""),
+        "nama_kategori": kategori_names.get(row["kategori_id"], ""),
+        "tipe": row["tipe"],
+        "jumlah": row["jumlah"],
+        "deskripsi": desc,
+        "frekuensi": row["frekuensi"],
+        "jatuh_tempo": row["jatuh_tempo"],
+        "berakhir": row["berakhir"],
+    } for row, desc in zip(rows, decrypt_many((row["deskripsi"] for row in rows), session))]
+
+
+def hapus_transaksi_berulang(orang_id, berulang_id):
+    """Deletes one of the profile's recurring rules; transactions it already posted stay. Returns True if found."""
+    conn = get_db_connection()
+    c = conn.execute("""
+        DELETE FROM transaksi_berulang
+        WHERE id = ? AND account_id IN (SELECT id FROM account WHERE orang_id = ?)
+    """, (berulang_id, orang_id))
+    conn.commit()
+    conn.close()
+    return c.rowcount > 0
+
+
+def proses_transaksi_berulang(orang_id, session, hingga=None):
+    """Posts every occurrence of the profile's recurring rules due on or before `hingga` (default today).
+
+    Due rules are found through the jatuh_tempo index, and all their missed
+    occurrences are inserted with one executemany in a single transaction,
+    which also moves each rule's jatuh_tempo forward, so running this twice
+    never posts an occurrence twice. Each rule's description is decrypted
+    once and its occurrences encrypted as one batch. Returns the number of
+    transactions posted.
+    """
+    hingga = hingga or datetime.date.today()
+    with transaction(immediate=True) as conn:
+        rules = conn.execute("""
+            SELECT r.id, r.account_id, r.kategori_id, r.tipe, r.jumlah, r.deskripsi, r.frekuensi,
+                   r.tanggal_awal, r.jatuh_tempo, r.berakhir
+            FROM transaksi_berulang r
+            JOIN account a ON r.account_id = a.id
+            WHERE r.jatuh_tempo <= ? AND a.orang_id = ?
+        """, (hingga.isoformat(), orang_id)).fetchall()
+        occurrences = []
+        updates = []
+        for rule, deskripsi in zip(rules, decrypt_many((rule["deskripsi"] for rule in rules), session)):
+            if deskripsi == "DECRYPTION_ERROR":
+                continue
+            awal = datetime.date.fromisoformat(rule["tanggal_awal"])
+            berakhir = datetime.date.fromisoformat(rule["berakhir"]) if rule["berakhir"] else None
+            tanggal = datetime.date.fromisoformat(rule["jatuh_tempo"])
+            while tanggal is not None and tanggal <= hingga:
+                occurrences.append((f"{tanggal.isoformat()} 00:00:00", rule, deskripsi))
+                tanggal = _jatuh_tempo_berikut(tanggal, awal, rule["frekuensi"], berakhir)
+            updates.append((tanggal.isoformat() if tanggal else None, rule["id"]))
+        if not occurrences:
+            return 0
+        # Oldest first, so ids follow the dates like hand-entered rows
+        occurrences.sort(key=lambda o: (o[0], o[1]["id"]))
+        deskripsi = [o[2] for o in occurrences]
+        rows = [(rule["account_id"], rule["kategori_id"], rule["tipe"], rule["jumlah"], tanggal, desc_encrypted)
+                for (tanggal, rule, _), desc_encrypted in zip(occurrences, encrypt_many(deskripsi, session))]
+        _insert_transaksi(conn, rows, deskripsi, session)
+        conn.executemany("UPDATE transaksi_berulang SET jatuh_tempo=? WHERE id=?", updates)
+    return len(rows)
+
+# --- Anggaran ---
+
+
+def atur_anggaran(orang_id, kategori_id, jumlah):
+    """Sets the profile's monthly budget for a category; jumlah=None removes it."""
+    conn = get_db_connection()
+    if jumlah is None:
+        conn.execute("DELETE FROM anggaran WHERE orang_id=? AND kategori_id=?", (orang_id, kategori_id))
+    else:
+        conn.execute("""
+            INSERT INTO anggaran (orang_id, kategori_id, jumlah) VALUES (?, ?, ?)
+            ON CONFLICT(orang_id, kategori_id) DO UPDATE SET jumlah = excluded.jumlah
+        """, (orang_id, kategori_id, jumlah))
+    conn.commit()
+    conn.close()
+
+
+def _status_anggaran(row):
+    return {"kategori_id": row["kategori_id"], "anggaran": row["anggaran"], "terpakai": row["terpakai"],
+            "sisa": row["anggaran"] - row["terpakai"], "melebihi": row["terpakai"] > row["anggaran"]}
+
+
+_ANGGARAN_SELECT = """
+    SELECT b.kategori_id, b.jumlah AS anggaran, COALESCE(s.jumlah, 0) AS terpakai
+    FROM anggaran b
+    LEFT JOIN kategori_month_summary s
+        ON s.orang_id = b.orang_id AND s.kategori_id = b.kategori_id AND s.bulan = ?
+    WHERE b.orang_id = ?
+"""
+
+
+def cek_anggaran(orang_id, kategori_id, bulan):
+    """Budget status of one category for `bulan` ("YYYY-MM"), or None if it has no budget.
+
+    Two primary-key lookups; meant to run right after a transaction is written.
+    """
+    conn = get_db_connection()
+    row = conn.execute(f"{_ANGGARAN_SELECT} AND b.kategori_id = ?", (bulan, orang_id, kategori_id)).fetchone()
+    conn.close()
+    return _status_anggaran(row) if row else None
+
+
+def get_status_anggaran(orang_id, bulan):
+    """Budget status of every budgeted category of the profile for `bulan` ("YYYY-MM")."""
+    conn = get_db_connection()
+    rows = conn.execute(f"{_ANGGARAN_SELECT} ORDER BY b.kategori_id", (bulan, orang_id)).fetchall()
+    conn.close()
+    return [_status_anggaran(row) for row in rows]
@@ -0,0 +1,80 @@
+# app/history.py
+
+import math
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import database as db
+
+# ==============================
+# Page Cache & Prefetch Riwayat
+# ==============================
+
+
+class HistoryPager:
+    """Caches decrypted history pages and prefetches the neighbours of the page being read.
+
+    Pages are keyed by page number for one transaction type (and optional
+    period and archive filter, see db.count_transactions). A single
+    background worker (with its own database connection) fetches page N+1
+    and N-1 while page N is on screen, seeking from the edge rows of
+    pages already loaded so no page needs an OFFSET scan. `source` is the
+    database module or a session read model (see readmodel.buka).
+    """
+
+    def __init__(self, orang_id, session, tipe, page_size=20, dari=None, sampai=None, arsip=False, source=db):
+        self.orang_id = orang_id
+        self.session = session
+        self.tipe = tipe
+        self.page_size = page_size
+        self.filter = {"dari": dari, "sampai": sampai, "arsip": arsip}
+        self.source = source
+        self.total_items = source.count_transactions(orang_id, tipe, **self.filter)
+        self.total_pages = math.ceil(self.total_items / page_size)
+        self._pages = {}  # page -> Future of decrypted rows
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+
+    def _loaded(self, page):
+        future = self._pages.get(page)
+        if future is not None and future.done() and future.exception() is None:
+            return future.result()
+        return None
+
+    def _fetch(self, page):
+        args = (self.orang_id, self.session, self.tipe)
+        prev_rows, next_rows = self._loaded(page - 1), self._loaded(page + 1)
+        if page == 1:
+            return self.source.get_transactions_seek(*args, page_size=self.page_size, **self.filter)
+        if prev_rows:
+            last = prev_rows[-1]
+            return self.source.get_transactions_seek(*args, after=(last["waktu"], last["id"]), page_size=self.page_size,
+                                            **self.filter)
+        if next_rows:
+            first = next_rows[0]
+            return self.source.get_transactions_seek(*args, before=(first["waktu"], first["id"]), page_size=self.page_size,
+                                            **self.filter)
+        return self.source.get_transactions_paginated(*args, page, self.page_size, **self.filter)
+
+    def _prefetch(self, page):
+        if 1 <= page <= self.total_pages and page not in self._pages:
+            self._pages[page] = self._executor.submit(self._fetch, page)
+
+    def get(self, page):
+        """Returns the rows of `page`, then starts prefetching the pages around it."""
+        rows = self._loaded(page)
+        if rows is None:
+            future = self._pages.get(page)
+            try:
+                rows = future.result() if future is not None else None
+            except Exception:
+                rows = None  # a failed prefetch is simply retried here
+            if rows is None:
+                rows = self._fetch(page)
+                future = Future()
+                future.set_result(rows)
+                self._pages[page] = future
+        self._prefetch(page + 1)
+        self._prefetch(page - 1)
+        return rows
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
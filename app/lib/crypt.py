@@ -2,10 +2,35 @@
 
 import os
 import base64
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
+import hashlib
+import hmac
+from itertools import repeat
+
+from lib.cache import LRUCache
+
+# The `cryptography` package and the thread pool are imported on first use, so
+# commands that never encrypt or decrypt start without paying for them.
+
+# Ciphertext formats:
+#   v1: base64(salt[16] + iv[16] + AES-CFB ct), one PBKDF2 run per field.
+#   v2: "$" + base64(version[1] + nonce[12] + AES-GCM ct+tag), keyed by the
+#       session key so no KDF runs per field. "$" is outside the base64
+#       alphabet, which keeps v1 values unambiguous.
+#   v3: the v2 layout stored as raw bytes (a BLOB) instead of text, saving
+#       the prefix and the base64 overhead. Only v3 values are bytes.
+FORMAT_V1 = 1
+FORMAT_V2 = 2
+FORMAT_V3 = 3
+VERSIONED_PREFIX = "$"
+NONCE_SIZE = 12
+
+# Maximum number of decrypted account/category names kept per session
+NAME_CACHE_SIZE = 1024
+
+# Minimum number of legacy v1 values in a batch before the *_many helpers use the pool
+PARALLEL_THRESHOLD = 4
+
+_pool = None
 
 # ==============================
 # Helper Enkripsi & Hashing
@@ -13,21 +38,65 @@ from cryptography.hazmat.backends import default_backend
 
 
 def derive_key(password: str, salt: bytes) -> bytes:
-    """Derives a 32-byte encryption key from a password and salt using PBKDF2."""
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=100_000,
-        backend=default_backend()
-    )
-    return kdf.derive(password.encode())
-
-
-def encrypt(data: str, password: str) -> str:
-    """Encrypts data using AES-CFB mode with a derived key."""
+    """Derives a 32-byte encryption key from a password and salt using PBKDF2-HMAC-SHA256."""
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, 100_000, dklen=32)
+
+
+class SessionKey:
+    """Master encryption key derived once at login and reused for every field."""
+
+    __slots__ = ("password", "key", "biner", "names", "_aead", "_index_key")
+
+    def __init__(self, password: str, salt: bytes, biner: bool = False):
+        # The password is kept only to read legacy v1 values.
+        self.password = password
+        self.key = derive_key(password, salt)
+        # Write v3 (bytes) instead of v2 (text)
+        self.biner = biner
+        # (table, id) -> decrypted name, filled by the database layer
+        self.names = LRUCache(NAME_CACHE_SIZE)
+        self._aead = None
+        # Separate subkey so search tokens reveal nothing about the encryption key
+        self._index_key = hmac.new(self.key, b"blind-index", hashlib.sha256).digest()
+
+    def blind_index(self, word: str) -> bytes:
+        """Keyed 16-byte search token; equal words give equal tokens for the same profile."""
+        return hmac.new(self._index_key, word.encode(), hashlib.sha256).digest()[:16]
+
+    @property
+    def aead(self):
+        if self._aead is None:
+            from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+            self._aead = AESGCM(self.key)
+        return self._aead
+
+    def encrypt(self, data: str):
+        nonce = os.urandom(NONCE_SIZE)
+        ct = self.aead.encrypt(nonce, data.encode(), None)
+        if self.biner:
+            return bytes([FORMAT_V3]) + nonce + ct
+        raw = bytes([FORMAT_V2]) + nonce + ct
+        return VERSIONED_PREFIX + base64.b64encode(raw).decode()
+
+    def decrypt(self, enc_data) -> str:
+        if isinstance(enc_data, bytes):
+            raw, version = enc_data, FORMAT_V3
+        else:
+            raw, version = base64.b64decode(enc_data[len(VERSIONED_PREFIX):]), FORMAT_V2
+        if raw[0] != version:
+            raise ValueError(f"Unsupported ciphertext version: {raw[0]}")
+        nonce, ct = raw[1:1 + NONCE_SIZE], raw[1 + NONCE_SIZE:]
+        return self.aead.decrypt(nonce, ct, None).decode()
+
+
+def encrypt(data: str, password):
+    """Encrypts data with a session key (v2, or v3 bytes) or a raw password (legacy v1)."""
     if not data:
         return ""
+    if isinstance(password, SessionKey):
+        return password.encrypt(data)
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.hazmat.backends import default_backend
     salt = os.urandom(16)
     key = derive_key(password, salt)
     iv = os.urandom(16)
@@ -38,10 +107,20 @@ def encrypt(data: str, password: str) -> str:
     return base64.b64encode(salt + iv + ct).decode()
 
 
-def decrypt(enc_data: str, password: str) -> str:
+def decrypt(enc_data, password) -> str:
     """Decrypts data that was encrypted with the corresponding master password."""
     if not enc_data:
         return ""
+    if isinstance(enc_data, bytes) or enc_data.startswith(VERSIONED_PREFIX):
+        # v2/v3 values can only be read with the session key
+        try:
+            return password.decrypt(enc_data)
+        except Exception:
+            return "DECRYPTION_ERROR"
+    if isinstance(password, SessionKey):
+        password = password.password
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.hazmat.backends import default_backend
     try:
         raw = base64.b64decode(enc_data)
         salt, iv, ct = raw[:16], raw[16:32], raw[32:]
@@ -52,3 +131,59 @@ def decrypt(enc_data: str, password: str) -> str:
     except Exception:
         # Return a specific error string if decryption fails (e.g., wrong password)
         return "DECRYPTION_ERROR"
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="crypt")
+    return _pool
+
+
+def decrypt_many(values, password) -> list:
+    """Decrypts a batch of values, preserving order and the DECRYPTION_ERROR result.
+
+    v2 values only need one AES-GCM call and are decrypted inline. Legacy v1
+    values each cost a full PBKDF2 run, so batches with several of them are
+    spread over a thread pool sized to the machine's cores.
+    """
+    values = list(values)
+    legacy = sum(1 for v in values if v and isinstance(v, str) and not v.startswith(VERSIONED_PREFIX))
+    if legacy < PARALLEL_THRESHOLD or (os.cpu_count() or 1) == 1:
+        return [decrypt(v, password) for v in values]
+    return list(_get_pool().map(decrypt, values, repeat(password)))
+
+
+def encrypt_many(values, password) -> list:
+    """Encrypts a batch of values, preserving order.
+
+    With a SessionKey each value is one AES-GCM call and is encrypted inline;
+    a raw password means a PBKDF2 run per value, so large batches use the pool.
+    """
+    values = list(values)
+    if isinstance(password, SessionKey) or len(values) < PARALLEL_THRESHOLD or (os.cpu_count() or 1) == 1:
+        return [encrypt(v, password) for v in values]
+    return list(_get_pool().map(encrypt, values, repeat(password)))
+
+
+def _reencrypt_slice(values, old, new):
+    result = []
+    for value in values:
+        plain = decrypt(value, old)
+        result.append(None if plain == "DECRYPTION_ERROR" else (plain, encrypt(plain, new)))
+    return result
+
+
+def reencrypt_many(values, old, new, slice_size=64) -> list:
+    """Re-encrypts a batch from key `old` to session key `new`, preserving order.
+
+    Each result is a (plaintext, new ciphertext) pair, or None when the value
+    cannot be decrypted with `old`. Batches are cut into slices that run on
+    the thread pool, so legacy values and large batches use every core.
+    """
+    values = list(values)
+    if len(values) < PARALLEL_THRESHOLD or (os.cpu_count() or 1) == 1:
+        return _reencrypt_slice(values, old, new)
+    slices = [values[i:i + slice_size] for i in range(0, len(values), slice_size)]
+    return [pair for part in _get_pool().map(_reencrypt_slice, slices, repeat(old), repeat(new)) for pair in part]
@@ -0,0 +1,167 @@
+# app/lib/profiling.py
+
+import functools
+import sqlite3
+import sys
+import threading
+import time
+
+# Opt-in instrumentation. Nothing is wrapped until enable() is called, so a
+# normal run pays no overhead at all.
+ENV_FLAG = "APP_PROFILE"
+ENV_DUMP = "APP_PROFILE_DUMP"
+
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = [(1e-5, "<10us"), (1e-4, "<100us"), (1e-3, "<1ms"), (1e-2, "<10ms"),
+           (1e-1, "<100ms"), (1.0, "<1s"), (float("inf"), ">=1s")]
+
+_enabled = False
+_lock = threading.Lock()
+_calls = {}  # name -> {"count", "total", "max", "buckets"}
+_counters = {"connections_opened": 0, "sql_statements": 0, "rows_fetched": 0}
+_profiler = None
+_dump_path = None
+
+
+def is_enabled():
+    return _enabled
+
+
+def _count(counter, n=1):
+    with _lock:
+        _counters[counter] += n
+
+
+def _record(name, elapsed):
+    with _lock:
+        stat = _calls.get(name)
+        if stat is None:
+            stat = _calls[name] = {"count": 0, "total": 0.0, "max": 0.0, "buckets": [0] * len(BUCKETS)}
+        stat["count"] += 1
+        stat["total"] += elapsed
+        stat["max"] = max(stat["max"], elapsed)
+        stat["buckets"][next(i for i, (limit, _) in enumerate(BUCKETS) if elapsed < limit)] += 1
+
+
+def _wrap(name, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _record(name, time.perf_counter() - start)
+    return wrapper
+
+
+def _instrument_functions(modules):
+    """Wraps every public function defined in `modules`, rebinding imported references too.
+
+    Generators and context managers are skipped: timing their creation says nothing.
+    """
+    import inspect
+    wrapped = {}
+    for module in modules:
+        for name, obj in vars(module).items():
+            if (inspect.isfunction(obj) and obj.__module__ == module.__name__
+                    and not name.startswith("_") and not hasattr(obj, "__wrapped__")
+                    and not inspect.isgeneratorfunction(obj)):
+                wrapped[obj] = _wrap(f"{module.__name__}.{name}", obj)
+    for module in modules:
+        for name, obj in list(vars(module).items()):
+            if inspect.isfunction(obj) and obj in wrapped:
+                setattr(module, name, wrapped[obj])
+
+
+class _ProfiledCursor(sqlite3.Cursor):
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            _count("rows_fetched")
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        _count("rows_fetched", len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        _count("rows_fetched", len(rows))
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        _count("rows_fetched")
+        return row
+
+
+def _instrument_connections(db_module):
+    """Swaps the database module's connection class for one that counts connections, statements and rows."""
+    base = db_module.SharedConnection
+
+    class ProfiledConnection(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            _count("connections_opened")
+            self.set_trace_callback(lambda statement: _count("sql_statements"))
+
+        def cursor(self, factory=_ProfiledCursor):
+            return super().cursor(factory)
+
+        def execute(self, sql, parameters=()):
+            return self.cursor().execute(sql, parameters)
+
+        def executemany(self, sql, seq_of_parameters):
+            return self.cursor().executemany(sql, seq_of_parameters)
+
+    db_module.SharedConnection = ProfiledConnection
+    # Reopen so the current thread picks up the instrumented class
+    db_module.close_db_connection()
+
+
+def enable(crypt_module, db_module, dump_path=None):
+    """Turns on instrumentation of the crypto primitives and the database layer.
+
+    With `dump_path`, a cProfile run is also recorded and written there as a
+    pstats file by report().
+    """
+    global _enabled, _profiler, _dump_path
+    if _enabled:
+        return
+    _enabled = True
+    _instrument_functions([crypt_module, db_module])
+    _instrument_connections(db_module)
+    if dump_path:
+        import cProfile
+        _dump_path = dump_path
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def reset():
+    with _lock:
+        _calls.clear()
+        for counter in _counters:
+            _counters[counter] = 0
+
+
+def report(file=sys.stdout):
+    """Prints call counts, latency histograms and SQL counters, then resets them."""
+    with _lock:
+        calls = sorted(_calls.items(), key=lambda item: item[1]["total"], reverse=True)
+        counters = dict(_counters)
+    print("\n=== PROFIL SESI ===", file=file)
+    print(f"Koneksi dibuka: {counters['connections_opened']}, "
+          f"Statement SQL: {counters['sql_statements']}, "
+          f"Baris diambil: {counters['rows_fetched']}", file=file)
+    print(f"{'Fungsi':<48}{'Panggilan':>10}{'Total ms':>12}{'Rata ms':>10}{'Maks ms':>10}", file=file)
+    for name, stat in calls:
+        print(f"{name:<48}{stat['count']:>10}{stat['total'] * 1000:>12.2f}"
+              f"{stat['total'] * 1000 / stat['count']:>10.3f}{stat['max'] * 1000:>10.2f}", file=file)
+        histogram = ", ".join(f"{label}: {n}" for (_, label), n in zip(BUCKETS, stat["buckets"]) if n)
+        print(f"    {histogram}", file=file)
+    if _profiler is not None:
+        _profiler.dump_stats(_dump_path)
+        print(f"Data cProfile disimpan ke '{_dump_path}'", file=file)
+    reset()
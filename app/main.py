@@ -1,14 +1,18 @@
 # app/main.py
 
+import argparse
 import os
 import datetime
 from getpass import getpass
-import base64
-import math
 import csv
+import sys
 
+import cli
 import database as db
-from lib.crypt import derive_key
+from lib import crypt, profiling
+
+# backup, history, readmodel and reports are imported by the menus that use
+# them, so subcommands start without loading them.
 
 # ==============================
 # UI & Application Flow
@@ -16,10 +20,14 @@ from lib.crypt import derive_key
 
 
 def clear_screen():
-    os.system("cls" if os.name == "nt" else "clear")
+    if os.name == "nt":
+        os.system("cls")
+    else:
+        # ANSI clear + cursor home; avoids spawning `clear` on every redraw
+        print("\033[2J\033[H", end="", flush=True)
 
 
-def display_dashboard_and_menu(accounts):
+def display_dashboard_and_menu(orang_id, session, accounts, ledger=db):
     """Displays the financial summary dashboard and the main menu."""
     clear_screen()
     print("=== DASHBOARD ===")
@@ -32,11 +40,12 @@ def display_dashboard_and_menu(accounts):
     if not accounts:
         print("Anda belum memiliki akun (sumber dana).")
     else:
+        summary = ledger.get_dashboard_summary(orang_id, bulan_ini)
         for acc_id, acc_name in accounts:
-            trans = db.get_transactions_for_dashboard(acc_id)
-            saldo = sum(t['jumlah'] if t['tipe'] == 'pemasukan' else -t['jumlah'] for t in trans)
-            pemasukan_bulan_ini += sum(t['jumlah'] for t in trans if t['tipe'] == 'pemasukan' and t['tanggal'].startswith(bulan_ini))
-            pengeluaran_bulan_ini += sum(t['jumlah'] for t in trans if t['tipe'] == 'pengeluaran' and t['tanggal'].startswith(bulan_ini))
+            ringkasan = summary[acc_id]
+            saldo = ringkasan['saldo']
+            pemasukan_bulan_ini += ringkasan['pemasukan']
+            pengeluaran_bulan_ini += ringkasan['pengeluaran']
             total_saldo += saldo
             print(f"- Akun: {acc_name}, Saldo: Rp{saldo:,.2f}")
 
@@ -45,6 +54,15 @@ def display_dashboard_and_menu(accounts):
     print(f"Total Pemasukan Bulan Ini: Rp{pemasukan_bulan_ini:,.2f}")
     print(f"Total Pengeluaran Bulan Ini: Rp{pengeluaran_bulan_ini:,.2f}")
     print("=" * 30)
+
+    anggaran = db.get_status_anggaran(orang_id, bulan_ini)
+    if anggaran:
+        names = ledger.get_names("kategori", [a["kategori_id"] for a in anggaran], session)
+        print("\n=== ANGGARAN BULAN INI ===")
+        for a in anggaran:
+            tanda = "  << MELEBIHI" if a["melebihi"] else ""
+            print(f"- {names.get(a['kategori_id'], ''):<20} Rp{a['terpakai']:,.2f} / Rp{a['anggaran']:,.2f}"
+                  f" ({a['terpakai'] / a['anggaran']:.0%}){tanda}")
     
     print("\n=== MENU UTAMA ===")
     print("1. Catat Pemasukan")
@@ -56,17 +74,52 @@ def display_dashboard_and_menu(accounts):
     print("7. Lihat Riwayat Pengeluaran")
     print("8. Transfer Antar Akun")
     print("9. Export Laporan ke .csv")
+    print("11. Migrasi Enkripsi Data Lama")
+    print("12. Hitung Ulang Ringkasan Saldo")
+    print("13. Import Transaksi dari .csv")
+    print("14. Laporan Kategori & Tren Bulanan")
+    print("15. Cari Transaksi (Deskripsi)")
+    print("16. Ganti Master Password")
+    print("17. Simpan Data Terenkripsi dalam Format Biner (Hemat Ruang)")
+    print("18. Arsipkan Transaksi Lama")
+    print("19. Transaksi Berulang (Gaji, Sewa, Langganan)")
+    print("20. Atur Anggaran Bulanan per Kategori")
+    print("21. Backup Database")
     print("10. Logout (Kembali ke Pilih Profil)")
 
 
-def export_to_csv(orang_id, master_password):
+def input_periode():
+    """Asks for an optional inclusive date range; returns half-open (dari, sampai) bounds or (None, None)."""
+    while True:
+        text = input("Periode (YYYY-MM-DD s/d YYYY-MM-DD, kosongkan untuk semua): ").strip()
+        if not text:
+            return None, None
+        try:
+            dari, sampai = (cli.parse_tanggal(part.strip()) for part in text.split("s/d"))
+        except (ValueError, argparse.ArgumentTypeError):
+            print("Format periode tidak valid.")
+            continue
+        if sampai < dari:
+            print("Tanggal akhir tidak boleh sebelum tanggal awal.")
+            continue
+        return cli.periode(dari, sampai)
+
+
+def input_arsip(orang_id):
+    """Asks whether archived transactions should be included, if the profile has any."""
+    return db.punya_arsip(orang_id) and input("Sertakan transaksi yang diarsipkan? (y/n): ").lower() == "y"
+
+
+def export_to_csv(orang_id, session, ledger=db):
     """Handles the logic for exporting user transactions to a CSV file."""
     clear_screen()
     print("=== EXPORT LAPORAN KE CSV ===")
     
-    transactions = db.get_all_transactions_for_export(orang_id, master_password)
+    dari, sampai = input_periode()
+    arsip = input_arsip(orang_id)
+    total_rows = ledger.count_transactions(orang_id, dari=dari, sampai=sampai, arsip=arsip)
     
-    if not transactions:
+    if not total_rows:
         print("Tidak ada data transaksi untuk di-export.")
         input("\nTekan Enter untuk kembali..."); return
 
@@ -83,12 +136,15 @@ def export_to_csv(orang_id, master_password):
 
     try:
         with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            # Sesuai permintaan kolom
-            header = ['nama', 'tipe', 'kategori', 'jumlah', 'deskripsi', 'tanggal']
-            writer = csv.DictWriter(csvfile, fieldnames=header)
+            writer = csv.DictWriter(csvfile, fieldnames=db.EXPORT_COLUMNS)
             
             writer.writeheader()
-            writer.writerows(transactions)
+            # Rows are written as they are decrypted so memory stays flat
+            for i, row in enumerate(ledger.iter_transactions_for_export(orang_id, session, dari=dari, sampai=sampai,
+                                                                        arsip=arsip), 1):
+                writer.writerow(row)
+                if i % 500 == 0 or i == total_rows:
+                    print(f"\rMenulis {i}/{total_rows} baris...", end="", flush=True)
         
         print(f"\nLaporan berhasil disimpan ke file '{filename}'")
     except IOError as e:
@@ -97,44 +153,338 @@ def export_to_csv(orang_id, master_password):
     input("Tekan Enter untuk kembali...");
 
 
-def view_transactions_paged(orang_id, master_password, tipe):
+def import_from_csv(orang_id, session, ledger=db):
+    """Imports transactions from a CSV file in the same layout export_to_csv writes."""
+    clear_screen()
+    print("=== IMPORT TRANSAKSI DARI CSV ===")
+    filename = input("Masukkan nama file .csv: ")
+
+    def progress(baris, inserted, elapsed):
+        rate = inserted / elapsed if elapsed else 0
+        print(f"\r{baris} baris diimpor ({rate:,.0f} baris/detik)...", end="", flush=True)
+
+    try:
+        with open(filename, newline='', encoding='utf-8') as csvfile:
+            reader = csv.DictReader(csvfile)
+            if not reader.fieldnames or not set(db.EXPORT_COLUMNS) <= set(reader.fieldnames):
+                print(f"Kolom file harus: {', '.join(db.EXPORT_COLUMNS)}")
+                input("\nTekan Enter untuk kembali..."); return
+            # The same unchanged file resumes from its last committed chunk
+            sumber = f"{os.path.abspath(filename)}:{os.path.getsize(filename)}"
+            inserted = ledger.import_transaksi(orang_id, reader, session, sumber, progress=progress)
+        print(f"\nImport selesai. {inserted} transaksi baru ditambahkan.")
+    except IOError as e:
+        print(f"\nTerjadi error saat membaca file: {e}")
+    except ValueError as e:
+        print(f"\nImport dihentikan: {e}")
+        print("Baris sebelum error sudah tersimpan; jalankan ulang import untuk melanjutkan.")
+
+    input("Tekan Enter untuk kembali...")
+
+
+def show_report(orang_id, session):
+    """Displays monthly income/expense trends, expense categories and account balances."""
+    clear_screen()
+    print("=== LAPORAN KEUANGAN ===")
+    try:
+        import reports
+        laporan = reports.build_report(orang_id, session)
+    except RuntimeError as e:
+        print(e)
+        input("\nTekan Enter untuk kembali..."); return
+
+    if not laporan["bulanan"]:
+        print("Tidak ada data transaksi.")
+        input("\nTekan Enter untuk kembali..."); return
+
+    print("\n--- 12 Bulan Terakhir ---")
+    print(f"{'Bulan':<10}{'Pemasukan':>18}{'Pengeluaran':>18}{'Rata2 Keluar (3bln)':>22}")
+    for b in laporan["bulanan"]:
+        print(f"{b['bulan']:<10}{b['pemasukan']:>18,.2f}{b['pengeluaran']:>18,.2f}{b['rata_pengeluaran']:>22,.2f}")
+
+    print("\n--- Pengeluaran per Kategori ---")
+    for k in laporan["kategori_pengeluaran"]:
+        print(f"{k['kategori']:<25}Rp{k['total']:>18,.2f}  {k['porsi']:>6.1%}")
+
+    print("\n--- Saldo Akun ---")
+    for a in laporan["akun"]:
+        print(f"{a['akun']:<25}Rp{a['saldo']:>18,.2f}  (terendah Rp{a['saldo_terendah']:,.2f})")
+
+    input("\nTekan Enter untuk kembali...")
+
+
+def search_transactions(orang_id, session):
+    """Handles the UI for keyword search over transaction descriptions."""
+    clear_screen()
+    print("=== CARI TRANSAKSI ===")
+    if db.blind_index_pending(orang_id):
+        print("Menyiapkan indeks pencarian untuk data lama...")
+        total = db.backfill_blind_index(
+            orang_id, session, progress=lambda n: print(f"\r{n} transaksi diindeks...", end="", flush=True)
+        )
+        print(f"\nIndeks selesai ({total} transaksi).\n")
+
+    keyword = input("Kata kunci: ")
+    results = db.search_transaksi(orang_id, session, keyword)
+    if not results:
+        print("Tidak ada transaksi yang cocok.")
+    for t in results:
+        print("-" * 30)
+        print(f"Tanggal   : {t['tanggal']}")
+        print(f"Tipe      : {t['tipe']}")
+        print(f"Akun      : {t['nama_account']}")
+        print(f"Kategori  : {t['nama_kategori']}")
+        print(f"Jumlah    : Rp{t['jumlah']:,.2f}")
+        print(f"Deskripsi : {t['deskripsi']}")
+    input("\nTekan Enter untuk kembali...")
+
+
+def migrate_encryption(orang_id, session):
+    """Rewrites data stored in the old per-field-KDF format with the session key."""
+    clear_screen()
+    print("=== MIGRASI ENKRIPSI DATA LAMA ===")
+    print("Data lama akan dienkripsi ulang dengan format baru yang lebih cepat.")
+    if input("Lanjutkan? (y/n): ").lower() != "y":
+        return
+
+    def progress(table, total):
+        print(f"\r{total} data dimigrasi ({table})...", end="", flush=True)
+
+    total = db.migrasi_enkripsi(orang_id, session, progress=progress)
+    print(f"\nMigrasi selesai. {total} data dienkripsi ulang.")
+    input("Tekan Enter untuk kembali...")
+
+
+def migrate_to_blob(orang_id, session):
+    """Rewrites the profile's text ciphertexts as compact BLOBs and reports the space saved."""
+    clear_screen()
+    print("=== FORMAT BINER UNTUK DATA TERENKRIPSI ===")
+    print("Data terenkripsi akan disimpan sebagai BLOB tanpa base64 sehingga database lebih kecil.")
+    if input("Lanjutkan? (y/n): ").lower() != "y":
+        return
+    vacuum = input("Perkecil file database setelahnya dengan VACUUM? (y/n): ").lower() == "y"
+
+    def progress(table, total):
+        print(f"\r{total} data ditulis ulang ({table})...", end="", flush=True)
+
+    laporan = db.migrasi_biner(orang_id, session, progress=progress, vacuum=vacuum)
+    hemat = laporan["byte_sebelum"] - laporan["byte_sesudah"]
+    print(f"\nSelesai. {laporan['jumlah']} data ditulis ulang: "
+          f"{laporan['byte_sebelum']:,} -> {laporan['byte_sesudah']:,} byte (hemat {hemat:,} byte).")
+    if vacuum:
+        print(f"Ukuran file: {laporan['file_sebelum']:,} -> {laporan['file_sesudah']:,} byte.")
+    input("Tekan Enter untuk kembali...")
+
+
+def archive_transactions(orang_id, ledger=db):
+    """Moves transactions older than a chosen date out of the working table."""
+    clear_screen()
+    print("=== ARSIPKAN TRANSAKSI LAMA ===")
+    print("Transaksi sebelum tanggal batas dipindahkan ke tabel arsip per tahun.")
+    print("Saldo dan laporan tetap menghitungnya; riwayat & export dapat menyertakannya.")
+    try:
+        sebelum = cli.parse_tanggal(input("Arsipkan transaksi sebelum tanggal (YYYY-MM-DD): ").strip())
+    except argparse.ArgumentTypeError as e:
+        print(e); input("Tekan Enter untuk kembali..."); return
+
+    def progress(tahun, total):
+        print(f"\r{total} transaksi diarsipkan (s/d tahun {tahun})...", end="", flush=True)
+
+    total = ledger.arsipkan_transaksi(orang_id, sebelum, progress=progress)
+    print(f"\nSelesai. {total} transaksi diarsipkan.")
+    input("Tekan Enter untuk kembali...")
+
+
+def change_master_password(orang_id, session, lanjutkan=False, ledger=db):
+    """Re-encrypts the profile under a new master password; returns the session to keep using.
+
+    With lanjutkan=True an interrupted change is resumed with the same new password.
+    """
+    clear_screen()
+    print("=== GANTI MASTER PASSWORD ===")
+    if lanjutkan:
+        print("Penggantian master password sebelumnya belum selesai dan harus dilanjutkan.")
+        password_baru = getpass("Master Password baru (yang dipilih sebelumnya): ")
+    else:
+        password_baru = getpass("Master Password baru: ")
+        if not password_baru or password_baru != getpass("Konfirmasi Master Password baru: "):
+            print("Password tidak cocok atau kosong.")
+            input("Tekan Enter untuk kembali..."); return session
+
+    def progress(tabel, total):
+        print(f"\r{total} data dienkripsi ulang ({tabel})...", end="", flush=True)
+
+    try:
+        session = ledger.ganti_master_password(orang_id, session, password_baru, progress=progress)
+        print("\nMaster password berhasil diganti.")
+    except (ValueError, RuntimeError) as e:
+        print(f"\n{e}")
+    input("Tekan Enter untuk kembali...")
+    return session
+
+
+def print_peringatan_anggaran(orang_id, kategori_id):
+    """Warns when the category's budget for this month has been exceeded."""
+    status = db.cek_anggaran(orang_id, kategori_id, datetime.datetime.now().strftime("%Y-%m"))
+    if status and status["melebihi"]:
+        print(f"PERINGATAN: anggaran kategori ini terlampaui Rp{-status['sisa']:,.2f} "
+              f"(terpakai Rp{status['terpakai']:,.2f} dari Rp{status['anggaran']:,.2f}).")
+
+
+def set_budget(orang_id, session, ledger=db):
+    """Lets the user set or remove the monthly budget of an expense category."""
+    clear_screen()
+    print("=== ANGGARAN BULANAN PER KATEGORI ===")
+    kategori_list = ledger.get_kategori(orang_id, "pengeluaran", session)
+    if not kategori_list:
+        print("Belum ada kategori pengeluaran.")
+        input("\nTekan Enter untuk kembali..."); return
+    status = {a["kategori_id"]: a for a in db.get_status_anggaran(orang_id, datetime.datetime.now().strftime("%Y-%m"))}
+    for k_id, k_nama in kategori_list:
+        a = status.get(k_id)
+        info = f"Rp{a['terpakai']:,.2f} / Rp{a['anggaran']:,.2f}" if a else "tanpa anggaran"
+        print(f"{k_id}. {k_nama} - {info}")
+    try:
+        kat_id = int(input("\nPilih ID kategori: "))
+        if not any(k[0] == kat_id for k in kategori_list):
+            print("ID Kategori tidak valid."); input("Tekan Enter..."); return
+        jumlah = input("Anggaran per bulan (kosongkan untuk menghapus): ").strip()
+        jumlah = float(jumlah) if jumlah else None
+        if jumlah is not None and jumlah <= 0:
+            raise ValueError
+    except ValueError:
+        print("Input jumlah atau ID tidak valid."); input("Tekan Enter..."); return
+    db.atur_anggaran(orang_id, kat_id, jumlah)
+    print("Anggaran disimpan." if jumlah is not None else "Anggaran dihapus.")
+    input("Tekan Enter...")
+
+
+def recurring_transactions(orang_id, session, ledger=db):
+    """Lists the profile's recurring rules and lets the user add or delete one."""
+    while True:
+        clear_screen()
+        print("=== TRANSAKSI BERULANG ===")
+        rules = db.get_transaksi_berulang(orang_id, session)
+        if not rules:
+            print("Belum ada transaksi berulang.")
+        for r in rules:
+            jatuh_tempo = r['jatuh_tempo'] or "selesai"
+            print(f"{r['id']}. [{r['frekuensi']}] {r['tipe']} Rp{r['jumlah']:,.2f} - {r['nama_kategori']} "
+                  f"({r['nama_account']}) berikutnya: {jatuh_tempo}")
+            if r['deskripsi']:
+                print(f"    {r['deskripsi']}")
+        print("\n[T] Tambah, [H] Hapus, [E] Keluar ke Menu")
+        nav = input("Pilihan: ").lower()
+        if nav == "e":
+            return
+        if nav == "h":
+            try:
+                rule_id = int(input("ID transaksi berulang: "))
+            except ValueError:
+                print("ID tidak valid."); input("Tekan Enter..."); continue
+            if db.hapus_transaksi_berulang(orang_id, rule_id):
+                print("Transaksi berulang dihapus. Transaksi yang sudah tercatat tidak berubah.")
+            else:
+                print("ID tidak valid.")
+            input("Tekan Enter..."); continue
+        if nav != "t":
+            continue
+
+        accounts = ledger.get_accounts_by_orang(orang_id, session)
+        if not accounts:
+            print("\nAnda harus memiliki akun. Silakan tambah dari menu 3."); input("Tekan Enter..."); return
+        tipe = "pemasukan" if input("Tipe (1. Pemasukan, 2. Pengeluaran): ") == "1" else "pengeluaran"
+        try:
+            for acc_id, acc_nama in accounts: print(f"{acc_id}. {acc_nama}")
+            acc_id = int(input("Pilih ID Akun: "))
+            if not any(acc[0] == acc_id for acc in accounts):
+                print("ID Akun tidak valid."); input("Tekan Enter..."); continue
+            kategori_list = ledger.get_kategori(orang_id, tipe, session)
+            for k_id, k_nama in kategori_list: print(f"{k_id}. {k_nama}")
+            kat_id = int(input("Pilih ID kategori: "))
+            if not any(k[0] == kat_id for k in kategori_list):
+                print("ID Kategori tidak valid."); input("Tekan Enter..."); continue
+            jumlah = float(input("Jumlah: "))
+            deskripsi = input("Deskripsi (opsional): ")
+            frekuensi = input(f"Frekuensi ({'/'.join(db.FREKUENSI)}, default bulanan): ").strip() or "bulanan"
+            hari_ini = datetime.date.today().isoformat()
+            mulai = cli.parse_tanggal(input(f"Tanggal pertama (YYYY-MM-DD, default {hari_ini}): ").strip() or hari_ini)
+            berakhir = input("Tanggal berakhir (YYYY-MM-DD, kosongkan jika tidak ada): ").strip()
+            berakhir = cli.parse_tanggal(berakhir) if berakhir else None
+            db.tambah_transaksi_berulang(acc_id, kat_id, tipe, jumlah, deskripsi, frekuensi, mulai, session, berakhir)
+        except (ValueError, argparse.ArgumentTypeError) as e:
+            print(f"Input tidak valid: {e}"); input("Tekan Enter..."); continue
+        # A first date in the past is caught up right away
+        total = ledger.proses_transaksi_berulang(orang_id, session)
+        print(f"Transaksi berulang ditambahkan. {total} transaksi jatuh tempo dicatat.")
+        input("Tekan Enter...")
+
+
+def print_backup_progress(tahap, selesai, total):
+    label = {"salin": "Menyalin", "tulis": "Mengompres"}[tahap]
+    print(f"\r{label}: {selesai}/{total}...", end="", flush=True)
+
+
+def backup_database():
+    """Writes a compressed snapshot of the database (incremental after the first one)."""
+    import backup
+    clear_screen()
+    print("=== BACKUP DATABASE ===")
+    folder = input(f"Folder backup (default: {backup.DEFAULT_FOLDER}): ").strip() or backup.DEFAULT_FOLDER
+    penuh = input("Backup penuh? Tidak = hanya halaman yang berubah (y/n): ").lower() == "y"
+    laporan = backup.buat_snapshot(folder, penuh, progress=print_backup_progress)
+    print(f"\nSnapshot {laporan['jenis']} disimpan ke '{laporan['file']}'.")
+    print(f"{laporan['halaman_ditulis']}/{laporan['halaman']} halaman disimpan, {laporan['byte_file']:,} byte, "
+          f"{laporan['detik']:.2f} detik ({laporan['mb_per_detik']:.1f} MB/detik).")
+    print("Pemulihan (mengganti data SEMUA profil) dilakukan dengan perintah: python main.py restore")
+    input("Tekan Enter untuk kembali...")
+
+
+def view_transactions_paged(orang_id, session, tipe, ledger=db):
     """Handles the UI for viewing paginated transactions."""
+    from history import HistoryPager
     page = 1
-    page_size = 20
+    clear_screen()
+    print(f"=== RIWAYAT {tipe.upper()} ===")
+    dari, sampai = input_periode()
+    arsip = input_arsip(orang_id)
+    pager = HistoryPager(orang_id, session, tipe, page_size=20, dari=dari, sampai=sampai, arsip=arsip,
+                         source=ledger)
     
-    while True:
-        clear_screen()
-        print(f"=== RIWAYAT {tipe.upper()} ===")
-        
-        total_items = db.count_transactions(orang_id, tipe)
-        if total_items == 0:
-            print("Tidak ada data transaksi.")
-            input("\nTekan Enter untuk kembali..."); return
+    try:
+        while True:
+            clear_screen()
+            print(f"=== RIWAYAT {tipe.upper()} ===")
+            
+            if pager.total_items == 0:
+                print("Tidak ada data transaksi.")
+                input("\nTekan Enter untuk kembali..."); return
 
-        total_pages = math.ceil(total_items / page_size)
-        
-        transactions = db.get_transactions_paginated(orang_id, master_password, tipe, page, page_size)
-        
-        for t in transactions:
+            # Served from the page cache once the background worker has prefetched it
+            transactions = pager.get(page)
+            
+            for t in transactions:
+                print("-" * 30)
+                print(f"Tanggal   : {t['tanggal']}")
+                print(f"Akun      : {t['nama_account']}")
+                print(f"Kategori  : {t['nama_kategori']}")
+                print(f"Jumlah    : Rp{t['jumlah']:,.2f}")
+                if t['deskripsi']:
+                    print(f"Deskripsi : {t['deskripsi']}")
+            
             print("-" * 30)
-            print(f"Tanggal   : {t['tanggal']}")
-            print(f"Akun      : {t['nama_account']}")
-            print(f"Kategori  : {t['nama_kategori']}")
-            print(f"Jumlah    : Rp{t['jumlah']:,.2f}")
-            if t['deskripsi']:
-                print(f"Deskripsi : {t['deskripsi']}")
-        
-        print("-" * 30)
-        print(f"Halaman {page}/{total_pages} ({total_items} total data)")
-        print("\n[N] Halaman Berikutnya, [P] Halaman Sebelumnya, [E] Keluar ke Menu")
-        
-        nav = input("Pilihan: ").lower()
-        if nav == 'n' and page < total_pages:
-            page += 1
-        elif nav == 'p' and page > 1:
-            page -= 1
-        elif nav == 'e':
-            break
+            print(f"Halaman {page}/{pager.total_pages} ({pager.total_items} total data)")
+            print("\n[N] Halaman Berikutnya, [P] Halaman Sebelumnya, [E] Keluar ke Menu")
+            
+            nav = input("Pilihan: ").lower()
+            if nav == 'n' and page < pager.total_pages:
+                page += 1
+            elif nav == 'p' and page > 1:
+                page -= 1
+            elif nav == 'e':
+                break
+    finally:
+        pager.close()
 
 
 def login_menu():
@@ -176,13 +526,20 @@ def login_menu():
                     password_hash = profil_data['master_password_hash']
                     master_password = getpass(f"Masukkan Master Password untuk {profil_data['nama']}: ")
                     
-                    raw_hash = base64.b64decode(password_hash)
-                    salt, key_stored = raw_hash[:16], raw_hash[16:]
-                    key_input = derive_key(master_password, salt)
-                    
-                    if key_input == key_stored:
-                         print("Login berhasil!"); input("Tekan Enter...")
-                         return orang_id, master_password
+                    if db.verify_master_password(password_hash, master_password):
+                         session = db.buka_sesi(orang_id, master_password)
+                         print("Login berhasil!")
+                         if db.rotasi_tertunda(orang_id):
+                             input("Tekan Enter...")
+                             session = change_master_password(orang_id, session, lanjutkan=True)
+                             if db.rotasi_tertunda(orang_id):
+                                 continue
+                         # Occurrences that fell due while the app was closed are posted in one go
+                         total = db.proses_transaksi_berulang(orang_id, session)
+                         if total:
+                             print(f"{total} transaksi berulang yang jatuh tempo telah dicatat.")
+                         input("Tekan Enter...")
+                         return orang_id, session
                     else:
                         print("Master Password salah!"); input("Tekan Enter...")
                 else:
@@ -191,12 +548,22 @@ def login_menu():
                 print("Input tidak valid."); input("Tekan Enter...")
 
 
-def main_menu(orang_id, master_password):
-    """The main application loop after a user has logged in."""
-    accounts = db.get_accounts_by_orang(orang_id, master_password)
+def main_menu(orang_id, session, batas_read_model=None):
+    """The main application loop after a user has logged in.
+
+    With a read model cap (in bytes) the session's data is decrypted once into
+    memory and menus read from there; see readmodel.buka.
+    """
+    import readmodel
+    ledger = readmodel.buka(orang_id, session, batas_read_model)
+    accounts = ledger.get_accounts_by_orang(orang_id, session)
     
     while True:
-        display_dashboard_and_menu(accounts)
+        if ledger is not db and not ledger.aktif:
+            print("Data melebihi batas memori read model; membaca langsung dari database.")
+            input("Tekan Enter...")
+            ledger = db
+        display_dashboard_and_menu(orang_id, session, accounts, ledger)
         pilihan = input("Pilih menu: ")
 
         if pilihan in ["1", "2"]:
@@ -213,7 +580,7 @@ def main_menu(orang_id, master_password):
                 if not any(acc[0] == acc_id for acc in accounts):
                     print("ID Akun tidak valid."); input("Tekan Enter..."); continue
                 
-                kategori_list = db.get_kategori(tipe, master_password)
+                kategori_list = ledger.get_kategori(orang_id, tipe, session)
                 if not kategori_list:
                     print(f"\nBelum ada kategori {tipe}."); input("Tekan Enter..."); continue
                 
@@ -227,9 +594,12 @@ def main_menu(orang_id, master_password):
                 jumlah = float(input("Jumlah: "))
                 deskripsi = input("Deskripsi (opsional): ")
                 
-                db.tambah_transaksi(acc_id, kat_id, tipe, jumlah, deskripsi, master_password)
-                accounts = db.get_accounts_by_orang(orang_id, master_password)  # Refresh data
-                print("\nTransaksi berhasil ditambahkan!"); input("Tekan Enter...")
+                ledger.tambah_transaksi(acc_id, kat_id, tipe, jumlah, deskripsi, session)
+                accounts = ledger.get_accounts_by_orang(orang_id, session)  # Refresh data
+                print("\nTransaksi berhasil ditambahkan!")
+                if tipe == "pengeluaran":
+                    print_peringatan_anggaran(orang_id, kat_id)
+                input("Tekan Enter...")
             except ValueError:
                 print("Input jumlah atau ID tidak valid."); input("Tekan Enter...")
 
@@ -237,9 +607,9 @@ def main_menu(orang_id, master_password):
             # ... (kode tidak berubah) ...
             nama_acc = input("Nama Akun baru (cth: Cash, GoPay): ")
             if nama_acc:
-                db.tambah_account(orang_id, nama_acc, master_password)
+                ledger.tambah_account(orang_id, nama_acc, session)
                 print(f"Akun '{nama_acc}' berhasil ditambahkan.")
-                accounts = db.get_accounts_by_orang(orang_id, master_password)
+                accounts = ledger.get_accounts_by_orang(orang_id, session)
             else:
                 print("Nama Akun tidak boleh kosong.")
             input("Tekan Enter...")
@@ -247,20 +617,20 @@ def main_menu(orang_id, master_password):
         elif pilihan == "4":
             # ... (kode tidak berubah) ...
             nama = input("Nama kategori pemasukan baru (cth: Gaji): ")
-            if nama: db.tambah_kategori(nama, "pemasukan", master_password); print("Kategori ditambahkan.")
+            if nama: ledger.tambah_kategori(orang_id, nama, "pemasukan", session); print("Kategori ditambahkan.")
             input("Tekan Enter...")
 
         elif pilihan == "5":
             # ... (kode tidak berubah) ...
             nama = input("Nama kategori pengeluaran baru (cth: Makanan): ")
-            if nama: db.tambah_kategori(nama, "pengeluaran", master_password); print("Kategori ditambahkan.")
+            if nama: ledger.tambah_kategori(orang_id, nama, "pengeluaran", session); print("Kategori ditambahkan.")
             input("Tekan Enter...")
         
         elif pilihan == "6":
-            view_transactions_paged(orang_id, master_password, "pemasukan")
+            view_transactions_paged(orang_id, session, "pemasukan", ledger)
 
         elif pilihan == "7":
-            view_transactions_paged(orang_id, master_password, "pengeluaran")
+            view_transactions_paged(orang_id, session, "pengeluaran", ledger)
             
         elif pilihan == "8":
             # ... (kode tidak berubah) ...
@@ -286,21 +656,62 @@ def main_menu(orang_id, master_password):
 
                 jumlah = float(input("Jumlah yang akan ditransfer: "))
                 
-                saldo_sumber = db.get_account_balance(from_id)
-                if saldo_sumber < jumlah:
-                    print(f"\nSaldo tidak mencukupi! Saldo saat ini: Rp{saldo_sumber:,.2f}"); input("Tekan Enter..."); continue
-                
-                db.transfer_dana(from_id, to_id, jumlah, master_password)
-                accounts = db.get_accounts_by_orang(orang_id, master_password)  # Refresh data
+                # The balance is checked inside the same transaction as the transfer
+                ledger.transfer_dana(orang_id, from_id, to_id, jumlah, session)
+                accounts = ledger.get_accounts_by_orang(orang_id, session)  # Refresh data
                 print("\nTransfer berhasil!"); input("Tekan Enter...")
 
+            except db.SaldoTidakCukupError as e:
+                print(f"\nSaldo tidak mencukupi! Saldo saat ini: Rp{e.saldo:,.2f}"); input("Tekan Enter...")
             except ValueError:
                 print("\nInput ID atau jumlah tidak valid."); input("Tekan Enter...")
         
         elif pilihan == "9":
-            export_to_csv(orang_id, master_password)
+            export_to_csv(orang_id, session, ledger)
+
+        elif pilihan == "11":
+            migrate_encryption(orang_id, session)
+            accounts = ledger.get_accounts_by_orang(orang_id, session)  # Refresh data
+
+        elif pilihan == "12":
+            selisih = db.rebuild_ringkasan()
+            if selisih:
+                print(f"Ringkasan dihitung ulang. {selisih} akun memiliki saldo yang tidak sesuai dan telah diperbaiki.")
+            else:
+                print("Ringkasan dihitung ulang. Semua saldo sudah sesuai.")
+            input("Tekan Enter...")
+
+        elif pilihan == "13":
+            import_from_csv(orang_id, session, ledger)
+            accounts = ledger.get_accounts_by_orang(orang_id, session)  # Refresh data
+
+        elif pilihan == "14":
+            show_report(orang_id, session)
+
+        elif pilihan == "15":
+            search_transactions(orang_id, session)
+
+        elif pilihan == "16":
+            session = change_master_password(orang_id, session, ledger=ledger)
+
+        elif pilihan == "17":
+            migrate_to_blob(orang_id, session)
+
+        elif pilihan == "18":
+            archive_transactions(orang_id, ledger)
+
+        elif pilihan == "19":
+            recurring_transactions(orang_id, session, ledger)
+
+        elif pilihan == "20":
+            set_budget(orang_id, session, ledger)
+
+        elif pilihan == "21":
+            backup_database()
 
         elif pilihan == "10":
+            if profiling.is_enabled():
+                profiling.report()
             print("Logout berhasil."); input("Tekan Enter..."); return
         else:
             print("Pilihan tidak valid."); input("Tekan Enter...")
@@ -311,8 +722,22 @@ def main_menu(orang_id, master_password):
 
 
 if __name__ == "__main__":
+    args = cli.build_parser().parse_args()
+    dump_path = args.profile_dump or os.environ.get(profiling.ENV_DUMP)
+    if args.profile or dump_path or os.environ.get(profiling.ENV_FLAG):
+        profiling.enable(crypt, db, dump_path)
+
     db.setup_database()  # Ensure tables exist before starting
+    if args.command:
+        exit_code = cli.run(args)
+        if profiling.is_enabled():
+            profiling.report(file=sys.stderr)
+        sys.exit(exit_code)
+    import readmodel
+    batas_read_model = readmodel.batas_dari_env()
+    if args.read_model is not None:
+        batas_read_model = int((args.read_model or readmodel.DEFAULT_CAP_MB) * 1024 * 1024)
     while True:
         login_result = login_menu()
         if login_result:
-            main_menu(*login_result)
+            main_menu(*login_result, batas_read_model)
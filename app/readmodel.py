@@ -0,0 +1,333 @@
+# app/readmodel.py
+
+import heapq
+import os
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+import database as db
+from lib.crypt import decrypt_many
+
+# ==============================
+# Read Model Sesi (In-Memory)
+# ==============================
+#
+# Optional: enabled with `--read-model` or APP_READ_MODEL=1. The memory cap is
+# APP_READ_MODEL_MB (default 64); past it the model switches itself off and
+# every call goes back to the on-disk queries in database.py.
+
+ENV_FLAG = "APP_READ_MODEL"
+ENV_CAP_MB = "APP_READ_MODEL_MB"
+DEFAULT_CAP_MB = 64
+
+# Stands in for a NULL waktu (unparsable tanggal); sorts first like NULL does in SQLite
+WAKTU_KOSONG = -(2 ** 63)
+# Per-row cost of the numeric columns plus the list slots of the two strings
+_ROW_OVERHEAD = 5 * 8 + 1 + 2 * 8
+_LOAD_CHUNK = 1000
+
+
+def batas_dari_env():
+    """Returns the configured cap in bytes, or None when the read model is disabled."""
+    if not os.environ.get(ENV_FLAG) and not os.environ.get(ENV_CAP_MB):
+        return None
+    return int(float(os.environ.get(ENV_CAP_MB) or DEFAULT_CAP_MB) * 1024 * 1024)
+
+
+def buka(orang_id, session, batas_byte=None):
+    """Returns a loaded ReadModel, or the database module itself when none is wanted.
+
+    Both offer the same read and write functions, so callers use the result
+    without checking which one they got.
+    """
+    if batas_byte is None:
+        return db
+    return ReadModel(orang_id, session, batas_byte)
+
+
+class _Kolom:
+    """One transaction type held column-wise, sorted by (waktu, id) like the history index."""
+
+    __slots__ = ("id", "waktu", "account_id", "kategori_id", "jumlah", "tanggal", "deskripsi")
+
+    def __init__(self):
+        self.id = array("q")
+        self.waktu = array("q")
+        self.account_id = array("q")
+        self.kategori_id = array("q")
+        self.jumlah = array("d")
+        self.tanggal = []
+        self.deskripsi = []
+
+    def __len__(self):
+        return len(self.id)
+
+    def tambah(self, row_id, waktu, account_id, kategori_id, jumlah, tanggal, deskripsi):
+        waktu = WAKTU_KOSONG if waktu is None else waktu
+        i = len(self.id)
+        # New rows are almost always the newest; older ones are slotted in place
+        if i and (self.waktu[-1], self.id[-1]) > (waktu, row_id):
+            i = self.posisi(waktu, row_id)
+        for column, value in ((self.id, row_id), (self.waktu, waktu), (self.account_id, account_id),
+                              (self.kategori_id, kategori_id), (self.jumlah, jumlah),
+                              (self.tanggal, tanggal), (self.deskripsi, deskripsi)):
+            column.insert(i, value)
+
+    def posisi(self, waktu, row_id):
+        """Index of the first row whose (waktu, id) key is >= the given key."""
+        waktu = WAKTU_KOSONG if waktu is None else waktu
+        i = bisect_left(self.waktu, waktu)
+        while i < len(self.id) and self.waktu[i] == waktu and self.id[i] < row_id:
+            i += 1
+        return i
+
+    def rentang(self, dari, sampai):
+        """Returns (lo, hi) row indexes for the half-open period, as database._periode filters it."""
+        lo, hi = 0, len(self.id)
+        if dari is not None or sampai is not None:
+            # SQL comparisons never match a NULL waktu
+            lo = bisect_right(self.waktu, WAKTU_KOSONG)
+        if dari is not None:
+            lo = max(lo, bisect_left(self.waktu, db._waktu(dari)))
+        if sampai is not None:
+            hi = bisect_left(self.waktu, db._waktu(sampai))
+        return lo, max(lo, hi)
+
+
+class ReadModel:
+    """Decrypted copy of one profile's accounts, categories and transactions.
+
+    Built once per session; reads are answered from memory, and every write
+    made through the model is followed by an incremental load of the rows
+    created since (by id), so no history is ever decrypted twice. Archived
+    transactions and period totals are not held and always go to the
+    database. Unknown attributes fall through to the database module.
+    """
+
+    def __init__(self, orang_id, session, batas_byte):
+        self.orang_id = orang_id
+        self.session = session
+        self.batas_byte = batas_byte
+        self.aktif = True
+        self.ukuran = 0
+        self.accounts = {}  # id -> nama, in id order
+        self.kategori = {"pemasukan": {}, "pengeluaran": {}}
+        self.kolom = {"pemasukan": _Kolom(), "pengeluaran": _Kolom()}
+        self.saldo = {}
+        self.bulanan = {}  # (account_id, "YYYY-MM") -> [pemasukan, pengeluaran]
+        self.max_id = {"account": 0, "kategori": 0, "transaksi": 0}
+        self._muat_arsip()
+        self.segarkan()
+
+    def __getattr__(self, name):
+        return getattr(db, name)
+
+    # --- Memuat ---
+
+    def _muat_arsip(self):
+        conn = db.get_db_connection()
+        rows = conn.execute("""
+            SELECT r.account_id, r.bulan, r.tipe, SUM(r.jumlah) FROM arsip_ringkasan r
+            JOIN account a ON r.account_id = a.id
+            WHERE a.orang_id = ?
+            GROUP BY r.account_id, r.bulan, r.tipe
+        """, (self.orang_id,)).fetchall()
+        conn.close()
+        for account_id, bulan, tipe, jumlah in rows:
+            self._catat(account_id, bulan, tipe, jumlah)
+
+    def _catat(self, account_id, bulan, tipe, jumlah):
+        pemasukan = tipe == "pemasukan"
+        self.saldo[account_id] = self.saldo.get(account_id, 0) + (jumlah if pemasukan else -jumlah)
+        totals = self.bulanan.setdefault((account_id, bulan), [0, 0])
+        totals[0 if pemasukan else 1] += jumlah
+
+    def segarkan(self):
+        """Loads accounts, categories and transactions added since the last load."""
+        if not self.aktif:
+            return
+        conn = db.get_db_connection()
+        ids = [row[0] for row in conn.execute("SELECT id FROM account WHERE orang_id=? AND id>?",
+                                              (self.orang_id, self.max_id["account"]))]
+        for acc_id, nama in db.get_names("account", ids, self.session).items():
+            self.accounts[acc_id] = nama
+            self.saldo.setdefault(acc_id, 0)
+        self.accounts = dict(sorted(self.accounts.items()))
+        self.max_id["account"] = max(self.accounts, default=0)
+
+        rows = conn.execute("SELECT id, tipe FROM kategori WHERE orang_id=? AND id>? ORDER BY id",
+                            (self.orang_id, self.max_id["kategori"])).fetchall()
+        names = db.get_names("kategori", [row[0] for row in rows], self.session)
+        for kat_id, tipe in rows:
+            self.kategori[tipe][kat_id] = names[kat_id]
+            self.max_id["kategori"] = kat_id
+
+        cursor = conn.execute("""
+            SELECT t.id, t.waktu, t.account_id, t.kategori_id, t.tipe, t.jumlah, t.tanggal, t.deskripsi
+            FROM transaksi t
+            JOIN account a ON t.account_id = a.id
+            WHERE a.orang_id = ? AND t.id > ?
+            ORDER BY t.id
+        """, (self.orang_id, self.max_id["transaksi"]))
+        while self.aktif:
+            rows = cursor.fetchmany(_LOAD_CHUNK)
+            if not rows:
+                break
+            for row, deskripsi in zip(rows, decrypt_many((row[7] for row in rows), self.session)):
+                row_id, waktu, account_id, kategori_id, tipe, jumlah, tanggal, _ = row
+                self.kolom[tipe].tambah(row_id, waktu, account_id, kategori_id, jumlah, tanggal, deskripsi)
+                self._catat(account_id, tanggal[:7], tipe, jumlah)
+                self.ukuran += _ROW_OVERHEAD + sys.getsizeof(tanggal) + sys.getsizeof(deskripsi)
+            self.max_id["transaksi"] = rows[-1][0]
+            if self.ukuran > self.batas_byte:
+                self.nonaktifkan()
+        cursor.close()
+        conn.close()
+
+    def nonaktifkan(self):
+        """Frees the loaded data; from now on every call uses the database."""
+        self.aktif = False
+        self.kolom = self.accounts = self.kategori = self.saldo = self.bulanan = None
+
+    def muat_ulang(self):
+        """Rebuilds the model after a change that moved or removed existing rows."""
+        if self.aktif:
+            self.__init__(self.orang_id, self.session, self.batas_byte)
+
+    # --- Baca ---
+
+    def get_accounts_by_orang(self, orang_id, session):
+        if not self.aktif or orang_id != self.orang_id:
+            return db.get_accounts_by_orang(orang_id, session)
+        return list(self.accounts.items())
+
+    def get_kategori(self, orang_id, tipe, session):
+        if not self.aktif or orang_id != self.orang_id:
+            return db.get_kategori(orang_id, tipe, session)
+        return list(self.kategori[tipe].items())
+
+    def get_dashboard_summary(self, orang_id, month, dari=None, sampai=None):
+        if not self.aktif or orang_id != self.orang_id or dari is not None or sampai is not None:
+            return db.get_dashboard_summary(orang_id, month, dari, sampai)
+        summary = {}
+        for acc_id in self.accounts:
+            pemasukan, pengeluaran = self.bulanan.get((acc_id, month), (0, 0))
+            summary[acc_id] = {"account_id": acc_id, "saldo": self.saldo[acc_id],
+                               "pemasukan": pemasukan, "pengeluaran": pengeluaran}
+        return summary
+
+    def count_transactions(self, orang_id, tipe=None, dari=None, sampai=None, arsip=False):
+        if not self.aktif or orang_id != self.orang_id or arsip:
+            return db.count_transactions(orang_id, tipe, dari, sampai, arsip)
+        total = 0
+        for kolom in (self.kolom.values() if tipe is None else [self.kolom[tipe]]):
+            lo, hi = kolom.rentang(dari, sampai)
+            total += hi - lo
+        return total
+
+    def _baris(self, tipe, i):
+        kolom = self.kolom[tipe]
+        return {
+            "id": kolom.id[i],
+            "tanggal": kolom.tanggal[i],
+            "waktu": None if kolom.waktu[i] == WAKTU_KOSONG else kolom.waktu[i],
+            "tipe": tipe,
+            "nama_account": self.accounts.get(kolom.account_id[i], ""),
+            "nama_kategori": self.kategori[tipe].get(kolom.kategori_id[i], ""),
+            "jumlah": kolom.jumlah[i],
+            "deskripsi": kolom.deskripsi[i],
+        }
+
+    def get_transactions_paginated(self, orang_id, session, tipe, page=1, page_size=20, dari=None, sampai=None,
+                                   arsip=False):
+        if not self.aktif or orang_id != self.orang_id or arsip:
+            return db.get_transactions_paginated(orang_id, session, tipe, page, page_size, dari, sampai, arsip)
+        lo, hi = self.kolom[tipe].rentang(dari, sampai)
+        end = hi - (page - 1) * page_size
+        return [self._baris(tipe, i) for i in range(end - 1, max(lo, end - page_size) - 1, -1)]
+
+    def get_transactions_seek(self, orang_id, session, tipe, after=None, before=None, page_size=20,
+                              dari=None, sampai=None, arsip=False):
+        if not self.aktif or orang_id != self.orang_id or arsip:
+            return db.get_transactions_seek(orang_id, session, tipe, after, before, page_size, dari, sampai, arsip)
+        kolom = self.kolom[tipe]
+        lo, hi = kolom.rentang(dari, sampai)
+        if before is not None:
+            start = kolom.posisi(*before)
+            if start < len(kolom) and kolom.id[start] == before[1]:
+                start += 1
+            start = max(lo, start)
+            end = min(hi, start + page_size)
+        else:
+            end = min(hi, kolom.posisi(*after)) if after is not None else hi
+            start = max(lo, end - page_size)
+        return [self._baris(tipe, i) for i in range(end - 1, start - 1, -1)]
+
+    def iter_transactions_for_export(self, orang_id, session, chunk_size=500, dari=None, sampai=None, arsip=False):
+        if not self.aktif or orang_id != self.orang_id or arsip:
+            yield from db.iter_transactions_for_export(orang_id, session, chunk_size, dari, sampai, arsip)
+            return
+        # Both types merged oldest first, matching ORDER BY waktu, id
+        def kunci(tipe, kolom):
+            lo, hi = kolom.rentang(dari, sampai)
+            return ((kolom.waktu[i], kolom.id[i], tipe, i) for i in range(lo, hi))
+
+        for _, _, tipe, i in heapq.merge(*(kunci(tipe, kolom) for tipe, kolom in self.kolom.items())):
+            kolom = self.kolom[tipe]
+            yield {
+                "nama": self.accounts.get(kolom.account_id[i], ""),
+                "tipe": tipe,
+                "kategori": self.kategori[tipe].get(kolom.kategori_id[i], ""),
+                "jumlah": kolom.jumlah[i],
+                "deskripsi": kolom.deskripsi[i],
+                "tanggal": kolom.tanggal[i],
+            }
+
+    def get_all_transactions_for_export(self, orang_id, session, dari=None, sampai=None, arsip=False):
+        return list(self.iter_transactions_for_export(orang_id, session, dari=dari, sampai=sampai, arsip=arsip))
+
+    # --- Tulis (diteruskan ke database, lalu dimuat) ---
+
+    def tambah_account(self, orang_id, nama_account, session):
+        acc_id = db.tambah_account(orang_id, nama_account, session)
+        self.segarkan()
+        return acc_id
+
+    def tambah_kategori(self, orang_id, nama, tipe, session):
+        kat_id = db.tambah_kategori(orang_id, nama, tipe, session)
+        self.segarkan()
+        return kat_id
+
+    def tambah_transaksi(self, account_id, kategori_id, tipe, jumlah, deskripsi, session):
+        db.tambah_transaksi(account_id, kategori_id, tipe, jumlah, deskripsi, session)
+        self.segarkan()
+
+    def transfer_dana(self, orang_id, from_account_id, to_account_id, jumlah, session):
+        db.transfer_dana(orang_id, from_account_id, to_account_id, jumlah, session)
+        self.segarkan()
+
+    def transfer_dana_batch(self, orang_id, transfers, session):
+        db.transfer_dana_batch(orang_id, transfers, session)
+        self.segarkan()
+
+    def import_transaksi(self, orang_id, rows, session, sumber, chunk_size=1000, progress=None):
+        try:
+            return db.import_transaksi(orang_id, rows, session, sumber, chunk_size, progress)
+        finally:
+            # Chunks committed before a failure are loaded too
+            self.segarkan()
+
+    def arsipkan_transaksi(self, orang_id, sebelum, progress=None):
+        total = db.arsipkan_transaksi(orang_id, sebelum, progress)
+        self.muat_ulang()
+        return total
+
+    def ganti_master_password(self, orang_id, session, password_baru, batch_size=500, progress=None):
+        self.session = db.ganti_master_password(orang_id, session, password_baru, batch_size, progress)
+        return self.session
+
+    def proses_transaksi_berulang(self, orang_id, session, hingga=None):
+        total = db.proses_transaksi_berulang(orang_id, session, hingga)
+        self.segarkan()
+        return total
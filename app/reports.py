@@ -0,0 +1,163 @@
+# app/reports.py
+
+from itertools import chain
+
+import database as db
+
+# NumPy is only needed for reports, so the rest of the app runs without it.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# ==============================
+# Laporan (Vectorized)
+# ==============================
+
+
+# One record per loaded row; waktu is unix seconds
+_LEDGER_DTYPE = [("account_id", "i8"), ("kategori_id", "i8"), ("pemasukan", "?"), ("jumlah", "f8"), ("waktu", "i8")]
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("Fitur laporan membutuhkan NumPy (pip install numpy).")
+
+
+def load_ledger(orang_id):
+    """Loads a profile's transactions into columnar NumPy arrays, oldest first.
+
+    Returns a dict with `account_id`, `kategori_id` (int64), `pemasukan` (bool),
+    `jumlah` (float64), `tanggal` (datetime64[s]) and `bulan` (datetime64[M]).
+    Archived months come from their summaries, one row per account, category
+    and type dated on the first of the month. Rows go from the cursors
+    straight into one structured array; dates come from the integer waktu
+    column, so no date strings are parsed.
+    """
+    _require_numpy()
+    conn = db.get_db_connection()
+    # Plain tuples, which np.fromiter reads as structured records
+    arsip, transaksi = conn.cursor(), conn.cursor()
+    arsip.row_factory = transaksi.row_factory = None
+    # Everything archived is older than every row still in transaksi
+    arsip.execute("""
+        SELECT r.account_id, r.kategori_id, r.tipe = 'pemasukan', r.jumlah,
+            CAST(strftime('%s', r.bulan || '-01') AS INTEGER)
+        FROM arsip_ringkasan r
+        JOIN account a ON r.account_id = a.id
+        WHERE a.orang_id = ?
+        ORDER BY r.bulan ASC
+    """, (orang_id,))
+    transaksi.execute("""
+        SELECT t.account_id, t.kategori_id, t.tipe = 'pemasukan', t.jumlah, t.waktu
+        FROM transaksi t
+        JOIN account a ON t.account_id = a.id
+        WHERE a.orang_id = ?
+        ORDER BY t.waktu ASC, t.id ASC
+    """, (orang_id,))
+    try:
+        rows = np.fromiter(chain(arsip, transaksi), dtype=_LEDGER_DTYPE)
+    finally:
+        arsip.close()
+        transaksi.close()
+        conn.close()
+
+    ledger = {name: np.ascontiguousarray(rows[name]) for name in ("account_id", "kategori_id", "pemasukan", "jumlah")}
+    ledger["tanggal"] = rows["waktu"].astype("datetime64[s]")
+    ledger["bulan"] = ledger["tanggal"].astype("datetime64[M]")
+    return ledger
+
+
+def signed_amounts(ledger):
+    """Income as positive and expenses as negative amounts."""
+    return np.where(ledger["pemasukan"], ledger["jumlah"], -ledger["jumlah"])
+
+
+def monthly_series(ledger):
+    """Returns (months, income, expense) arrays for every month from the first to the last transaction."""
+    if not len(ledger["bulan"]):
+        return ledger["bulan"], np.zeros(0), np.zeros(0)
+    first, last = ledger["bulan"].min(), ledger["bulan"].max()
+    # Months without transactions stay in the series as zeros
+    months = np.arange(first, last + 1)
+    idx = (ledger["bulan"] - first).astype(np.int64)
+    income = np.bincount(idx, weights=np.where(ledger["pemasukan"], ledger["jumlah"], 0), minlength=len(months))
+    expense = np.bincount(idx, weights=np.where(ledger["pemasukan"], 0, ledger["jumlah"]), minlength=len(months))
+    return months, income, expense
+
+
+def category_totals(ledger, tipe):
+    """Returns (kategori_ids, totals, shares) for one type, largest total first."""
+    mask = ledger["pemasukan"] if tipe == "pemasukan" else ~ledger["pemasukan"]
+    ids, idx = np.unique(ledger["kategori_id"][mask], return_inverse=True)
+    totals = np.bincount(idx, weights=ledger["jumlah"][mask], minlength=len(ids))
+    grand_total = totals.sum()
+    shares = totals / grand_total if grand_total else np.zeros_like(totals)
+    order = np.argsort(totals)[::-1]
+    return ids[order], totals[order], shares[order]
+
+
+def running_balances(ledger):
+    """Returns (account_ids, balance_after_each_row) where balances run per account.
+
+    The second array is aligned with the ledger rows, so balance[i] is the
+    balance of ledger["account_id"][i] right after transaction i.
+    """
+    signed = signed_amounts(ledger)
+    # Stable sort keeps each account's rows in time order
+    order = np.argsort(ledger["account_id"], kind="stable")
+    sorted_accounts = ledger["account_id"][order]
+    totals = np.cumsum(signed[order])
+    ids, starts = np.unique(sorted_accounts, return_index=True)
+    # Subtract everything accumulated before each account's first row
+    offsets = np.concatenate(([0.0], totals))[starts]
+    group = np.searchsorted(ids, sorted_accounts)
+    balances = np.empty_like(totals)
+    balances[order] = totals - offsets[group]
+    return ids, balances
+
+
+def rolling_average(values, window=3):
+    """Trailing moving average; the first window-1 entries average what is available."""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return values
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+
+def build_report(orang_id, session, months=12, window=3):
+    """Computes the full report for a profile; only names used as labels are decrypted."""
+    ledger = load_ledger(orang_id)
+    bulan, income, expense = monthly_series(ledger)
+    kategori_ids, kategori_totals, kategori_shares = category_totals(ledger, "pengeluaran")
+    account_ids, balances = running_balances(ledger)
+
+    # Last and lowest balance per account from the per-row running balances
+    last_balance, lowest_balance = {}, {}
+    if len(account_ids):
+        order = np.argsort(ledger["account_id"], kind="stable")
+        sorted_balances = balances[order]
+        _, starts = np.unique(ledger["account_id"][order], return_index=True)
+        ends = np.append(starts[1:], len(sorted_balances)) - 1
+        last_balance = dict(zip(account_ids.tolist(), sorted_balances[ends].tolist()))
+        lowest_balance = dict(zip(account_ids.tolist(), np.minimum.reduceat(sorted_balances, starts).tolist()))
+
+    kategori_names = db.get_names("kategori", kategori_ids.tolist(), session)
+    account_names = db.get_names("account", account_ids.tolist(), session)
+    return {
+        "bulanan": [
+            {"bulan": str(b), "pemasukan": float(i), "pengeluaran": float(e), "rata_pengeluaran": float(r)}
+            for b, i, e, r in list(zip(bulan, income, expense, rolling_average(expense, window)))[-months:]
+        ],
+        "kategori_pengeluaran": [
+            {"kategori": kategori_names.get(k, ""), "total": float(t), "porsi": float(p)}
+            for k, t, p in zip(kategori_ids.tolist(), kategori_totals, kategori_shares)
+        ],
+        "akun": [
+            {"akun": account_names.get(a, ""), "saldo": last_balance[a], "saldo_terendah": lowest_balance[a]}
+            for a in account_ids.tolist()
+        ],
+    }
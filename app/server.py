@@ -0,0 +1,425 @@
+# app/server.py
+
+import argparse
+import asyncio
+import csv
+import datetime
+import io
+import json
+import os
+import secrets
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from itertools import islice
+from urllib.parse import parse_qs, urlsplit
+
+import cli
+import database as db
+
+# ==============================
+# Server HTTP/JSON Lokal
+# ==============================
+#
+# Contoh:
+#     python main.py serve --port 8765
+#     curl -s -X POST localhost:8765/login -d '{"orang_id": 1, "password": "..."}'
+#     curl -s localhost:8765/balances -H "Authorization: Bearer <token>"
+#
+# SQLite and crypto calls block, so they run on a fixed pool of worker threads.
+# database.py keeps one connection per thread, which makes that pool the
+# server's connection pool as well. Exports stream from their own threads so a
+# slow download never holds a worker the other requests need.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+DEFAULT_EXPORT_WORKERS = 2
+
+# Idle sessions are dropped after this many seconds
+SESSION_TTL = 30 * 60
+MAX_BODY_SIZE = 1024 * 1024
+MAX_PAGE_SIZE = 200
+EXPORT_CHUNK_ROWS = 500
+
+
+class HttpError(Exception):
+    """Ends a request with an HTTP error status and a JSON {"error": message} body."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method, target, headers, body):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Body harus berupa JSON.")
+        if not isinstance(data, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Body harus berupa objek JSON.")
+        return data
+
+
+class Sesi:
+    """A logged-in client: its profile and the session key derived at login."""
+
+    __slots__ = ("orang_id", "session", "last_used")
+
+    def __init__(self, orang_id, session):
+        self.orang_id = orang_id
+        self.session = session
+        self.last_used = time.monotonic()
+
+
+class Server:
+    def __init__(self, workers=DEFAULT_WORKERS, export_workers=DEFAULT_EXPORT_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self.export_slots = asyncio.Semaphore(export_workers)
+        self.sessions = {}  # token -> Sesi; only touched from the event loop
+        self.routes = {
+            ("POST", "/login"): self.login,
+            ("POST", "/logout"): self.logout,
+            ("GET", "/accounts"): self.accounts,
+            ("GET", "/categories"): self.categories,
+            ("GET", "/balances"): self.balances,
+            ("GET", "/history"): self.history,
+            ("POST", "/transactions"): self.add_transaction,
+            ("POST", "/transfer"): self.transfer,
+        }
+
+    async def call(self, fn, *args, **kwargs):
+        """Runs a blocking database/crypto call on the worker pool."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+    # --- Koneksi & Protokol ---
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                if (request.method, request.path) == ("GET", "/export"):
+                    await self.export(request, writer)
+                else:
+                    status, payload = await self.dispatch(request)
+                    write_json(writer, status, payload, keep_alive)
+                    await writer.drain()
+                if not keep_alive:
+                    break
+        except HttpError as e:
+            # Malformed request; the stream position is unknown, so the connection ends
+            write_json(writer, e.status, {"error": e.message}, keep_alive=False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            print(f"Koneksi dihentikan: {e!r}", file=sys.stderr)
+        finally:
+            writer.close()
+
+    async def dispatch(self, request):
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self.routes):
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Metode tidak didukung."}
+            return HTTPStatus.NOT_FOUND, {"error": "Endpoint tidak ditemukan."}
+        try:
+            return await handler(request)
+        except HttpError as e:
+            return e.status, {"error": e.message}
+        except Exception as e:
+            print(f"Error pada {request.method} {request.path}: {e!r}", file=sys.stderr)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Terjadi kesalahan pada server."}
+
+    def authenticate(self, request):
+        token = _token(request)
+        now = time.monotonic()
+        for expired in [t for t, s in self.sessions.items() if now - s.last_used > SESSION_TTL]:
+            del self.sessions[expired]
+        sesi = self.sessions.get(token)
+        if sesi is None:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "Token tidak valid atau sudah kedaluwarsa.")
+        sesi.last_used = now
+        return sesi
+
+    # --- Endpoint ---
+
+    async def login(self, request):
+        data = request.json()
+        orang_id, password = data.get("orang_id"), data.get("password")
+        if not isinstance(orang_id, int) or not isinstance(password, str):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "orang_id (int) dan password (string) wajib diisi.")
+        session = await self.call(_login, orang_id, password)
+        if session is None:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "ID profil atau master password salah.")
+        token = secrets.token_urlsafe(32)
+        self.sessions[token] = Sesi(orang_id, session)
+        return HTTPStatus.OK, {"token": token, "expires_in": SESSION_TTL}
+
+    async def logout(self, request):
+        self.authenticate(request)
+        del self.sessions[_token(request)]
+        return HTTPStatus.OK, {"ok": True}
+
+    async def accounts(self, request):
+        sesi = self.authenticate(request)
+        accounts = await self.call(db.get_accounts_by_orang, sesi.orang_id, sesi.session)
+        return HTTPStatus.OK, {"accounts": [{"id": acc_id, "nama": nama} for acc_id, nama in accounts]}
+
+    async def categories(self, request):
+        sesi = self.authenticate(request)
+        tipe = _tipe(request.query.get("tipe"))
+        kategori = await self.call(db.get_kategori, sesi.orang_id, tipe, sesi.session)
+        return HTTPStatus.OK, {"categories": [{"id": kat_id, "nama": nama} for kat_id, nama in kategori]}
+
+    async def balances(self, request):
+        sesi = self.authenticate(request)
+        dari, sampai = _periode(request.query)
+        bulan = datetime.datetime.now().strftime("%Y-%m")
+        accounts = await self.call(db.get_accounts_by_orang, sesi.orang_id, sesi.session)
+        summary = await self.call(db.get_dashboard_summary, sesi.orang_id, bulan, dari, sampai)
+        # pemasukan/pengeluaran cover the current month unless a period was given
+        periode = {"dari": request.query.get("dari"), "sampai": request.query.get("sampai")}
+        return HTTPStatus.OK, {
+            "periode": periode if dari or sampai else {"bulan": bulan},
+            "accounts": [dict(summary[acc_id], nama=nama) for acc_id, nama in accounts],
+            "total_saldo": sum(s["saldo"] for s in summary.values()),
+        }
+
+    async def history(self, request):
+        sesi = self.authenticate(request)
+        tipe = _tipe(request.query.get("tipe"))
+        page = _int(request.query, "page", 1, minimum=1)
+        page_size = _int(request.query, "page_size", 20, minimum=1, maximum=MAX_PAGE_SIZE)
+        dari, sampai = _periode(request.query)
+        arsip = request.query.get("arsip", "").lower() in ("1", "true", "ya")
+        total = await self.call(db.count_transactions, sesi.orang_id, tipe, dari, sampai, arsip)
+        items = await self.call(db.get_transactions_paginated, sesi.orang_id, sesi.session, tipe,
+                                page, page_size, dari, sampai, arsip)
+        return HTTPStatus.OK, {"page": page, "page_size": page_size, "total": total, "items": items}
+
+    async def add_transaction(self, request):
+        sesi = self.authenticate(request)
+        data = request.json()
+        tipe = _tipe(data.get("tipe"))
+        account_id, kategori_id = data.get("account_id"), data.get("kategori_id")
+        jumlah, deskripsi = _jumlah(data.get("jumlah")), data.get("deskripsi", "")
+        if not isinstance(deskripsi, str):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "deskripsi harus berupa string.")
+        if account_id not in await self.call(_own_accounts, sesi.orang_id, sesi.session):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "ID Akun tidak valid.")
+        kategori = await self.call(db.get_kategori, sesi.orang_id, tipe, sesi.session)
+        if not any(kat_id == kategori_id for kat_id, _ in kategori):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "ID Kategori tidak valid.")
+        await self.call(db.tambah_transaksi, account_id, kategori_id, tipe, jumlah, deskripsi, sesi.session)
+        bulan = datetime.datetime.now().strftime("%Y-%m")
+        anggaran = await self.call(db.cek_anggaran, sesi.orang_id, kategori_id, bulan)
+        return HTTPStatus.CREATED, {"ok": True, "anggaran": anggaran}
+
+    async def transfer(self, request):
+        sesi = self.authenticate(request)
+        data = request.json()
+        dari, ke, jumlah = data.get("dari"), data.get("ke"), _jumlah(data.get("jumlah"))
+        if not isinstance(dari, int) or not isinstance(ke, int):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "ID Akun tidak valid.")
+        try:
+            await self.call(db.transfer_dana, sesi.orang_id, dari, ke, jumlah, sesi.session)
+        except db.SaldoTidakCukupError as e:
+            return HTTPStatus.CONFLICT, {"error": "Saldo tidak mencukupi.", "saldo": e.saldo}
+        except ValueError as e:
+            # Foreign or unknown accounts are rejected by transfer_dana itself
+            raise HttpError(HTTPStatus.BAD_REQUEST, str(e))
+        return HTTPStatus.CREATED, {"ok": True}
+
+    async def export(self, request, writer):
+        """Streams the CSV export with chunked encoding, one chunk per EXPORT_CHUNK_ROWS rows."""
+        try:
+            sesi = self.authenticate(request)
+            dari, sampai = _periode(request.query)
+        except HttpError as e:
+            write_json(writer, e.status, {"error": e.message})
+            await writer.drain()
+            return
+        arsip = request.query.get("arsip", "").lower() in ("1", "true", "ya")
+        loop = asyncio.get_running_loop()
+        async with self.export_slots:
+            # The export generator keeps a cursor on its thread's connection, so
+            # every chunk must be pulled on that same thread
+            thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export")
+            rows = db.iter_transactions_for_export(sesi.orang_id, sesi.session, dari=dari, sampai=sampai,
+                                                   arsip=arsip)
+            try:
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/csv; charset=utf-8\r\n"
+                             b"Transfer-Encoding: chunked\r\n\r\n")
+                header = True
+                while True:
+                    chunk = await loop.run_in_executor(thread, _csv_chunk, rows, header)
+                    header = False
+                    if not chunk:
+                        break
+                    writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    await writer.drain()
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+            finally:
+                await loop.run_in_executor(thread, _close_export, rows)
+                thread.shutdown(wait=False)
+
+
+# --- Helper Protokol ---
+
+
+async def read_request(reader):
+    """Reads one HTTP/1.1 request; returns None when the client has closed the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Request line tidak valid.")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0) or 0)
+    if length > MAX_BODY_SIZE:
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Body terlalu besar.")
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), target, headers, body)
+
+
+def write_json(writer, status, payload, keep_alive=True):
+    body = json.dumps(payload).encode()
+    status = HTTPStatus(status)
+    writer.write(
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+    )
+
+
+def _token(request):
+    return request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+
+
+def _tipe(value):
+    if value not in ("pemasukan", "pengeluaran"):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "tipe harus 'pemasukan' atau 'pengeluaran'.")
+    return value
+
+
+def _int(query, name, default, minimum=None, maximum=None):
+    try:
+        value = int(query.get(name, default))
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"{name} harus berupa angka.")
+    if minimum is not None and value < minimum:
+        value = minimum
+    if maximum is not None and value > maximum:
+        value = maximum
+    return value
+
+
+def _jumlah(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "jumlah harus berupa angka positif.")
+    return float(value)
+
+
+def _periode(query):
+    """Inclusive ?dari=YYYY-MM-DD&sampai=YYYY-MM-DD into the half-open bounds db takes."""
+    try:
+        dari = cli.parse_tanggal(query["dari"]) if query.get("dari") else None
+        sampai = cli.parse_tanggal(query["sampai"]) if query.get("sampai") else None
+    except argparse.ArgumentTypeError as e:
+        raise HttpError(HTTPStatus.BAD_REQUEST, str(e))
+    return cli.periode(dari, sampai)
+
+
+# --- Helper Worker (berjalan di thread pool) ---
+
+
+def _login(orang_id, password):
+    profil = next((o for o in db.get_orang() if o["id"] == orang_id), None)
+    if profil is None or not db.verify_master_password(profil["master_password_hash"], password):
+        return None
+    if db.rotasi_tertunda(orang_id):
+        raise HttpError(HTTPStatus.CONFLICT, "Penggantian master password belum selesai.")
+    return db.buka_sesi(orang_id, password)
+
+
+def _own_accounts(orang_id, session):
+    return {acc_id for acc_id, _ in db.get_accounts_by_orang(orang_id, session)}
+
+
+def _csv_chunk(rows, header):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=db.EXPORT_COLUMNS)
+    if header:
+        writer.writeheader()
+    writer.writerows(islice(rows, EXPORT_CHUNK_ROWS))
+    return buffer.getvalue().encode("utf-8")
+
+
+def _close_export(rows):
+    rows.close()
+    db.close_db_connection()
+
+
+# --- Menjalankan Server ---
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, workers=DEFAULT_WORKERS,
+                export_workers=DEFAULT_EXPORT_WORKERS, ready=None):
+    """Runs the server until cancelled; `ready(address)` is called once it is listening."""
+    app = Server(workers, export_workers)
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.unlink(unix_path)
+        server = await asyncio.start_unix_server(app.handle_client, path=unix_path)
+        # Only the owner may talk to the ledger through the socket
+        os.chmod(unix_path, 0o600)
+        address = unix_path
+    else:
+        server = await asyncio.start_server(app.handle_client, host, port)
+        address = "http://%s:%d" % server.sockets[0].getsockname()[:2]
+    if ready:
+        ready(address)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        app.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run(args):
+    """Entry point for `main.py serve`; returns the process exit code."""
+    def ready(address):
+        print(f"Server berjalan di {address} (Ctrl+C untuk berhenti)", file=sys.stderr)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers, args.export_workers, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
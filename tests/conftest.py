@@ -0,0 +1,20 @@
+# tests/conftest.py
+
+import os
+import sys
+
+import pytest
+
+# The app imports its modules relative to app/ (e.g. `import database as db`)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import database as db  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A fresh database file for one test."""
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "test.db"))
+    db.setup_database()
+    yield db
+    db.close_db_connection()
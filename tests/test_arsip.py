@@ -0,0 +1,55 @@
+# tests/test_arsip.py
+
+import datetime
+
+import pytest
+
+
+@pytest.fixture
+def riwayat(database):
+    """A profile with 60 transactions spread over 2022-2024."""
+    db = database
+    orang_id = db.tambah_orang("A", "pw")
+    session = db.buka_sesi(orang_id, "pw")
+    rows = [{"nama": ("Cash", "Bank")[i % 2], "tipe": ("pemasukan", "pengeluaran")[i % 3 == 0],
+             "kategori": f"Kategori {i % 3}", "jumlah": str(10 + i), "deskripsi": f"baris {i}",
+             "tanggal": f"{2022 + i % 3}-{i % 12 + 1:02d}-15 09:00:00"} for i in range(60)]
+    db.import_transaksi(orang_id, iter(rows), session, "riwayat.csv")
+    return orang_id, session
+
+
+def _keadaan(db, orang_id, session):
+    accounts = [acc_id for acc_id, _ in db.get_accounts_by_orang(orang_id, session)]
+    return {
+        "saldo": {acc_id: round(db.get_account_balance(acc_id), 2) for acc_id in accounts},
+        "dashboard": {bulan: db.get_dashboard_summary(orang_id, bulan) for bulan in ("2022-03", "2024-02")},
+        "periode": db.get_dashboard_summary(orang_id, None, dari=datetime.date(2022, 1, 1),
+                                            sampai=datetime.date(2025, 1, 1)),
+        "export": db.get_all_transactions_for_export(orang_id, session, arsip=True),
+        "jumlah": db.count_transactions(orang_id, arsip=True),
+    }
+
+
+def test_arsip_tidak_mengubah_saldo_dan_export(database, riwayat):
+    db = database
+    orang_id, session = riwayat
+    sebelum = _keadaan(db, orang_id, session)
+
+    dipindah = db.arsipkan_transaksi(orang_id, datetime.date(2024, 1, 1))
+    assert dipindah == 40
+    assert db.count_transactions(orang_id) == 20
+    assert _keadaan(db, orang_id, session) == sebelum
+    assert db.rebuild_ringkasan() == 0
+    assert _keadaan(db, orang_id, session) == sebelum
+
+
+def test_arsip_dua_kali_tidak_mengubah_apa_pun(database, riwayat):
+    db = database
+    orang_id, session = riwayat
+    db.arsipkan_transaksi(orang_id, datetime.date(2024, 1, 1))
+    sesudah = _keadaan(db, orang_id, session)
+    ringkasan = db.get_db_connection().execute("SELECT * FROM arsip_ringkasan ORDER BY 1, 2, 3, 4").fetchall()
+
+    assert db.arsipkan_transaksi(orang_id, datetime.date(2024, 1, 1)) == 0
+    assert _keadaan(db, orang_id, session) == sesudah
+    assert db.get_db_connection().execute("SELECT * FROM arsip_ringkasan ORDER BY 1, 2, 3, 4").fetchall() == ringkasan
@@ -0,0 +1,23 @@
+# tests/test_backup.py
+
+import pytest
+
+import backup
+
+
+def test_snapshot_rusak_ditolak_dan_backup_berikutnya_penuh(database, tmp_path):
+    db = database
+    folder = str(tmp_path / "backups")
+    orang_id = db.tambah_orang("A", "pw")
+    db.tambah_account(orang_id, "Cash", db.buka_sesi(orang_id, "pw"))
+    rusak = backup.buat_snapshot(folder)["file"]
+    with open(rusak, "wb") as f:
+        f.write(b"bukan gzip")
+    with pytest.raises(ValueError):
+        backup.pulihkan(folder=folder)
+
+    # The damaged newest snapshot cannot be a base; the next one starts a new chain
+    laporan = backup.buat_snapshot(folder)
+    assert laporan["jenis"] == "penuh"
+    assert backup.buat_snapshot(folder)["jenis"] == "inkremental"
+    assert backup.pulihkan(folder=folder)["rantai"] == 2
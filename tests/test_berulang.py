@@ -0,0 +1,41 @@
+# tests/test_berulang.py
+
+import datetime
+
+import pytest
+
+
+@pytest.fixture
+def aturan(database):
+    db = database
+    orang_id = db.tambah_orang("A", "pw")
+    session = db.buka_sesi(orang_id, "pw")
+    cash = db.tambah_account(orang_id, "Cash", session)
+    gaji = db.tambah_kategori(orang_id, "Gaji", "pemasukan", session)
+    sewa = db.tambah_kategori(orang_id, "Sewa", "pengeluaran", session)
+    db.tambah_transaksi_berulang(cash, gaji, "pemasukan", 1000, "gaji", "bulanan",
+                                 datetime.date(2024, 1, 31), session)
+    db.tambah_transaksi_berulang(cash, sewa, "pengeluaran", 50, "sewa", "mingguan",
+                                 datetime.date(2024, 1, 1), session, berakhir=datetime.date(2024, 2, 29))
+    return orang_id, session, cash
+
+
+def test_posting_kedua_tidak_memposting_apa_pun(database, aturan):
+    db = database
+    orang_id, session, cash = aturan
+    hingga = datetime.date(2024, 6, 30)
+
+    # Jan 31 .. Jun 30 monthly, Jan 1 .. Feb 26 weekly
+    assert db.proses_transaksi_berulang(orang_id, session, hingga) == 6 + 9
+    saldo = db.get_account_balance(cash)
+    assert saldo == 6 * 1000 - 9 * 50
+
+    assert db.proses_transaksi_berulang(orang_id, session, hingga) == 0
+    assert db.count_transactions(orang_id) == 15
+    assert db.get_account_balance(cash) == saldo
+
+    # Only the occurrence that fell due since is posted later on
+    assert db.proses_transaksi_berulang(orang_id, session, datetime.date(2024, 7, 31)) == 1
+    tanggal = [row["tanggal"] for row in db.get_all_transactions_for_export(orang_id, session)
+               if row["deskripsi"] == "gaji"]
+    assert tanggal[-3:] == ["2024-05-31 00:00:00", "2024-06-30 00:00:00", "2024-07-31 00:00:00"]
@@ -0,0 +1,25 @@
+# tests/test_count_transactions.py
+
+import sqlite3
+
+
+def test_jumlah_transaksi_mengikuti_tulisan_proses_lain(database):
+    db = database
+    orang_id = db.tambah_orang("A", "pw")
+    session = db.buka_sesi(orang_id, "pw")
+    cash = db.tambah_account(orang_id, "Cash", session)
+    gaji = db.tambah_kategori(orang_id, "Gaji", "pemasukan", session)
+    db.tambah_transaksi(cash, gaji, "pemasukan", 100, "", session)
+    assert db.count_transactions(orang_id) == 1
+
+    # Another process (CLI, server) writing through its own connection
+    lain = sqlite3.connect(db.DB_FILE)
+    lain.execute("""INSERT INTO transaksi (account_id, kategori_id, tipe, jumlah, tanggal, deskripsi)
+                    VALUES (?, ?, 'pemasukan', 5, '2024-01-01 00:00:00', '')""", (cash, gaji))
+    lain.commit()
+    lain.close()
+    assert db.count_transactions(orang_id) == 2
+
+    db.tambah_transaksi(cash, gaji, "pemasukan", 1, "", session)
+    assert db.count_transactions(orang_id) == 3
+    assert db.count_transactions(orang_id, "pengeluaran") == 0
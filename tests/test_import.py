@@ -0,0 +1,57 @@
+# tests/test_import.py
+
+import pytest
+
+
+def _baris(n):
+    return [{"nama": "Cash" if i % 2 else "Bank", "tipe": "pemasukan" if i % 3 else "pengeluaran",
+             "kategori": f"Kategori {i % 4}", "jumlah": str(i + 1), "deskripsi": f"baris {i}",
+             "tanggal": f"2024-01-{i % 28 + 1:02d} 10:00:{i % 60:02d}"} for i in range(n)]
+
+
+def _terputus_setelah(rows, n):
+    """Yields the first `n` rows, then fails like a killed import."""
+    for i, row in enumerate(rows):
+        if i == n:
+            raise KeyboardInterrupt
+        yield row
+
+
+def _kunci(rows):
+    return sorted((r["nama"], r["tipe"], r["kategori"], float(r["jumlah"]), r["deskripsi"], r["tanggal"])
+                  for r in rows)
+
+
+def test_import_terputus_dilanjutkan_tanpa_duplikat(database):
+    db = database
+    orang_id = db.tambah_orang("A", "pw")
+    session = db.buka_sesi(orang_id, "pw")
+    rows = _baris(25)
+
+    with pytest.raises(KeyboardInterrupt):
+        db.import_transaksi(orang_id, _terputus_setelah(rows, 17), session, "bank.csv", chunk_size=5)
+    # Chunks 1-3 committed; the half-read fourth chunk was rolled back
+    assert db.count_transactions(orang_id) == 15
+
+    assert db.import_transaksi(orang_id, iter(rows), session, "bank.csv", chunk_size=5) == 10
+    assert db.import_transaksi(orang_id, iter(rows), session, "bank.csv", chunk_size=5) == 0
+    assert db.count_transactions(orang_id) == 25
+    assert _kunci(db.get_all_transactions_for_export(orang_id, session)) == _kunci(rows)
+    assert len(db.get_accounts_by_orang(orang_id, session)) == 2
+    assert db.rebuild_ringkasan() == 0
+
+
+def test_import_gagal_di_tengah_chunk_tidak_menyimpan_chunk_itu(database):
+    db = database
+    orang_id = db.tambah_orang("A", "pw")
+    session = db.buka_sesi(orang_id, "pw")
+    rows = _baris(10)
+    rusak = [dict(row) for row in rows]
+    rusak[7]["jumlah"] = "x"
+
+    with pytest.raises(ValueError):
+        db.import_transaksi(orang_id, iter(rusak), session, "bank.csv", chunk_size=5)
+    assert db.count_transactions(orang_id) == 5
+
+    assert db.import_transaksi(orang_id, iter(rows), session, "bank.csv", chunk_size=5) == 5
+    assert _kunci(db.get_all_transactions_for_export(orang_id, session)) == _kunci(rows)
@@ -0,0 +1,138 @@
+# tests/test_kategori_legacy.py
+
+import string
+
+import pytest
+
+from lib.crypt import encrypt
+
+# One-letter names: read with the wrong password, each decodes as valid (garbage)
+# UTF-8 about half the time, so some of them always would be rewritten
+NAMA_B = list(string.ascii_letters[:32])
+
+
+@pytest.fixture
+def dua_profil(database):
+    """Profiles A and B, each with legacy (v1, unowned) categories used by its own transactions."""
+    db = database
+    ids = {}
+    for nama, password, kategori in (("A", "pw-a", ["Makanan"]), ("B", "pw-b", NAMA_B)):
+        orang_id = db.tambah_orang(nama, password)
+        session = db.buka_sesi(orang_id, password)
+        account_id = db.tambah_account(orang_id, f"Cash {nama}", session)
+        conn = db.get_db_connection()
+        kat_ids = []
+        for nama_kategori in kategori:
+            # Written the way the app stored categories before sessions and owners existed
+            kat_ids.append(conn.execute("INSERT INTO kategori (nama, tipe) VALUES (?, 'pengeluaran')",
+                                        (encrypt(nama_kategori, password),)).lastrowid)
+        conn.execute("UPDATE orang SET kategori_diklaim=0 WHERE id=?", (orang_id,))
+        conn.commit()
+        for kat_id in kat_ids:
+            db.tambah_transaksi(account_id, kat_id, "pengeluaran", 10, "", session)
+        ids[nama] = (orang_id, password, kat_ids)
+    return ids
+
+
+def _nama_kategori(db, orang_id, password, kat_ids):
+    session = db.buka_sesi(orang_id, password)
+    return list(db.get_names("kategori", kat_ids, session).values())
+
+
+def test_migrasi_enkripsi_tidak_menyentuh_kategori_profil_lain(database, dua_profil):
+    db = database
+    orang_a, password_a, kat_a = dua_profil["A"]
+    orang_b, password_b, kat_b = dua_profil["B"]
+
+    db.migrasi_enkripsi(orang_a, db.buka_sesi(orang_a, password_a))
+
+    assert _nama_kategori(db, orang_b, password_b, kat_b) == NAMA_B
+    assert _nama_kategori(db, orang_a, password_a, kat_a) == ["Makanan"]
+    # A's own category was migrated, B's are still v1 and can be migrated by B
+    conn = db.get_db_connection()
+    assert isinstance(conn.execute("SELECT nama FROM kategori WHERE id=?", (kat_a[0],)).fetchone()[0], bytes)
+    assert db.migrasi_enkripsi(orang_b, db.buka_sesi(orang_b, password_b)) == len(NAMA_B)
+    assert _nama_kategori(db, orang_b, password_b, kat_b) == NAMA_B
+
+
+def test_ganti_master_password_tidak_menyentuh_kategori_profil_lain(database, dua_profil):
+    db = database
+    orang_a, password_a, kat_a = dua_profil["A"]
+    orang_b, password_b, kat_b = dua_profil["B"]
+
+    db.ganti_master_password(orang_a, db.buka_sesi(orang_a, password_a), "pw-a-baru")
+
+    assert _nama_kategori(db, orang_b, password_b, kat_b) == NAMA_B
+    assert _nama_kategori(db, orang_a, "pw-a-baru", kat_a) == ["Makanan"]
+
+
+def test_migrasi_biner_tidak_menyentuh_kategori_profil_lain(database, dua_profil):
+    db = database
+    orang_a, password_a, kat_a = dua_profil["A"]
+    orang_b, password_b, kat_b = dua_profil["B"]
+
+    db.migrasi_biner(orang_a, db.buka_sesi(orang_a, password_a))
+
+    assert _nama_kategori(db, orang_b, password_b, kat_b) == NAMA_B
+    assert _nama_kategori(db, orang_a, password_a, kat_a) == ["Makanan"]
+
+
+def test_login_mengklaim_kategori_lama_milik_profil(database, dua_profil):
+    db = database
+    orang_a, password_a, kat_a = dua_profil["A"]
+    orang_b, password_b, kat_b = dua_profil["B"]
+
+    session_a = db.buka_sesi(orang_a, password_a)
+    session_b = db.buka_sesi(orang_b, password_b)
+
+    assert db.get_kategori(orang_a, "pengeluaran", session_a) == [(kat_a[0], "Makanan")]
+    assert db.get_kategori(orang_b, "pengeluaran", session_b) == list(zip(kat_b, NAMA_B))
+    baru = db.tambah_kategori(orang_a, "Sewa", "pengeluaran", session_a)
+    assert baru not in dict(db.get_kategori(orang_b, "pengeluaran", session_b))
+
+
+@pytest.fixture
+def profil_lama(database):
+    """One profile with a legacy (v1, unowned) category that no transaction uses."""
+    db = database
+    orang_id = db.tambah_orang("A", "pw")
+    conn = db.get_db_connection()
+    # A profile and category as the app stored them before sessions and owners existed
+    conn.execute("UPDATE orang SET kunci_salt=NULL, cipher_biner=0, kategori_diklaim=0 WHERE id=?", (orang_id,))
+    kat_id = conn.execute("INSERT INTO kategori (nama, tipe) VALUES (?, 'pengeluaran')",
+                          (encrypt("Makanan", "pw"),)).lastrowid
+    conn.commit()
+    return orang_id, kat_id
+
+
+def test_migrasi_enkripsi_mencakup_kategori_lama_tanpa_transaksi(database, profil_lama):
+    db = database
+    orang_id, kat_id = profil_lama
+
+    assert db.migrasi_enkripsi(orang_id, db.buka_sesi(orang_id, "pw")) == 1
+
+    nama = db.get_db_connection().execute("SELECT nama FROM kategori WHERE id=?", (kat_id,)).fetchone()[0]
+    assert nama.startswith("$")
+    assert db.get_kategori(orang_id, "pengeluaran", db.buka_sesi(orang_id, "pw")) == [(kat_id, "Makanan")]
+
+
+def test_migrasi_biner_mencakup_kategori_lama_tanpa_transaksi(database, profil_lama):
+    db = database
+    orang_id, kat_id = profil_lama
+
+    assert db.migrasi_biner(orang_id, db.buka_sesi(orang_id, "pw"))["jumlah"] == 1
+
+    nama = db.get_db_connection().execute("SELECT nama FROM kategori WHERE id=?", (kat_id,)).fetchone()[0]
+    assert isinstance(nama, bytes)
+    assert db.get_kategori(orang_id, "pengeluaran", db.buka_sesi(orang_id, "pw")) == [(kat_id, "Makanan")]
+
+
+def test_ganti_master_password_menyimpan_kategori_lama_tanpa_transaksi(database, profil_lama):
+    db = database
+    orang_id, kat_id = profil_lama
+
+    db.ganti_master_password(orang_id, db.buka_sesi(orang_id, "pw"), "pw-baru")
+
+    session = db.buka_sesi(orang_id, "pw-baru")
+    session.names.clear()
+    assert db.get_kategori(orang_id, "pengeluaran", session) == [(kat_id, "Makanan")]
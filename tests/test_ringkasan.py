@@ -0,0 +1,70 @@
+# tests/test_ringkasan.py
+
+import pytest
+
+# Query and number of key columns per summary table
+_TABEL = {
+    "account_balance": ("SELECT account_id, saldo FROM account_balance", 1),
+    "account_month_summary": ("SELECT account_id, bulan, pemasukan, pengeluaran FROM account_month_summary", 2),
+    "kategori_month_summary": ("SELECT orang_id, kategori_id, bulan, jumlah FROM kategori_month_summary", 3),
+}
+
+
+def _isi(db):
+    """Every summary table as {key: amounts}; rows the triggers left at zero count as missing."""
+    conn = db.get_db_connection()
+    isi = {}
+    for tabel, (query, n) in _TABEL.items():
+        isi[tabel] = {tuple(row[:n]): tuple(round(x, 2) for x in row[n:])
+                      for row in conn.execute(query) if any(round(x, 2) for x in row[n:])}
+    return isi
+
+
+@pytest.fixture
+def ledger(database):
+    db = database
+    orang_id = db.tambah_orang("A", "pw")
+    session = db.buka_sesi(orang_id, "pw")
+    cash = db.tambah_account(orang_id, "Cash", session)
+    bank = db.tambah_account(orang_id, "Bank", session)
+    gaji = db.tambah_kategori(orang_id, "Gaji", "pemasukan", session)
+    makan = db.tambah_kategori(orang_id, "Makan", "pengeluaran", session)
+    sewa = db.tambah_kategori(orang_id, "Sewa", "pengeluaran", session)
+    db.tambah_transaksi(cash, gaji, "pemasukan", 1000, "gaji", session)
+    db.tambah_transaksi(cash, makan, "pengeluaran", 25.5, "makan", session)
+    db.tambah_transaksi(cash, sewa, "pengeluaran", 300, "sewa", session)
+    db.transfer_dana(orang_id, cash, bank, 200, session)
+    return cash, bank, gaji, makan, sewa
+
+
+def _sama_dengan_rebuild(db):
+    sebelum = _isi(db)
+    assert db.rebuild_ringkasan() == 0
+    assert sebelum == _isi(db)
+
+
+def test_ringkasan_setelah_insert_sama_dengan_rebuild(database, ledger):
+    _sama_dengan_rebuild(database)
+
+
+def test_ringkasan_setelah_update_sama_dengan_rebuild(database, ledger):
+    db = database
+    cash, bank, gaji, makan, sewa = ledger
+    conn = db.get_db_connection()
+    conn.execute("UPDATE transaksi SET jumlah = 40 WHERE kategori_id = ?", (makan,))
+    conn.execute("UPDATE transaksi SET kategori_id = ? WHERE kategori_id = ?", (makan, sewa))
+    conn.execute("UPDATE transaksi SET account_id = ?, tanggal = '2023-05-01 08:00:00' WHERE kategori_id = ?",
+                 (bank, gaji))
+    conn.execute("UPDATE transaksi SET tipe = 'pemasukan' WHERE id = (SELECT MAX(id) FROM transaksi)")
+    conn.commit()
+    _sama_dengan_rebuild(db)
+
+
+def test_ringkasan_setelah_delete_sama_dengan_rebuild(database, ledger):
+    db = database
+    cash, bank, gaji, makan, sewa = ledger
+    conn = db.get_db_connection()
+    conn.execute("DELETE FROM transaksi WHERE kategori_id IN (?, ?)", (makan, gaji))
+    conn.commit()
+    _sama_dengan_rebuild(db)
+    assert db.get_account_balance(cash) == pytest.approx(-500)
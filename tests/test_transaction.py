@@ -0,0 +1,47 @@
+# tests/test_transaction.py
+
+import pytest
+
+
+def _nama(db):
+    return [row[0] for row in db.get_db_connection().execute("SELECT nama FROM orang ORDER BY id")]
+
+
+def test_blok_bersarang_yang_gagal_dibatalkan(database):
+    db = database
+    with db.transaction():
+        db.get_db_connection().execute("INSERT INTO orang (nama, master_password_hash) VALUES ('luar', '')")
+        with pytest.raises(RuntimeError):
+            with db.transaction():
+                db.get_db_connection().execute("INSERT INTO orang (nama, master_password_hash) VALUES ('dalam', '')")
+                raise RuntimeError
+        db.get_db_connection().execute("INSERT INTO orang (nama, master_password_hash) VALUES ('luar 2', '')")
+    assert _nama(db) == ["luar", "luar 2"]
+
+
+def test_blok_bersarang_ikut_dibatalkan_bersama_blok_luar(database):
+    db = database
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            with db.transaction():
+                db.get_db_connection().execute("INSERT INTO orang (nama, master_password_hash) VALUES ('dalam', '')")
+            raise RuntimeError
+    assert _nama(db) == []
+
+
+def test_blok_bersarang_gagal_membatalkan_transaksi_dan_saldonya(database):
+    db = database
+    orang_id = db.tambah_orang("A", "pw")
+    session = db.buka_sesi(orang_id, "pw")
+    cash = db.tambah_account(orang_id, "Cash", session)
+    gaji = db.tambah_kategori(orang_id, "Gaji", "pemasukan", session)
+    with db.transaction(immediate=True):
+        db.tambah_transaksi(cash, gaji, "pemasukan", 100, "luar", session)
+        with pytest.raises(ValueError):
+            with db.transaction():
+                db.tambah_transaksi(cash, gaji, "pemasukan", 50, "dalam", session)
+                raise ValueError
+        assert db.get_account_balance(cash) == 100
+    assert db.count_transactions(orang_id) == 1
+    assert db.get_account_balance(cash) == 100
+    assert db.rebuild_ringkasan() == 0
@@ -0,0 +1,45 @@
+# tests/test_transfer.py
+
+import pytest
+
+
+@pytest.fixture
+def dua_akun(database):
+    db = database
+    orang_id = db.tambah_orang("A", "pw")
+    session = db.buka_sesi(orang_id, "pw")
+    cash = db.tambah_account(orang_id, "Cash", session)
+    bank = db.tambah_account(orang_id, "Bank", session)
+    gaji = db.tambah_kategori(orang_id, "Gaji", "pemasukan", session)
+    db.tambah_transaksi(cash, gaji, "pemasukan", 100, "", session)
+    return session, cash, bank
+
+
+@pytest.mark.parametrize("jumlah", [-500, 0, float("nan")])
+def test_transfer_jumlah_tidak_positif_ditolak(database, dua_akun, jumlah):
+    session, cash, bank = dua_akun
+    with pytest.raises(ValueError):
+        database.transfer_dana(1, bank, cash, jumlah, session)
+    assert database.get_account_balance(cash) == 100
+    assert database.get_account_balance(bank) == 0
+
+
+def test_transfer_ke_akun_sendiri_ditolak(database, dua_akun):
+    session, cash, _ = dua_akun
+    with pytest.raises(ValueError):
+        database.transfer_dana(1, cash, cash, 10, session)
+    assert database.count_transactions(1) == 1
+
+
+def test_transfer_dari_akun_profil_lain_ditolak(database, dua_akun):
+    db = database
+    session, cash, _ = dua_akun
+    orang_b = db.tambah_orang("B", "pw-b")
+    session_b = db.buka_sesi(orang_b, "pw-b")
+    akun_b = db.tambah_account(orang_b, "Cash B", session_b)
+    with pytest.raises(ValueError):
+        db.transfer_dana(orang_b, cash, akun_b, 10, session_b)
+    with pytest.raises(ValueError):
+        db.transfer_dana(1, cash, akun_b, 10, session)
+    assert db.get_account_balance(cash) == 100
+    assert db.get_account_balance(akun_b) == 0